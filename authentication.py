@@ -1,31 +1,142 @@
 import os
 import hashlib
 import click
+from table_cache import table_cache
+from hash_index import HashIndex
+from file_lock import FileVersion, ConflictError, replace_file
+from instrumentation import timed
+from csv_format import read_rows, write_rows, parse_line, format_row
 
 class Authentication:
     def __init__(self):
         self.file_path = "authentication.csv"
+        self.index = HashIndex(self.file_path, self.file_path + ".idx", self._email_of_line)
+        from storage import open_storage
+        self.storage = open_storage()
+        self.version = FileVersion(self.file_path)
+
+    def _locked(self):
+        """Hold the write lock for a check-then-write on the accounts"""
+        return self.storage.transaction() if self.storage else self.version.locked()
+
+    def _email_of_line(self, line):
+        if b'"' in line:
+            fields = [field.encode() for field in parse_line(line.decode())]
+        else:
+            fields = line.strip().split(b",")
+        if len(fields) != 3:
+            return None
+        return fields[1]
+
+    @timed("authentication.find_account")
+    def find_account(self, email):
+        """Return the account for email through the sidecar index (or the database's primary key)"""
+        if self.storage:
+            rows = self.storage.find("accounts", "email", email)
+            if not rows:
+                return None
+            role, email, encrypted_password = rows[0]
+            return {"role": role, "password": encrypted_password}
+        if not os.path.exists(self.file_path):
+            return None
+        found = self.index.lookup(email.encode())
+        if found is None:
+            return None
+        offset, line = found
+        role, email, encrypted_password = parse_line(line.decode())
+        return {"role": role, "password": encrypted_password, "offset": offset}
 
+    @timed("authentication.read_data")
     def read_data(self):
+        if self.storage:
+            return self.storage.load("accounts", "accounts", self._records_from_rows)
+        return table_cache.load(self.file_path, "accounts", self._parse_file, depends_on=(self.version.path,))
+
+    def _records_from_rows(self, rows):
+        return {email: {"role": role, "password": encrypted_password} for role, email, encrypted_password in rows}
+
+    @timed("authentication.parse")
+    def _parse_file(self):
         accounts = {}
-        if os.path.exists(self.file_path):
-            with open(self.file_path, "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line:  # Skip empty lines
-                        continue
-                    try:
-                        role, email, encrypted_password = line.split(",")
-                        accounts[email] = {"role": role, "password": encrypted_password}
-                    except ValueError as e:
-                        click.echo(f"Warning: Skipping malformed line in {self.file_path}: {line}")
-                        continue
+        for role, email, encrypted_password in read_rows(self.file_path, 3):
+            accounts[email] = {"role": role, "password": encrypted_password}
         return accounts
 
-    def write_data(self, data):
-        with open(self.file_path, "w") as file:
-            for email, info in data.items():
-                file.write(f"{info['role']},{email},{info['password']}\n")
+    @timed("authentication.write_data")
+    def write_data(self, data, expected_version=None):
+        if self.storage:
+            rows = [(info['role'], email, info['password']) for email, info in data.items()]
+            self.storage.replace("accounts", rows, "accounts", data, expected_version)
+            return
+        with self.version.locked():
+            self.version.check(expected_version)
+            with replace_file(self.file_path) as file:
+                write_rows(file, ((info['role'], email, info['password']) for email, info in data.items()))
+            self.index.rebuild()
+            self.version.bump()
+            table_cache.store(self.file_path, "accounts", data, depends_on=(self.version.path,))
+
+    def append_account(self, email, role, encrypted_password):
+        """Append one account line and point the index at it.
+
+        Raises ConflictError if another session created the account first.
+        """
+        with self._locked():
+            if self.find_account(email) is not None:
+                raise ConflictError("Account already exists")
+            if self.storage:
+                self._put_account(email, role, encrypted_password)
+                return
+            self._append_line(email, role, encrypted_password)
+            self.version.bump()
+
+    def _append_line(self, email, role, encrypted_password):
+        if os.path.exists(self.file_path):
+            self.index.ensure_current()
+        with open(self.file_path, "ab") as file:
+            offset = file.tell()
+            if offset > 0:
+                # Make sure the new account starts on its own line
+                with open(self.file_path, "rb") as existing:
+                    existing.seek(offset - 1)
+                    if existing.read(1) != b"\n":
+                        file.write(b"\n")
+                        offset += 1
+            file.write(format_row([role, email, encrypted_password]).encode())
+        self.index.record_write(email.encode(), offset)
+
+    def update_password(self, email, account, encrypted_password):
+        """Overwrite the password of an indexed account in place when its length is unchanged.
+
+        account is the record the caller checked the old password against;
+        raises ConflictError if another session changed it since.
+        """
+        with self._locked():
+            current = self.find_account(email)
+            if current is None or current["password"] != account["password"]:
+                raise ConflictError("The account was changed by another session")
+            if self.storage:
+                self._put_account(email, current["role"], encrypted_password)
+                return
+            if len(encrypted_password) != len(current["password"]):
+                accounts = dict(self.read_data())
+                accounts[email] = {"role": current["role"], "password": encrypted_password}
+                self.write_data(accounts)
+                return
+            with open(self.file_path, "r+b") as file:
+                # The password is the last field; what precedes it is the row up to its final comma
+                prefix = format_row([current["role"], email, ""])[:-1]
+                file.seek(current["offset"] + len(prefix.encode()))
+                file.write(encrypted_password.encode())
+                file.flush()
+                os.fsync(file.fileno())
+            self.index.record_write(email.encode(), current["offset"])
+            self.version.bump()
+
+    def _put_account(self, email, role, encrypted_password):
+        def apply(kind, accounts):
+            accounts[email] = {"role": role, "password": encrypted_password}
+        self.storage.upsert("accounts", (role, email, encrypted_password), apply)
 
     def encrypt_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
@@ -37,62 +148,65 @@ class Authentication:
         return True
 
     def create_new_account(self, email, password, role):
-        accounts = self.read_data()
-
         if not self.validate_not_null(email, "Email"):
             return
 
         if not self.validate_not_null(password, "Password"):
             return
 
-        if email in accounts:
+        if self.find_account(email) is not None:
             click.echo("Account already exists.")
             return
 
         encrypted_password = self.encrypt_password(password)
-        accounts[email] = {
-            "role": role,
-            "password": encrypted_password
-        }
-        self.write_data(accounts)
+        try:
+            self.append_account(email, role, encrypted_password)
+        except ConflictError as error:
+            click.echo(f"{error}.")
+            return
         click.echo("Account created successfully")
+        return True
 
+    @timed("authentication.login")
     def login(self, email, password):
-        accounts = self.read_data()
+        account = self.find_account(email)
 
-        if email not in accounts:
+        if account is None:
             click.echo("Account does not exist.")
             return None
 
         encrypted_password = self.encrypt_password(password)
-        if accounts[email]["password"] == encrypted_password:
-            return accounts[email]["role"]
+        if account["password"] == encrypted_password:
+            return account["role"]
         else:
             click.echo("Incorrect password")
             return None
 
     def change_password(self, email, old_password, new_password):
-        accounts = self.read_data()
+        account = self.find_account(email)
 
-        if email not in accounts:
+        if account is None:
             click.echo("Account does not exist")
             return
 
         encrypted_old_password = self.encrypt_password(old_password)
-        if accounts[email]["password"] != encrypted_old_password:
+        if account["password"] != encrypted_old_password:
             click.echo("Old password is incorrect")
             return
         
-        accounts[email]["password"] = self.encrypt_password(new_password)
-        self.write_data(accounts)
+        try:
+            self.update_password(email, account, self.encrypt_password(new_password))
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Password changed successfully")
+        return True
 
     def print_account_details(self, email):
-        accounts = self.read_data()
+        info = self.find_account(email)
 
-        if email not in accounts:
+        if info is None:
             click.echo("Account not found.")
             return
 
-        info = accounts[email]
         click.echo(f"Email: {email}, Role: {info['role']}, Encrypted Password: {info['password']}")
\ No newline at end of file
@@ -0,0 +1,351 @@
+import io
+import os
+import sys
+import json
+import random
+import shutil
+import hashlib
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+import click
+import grade_scale
+from table_cache import table_cache
+
+FIRST_NAMES = ["Isabella", "Savannah", "Mila", "Claire", "Nathan", "Alexa", "Victoria", "Eli", "Ava",
+               "Stella", "Thomas", "Audrey", "Liam", "Julian", "Zoey", "Charles", "Riley", "Paisley",
+               "Harper", "Henry", "Evelyn", "Noah", "Olivia", "Mason", "Sophia", "Lucas", "Amelia"]
+LAST_NAMES = ["Ward", "Chapman", "Mitchell", "Bell", "Peterson", "Gray", "Wright", "Sanchez", "Howard",
+              "Morris", "Reynolds", "Turner", "Allen", "Clark", "Robinson", "Taylor", "Moore", "Jackson",
+              "Carter", "Johnson", "Reed", "Ford", "Bennett", "Hill", "Young", "Martinez", "Rodriguez"]
+RANKS = ["Lecturer", "Assistant Professor", "Associate Professor", "Full Professor"]
+COURSE_COUNT = 50
+PASSWORD = "password"
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+
+def generate_dataset(output_dir, student_count, seed=0):
+    """Write deterministic student, course, professor and authentication CSVs into output_dir"""
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    course_ids = [f"CS{100 + i}" for i in range(COURSE_COUNT)]
+    encrypted_password = hashlib.sha256(PASSWORD.encode()).hexdigest()
+
+    with open(os.path.join(output_dir, "course.csv"), "w") as file:
+        for i, course_id in enumerate(course_ids):
+            file.write(f"{course_id},Course {i},{rng.choice([3, 4])},Description of course {i}\n")
+
+    with open(os.path.join(output_dir, "professor.csv"), "w") as file, \
+            open(os.path.join(output_dir, "authentication.csv"), "w") as auth_file:
+        for i, course_id in enumerate(course_ids):
+            email = f"prof{i}@university.edu"
+            name = f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+            file.write(f"{email},{name},{rng.choice(RANKS)},{course_id}\n")
+            auth_file.write(f"Professor,{email},{encrypted_password}\n")
+
+        with open(os.path.join(output_dir, "student.csv"), "w") as student_file:
+            for i in range(student_count):
+                email = f"student{i}@university.edu"
+                first_name = rng.choice(FIRST_NAMES)
+                last_name = f"{rng.choice(LAST_NAMES)}{i}"
+                mark = round(rng.uniform(40, 100), 1)
+                student_file.write(f"{email},{first_name},{last_name},{rng.choice(course_ids)},"
+                                   f"{grade_scale.mark_to_grade(mark)},{mark}\n")
+                auth_file.write(f"Student,{email},{encrypted_password}\n")
+
+
+@contextmanager
+def scripted_input(*answers):
+    """Feed answers to click.prompt through stdin"""
+    old_stdin = sys.stdin
+    sys.stdin = io.StringIO("".join(f"{answer}\n" for answer in answers))
+    try:
+        yield
+    finally:
+        sys.stdin = old_stdin
+
+
+def percentile(sorted_samples, fraction):
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * len(sorted_samples))) - 1))
+    return sorted_samples[index]
+
+
+class Benchmark:
+    """Times every read, query, report and mutator against one generated dataset"""
+
+    def __init__(self, data_dir, repeat):
+        from student import Student
+        from grades import Grades
+        from course import Course
+        from professor import Professor
+        from authentication import Authentication
+
+        self.data_dir = data_dir
+        self.repeat = repeat
+        self.student = Student()
+        self.grades = Grades()
+        self.course = Course()
+        self.professor = Professor()
+        self.auth = Authentication()
+        (self.first_name, self.last_name), info = next(iter(self.student.read_data().items()))
+        self.course_id = info["course_id"]
+        self.professor_name = next(iter(self.professor.read_data()))
+
+    def operations(self):
+        student, grades, course, professor, auth = self.student, self.grades, self.course, self.professor, self.auth
+
+        def cold(table):
+            # Parse without going through (or disturbing) the shared table cache
+            return lambda i: table._parse_file()
+
+        def add_student(i):
+            with scripted_input(f"Bench{i}", "Student", f"bench{i}@bench.edu", "CS100", 1, "88"):
+                student.add_new_student()
+
+        def modify_student(i):
+            with scripted_input(4, "91"):
+                student.modify_student_details(f"Bench{i}", "Student")
+
+        def add_grade(i):
+            with scripted_input("yes", f"grade{i}@bench.edu", 1, "77"):
+                grades.add_student_grade(f"Grade{i}", "Student", "CS101")
+
+        def modify_grade(i):
+            with scripted_input(2, "79"):
+                grades.modify_student_grade(f"Grade{i}", "Student", "CS101")
+
+        def add_professor(i):
+            with scripted_input(f"Bench Professor {i}", f"benchprof{i}@bench.edu", "Lecturer", "CS100"):
+                professor.add_new_professor()
+
+        def modify_professor(i):
+            with scripted_input(2, "Full Professor"):
+                professor.modify_professor_details(f"Bench Professor {i}")
+
+        def add_course(i):
+            with scripted_input(f"BENCH{i}", "Benchmark Course", "3", "Benchmark"):
+                course.add_new_course()
+
+        def modify_course(i):
+            with scripted_input(f"BENCH{i}", "Benchmark Course II", "4", "Benchmark"):
+                course.modify_course_details()
+
+        return [
+            ("student.read_data (parse)", cold(student)),
+            ("grades.read_data (parse)", cold(grades)),
+            ("course.read_data (parse)", cold(course)),
+            ("professor.read_data (parse)", cold(professor)),
+            ("authentication.read_data (parse)", cold(auth)),
+            ("student.read_data (cached)", lambda i: student.read_data()),
+            ("sort_students_by_name", lambda i: student.sort_students_by_name("asc")),
+            ("sort_students_by_marks", lambda i: student.sort_students_by_marks("desc")),
+            ("sort_students_by_email", lambda i: student.sort_students_by_email("asc")),
+            ("sort_students_by_marks (top 20 in course)",
+             lambda i: student.sort_students_by_marks("desc", 20, 0, self.course_id)),
+            ("search_student", lambda i: student.search_student("ward1")),
+            ("get_mean_grade", lambda i: student.get_mean_grade("CS100")),
+            ("get_median_grade", lambda i: student.get_median_grade("CS100")),
+            ("generate_course_wise_report", lambda i: course.generate_course_wise_report("CS100")),
+            ("generate_professor_wise_report", lambda i: professor.generate_professor_wise_report(self.professor_name)),
+            ("generate_student_wise_report", lambda i: student.generate_student_wise_report(self.first_name, self.last_name)),
+            ("display_grade_report", lambda i: grades.display_grade_report(self.first_name, self.last_name, self.course_id)),
+            ("login", lambda i: auth.login("student1@university.edu", PASSWORD)),
+            ("add_new_student", add_student),
+            ("modify_student_details", modify_student),
+            ("add_student_grade", add_grade),
+            ("modify_student_grade", modify_grade),
+            ("delete_student_grade", lambda i: grades.delete_student_grade(f"Grade{i}", "Student", "CS101")),
+            ("delete_student", lambda i: student.delete_student(f"Bench{i}", "Student")),
+            ("add_new_professor", add_professor),
+            ("modify_professor_details", modify_professor),
+            ("delete_professor", lambda i: professor.delete_professor(f"Bench Professor {i}")),
+            ("add_new_course", add_course),
+            ("modify_course_details", modify_course),
+            ("delete_course", lambda i: course.delete_course(f"BENCH{i}")),
+            ("create_new_account", lambda i: auth.create_new_account(f"bench{i}@bench.edu", PASSWORD, "Student")),
+            ("change_password", lambda i: auth.change_password(f"bench{i}@bench.edu", PASSWORD, "changed")),
+        ]
+
+    def run(self):
+        """Return {operation: stats}.  Run i of every operation happens before run i + 1 of any."""
+        operations = self.operations()
+        samples = {name: [] for name, operation in operations}
+        peak_memory = {}
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            for i in range(self.repeat + 1):
+                for name, operation in operations:
+                    if i == self.repeat:
+                        # One extra pass under tracemalloc, kept out of the latency numbers
+                        tracemalloc.start()
+                        operation(i)
+                        peak_memory[name] = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                        continue
+                    start = time.perf_counter_ns()
+                    operation(i)
+                    samples[name].append(time.perf_counter_ns() - start)
+
+        results = {}
+        for name, timings in samples.items():
+            timings.sort()
+            total_seconds = sum(timings) / 1e9
+            results[name] = {
+                "runs": len(timings),
+                "throughput_per_second": len(timings) / total_seconds if total_seconds else None,
+                "p50_ms": percentile(timings, 0.50) / 1e6,
+                "p99_ms": percentile(timings, 0.99) / 1e6,
+                "peak_memory_bytes": peak_memory[name]
+            }
+        return results
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=5, seed=0, work_dir=None):
+    """Generate a dataset per size, run every operation against it and return the results"""
+    report = {"python": sys.version.split()[0], "repeat": repeat, "seed": seed, "sizes": {}}
+    original_dir = os.getcwd()
+    for size in sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"checkmygrade-{size}-", dir=work_dir)
+        try:
+            generate_dataset(data_dir, size, seed)
+            os.chdir(data_dir)
+            table_cache.invalidate()
+            report["sizes"][str(size)] = Benchmark(data_dir, repeat).run()
+        finally:
+            os.chdir(original_dir)
+            table_cache.invalidate()
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+
+def _quoted_copy(source_path, target_path):
+    """Copy a CSV with every field quoted, which forces the csv module's reader instead of the bulk split"""
+    from csv_format import read_rows
+    import csv
+    with open(target_path, "w", newline="") as file:
+        csv.writer(file, quoting=csv.QUOTE_ALL, lineterminator="\n").writerows(read_rows(source_path, 6))
+
+
+def run_parse_benchmarks(sizes=DEFAULT_SIZES, repeat=5, seed=0, work_dir=None):
+    """Rows per second of the raw CSV reader and of the full table parsers, per generated size"""
+    from csv_format import read_rows
+    from student import Student
+    from authentication import Authentication
+
+    report = {"python": sys.version.split()[0], "repeat": repeat, "seed": seed, "sizes": {}}
+    original_dir = os.getcwd()
+    for size in sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"checkmygrade-parse-{size}-", dir=work_dir)
+        try:
+            generate_dataset(data_dir, size, seed)
+            os.chdir(data_dir)
+            _quoted_copy("student.csv", "student_quoted.csv")
+            cases = [
+                ("read_rows student.csv", lambda: sum(1 for fields in read_rows("student.csv", 6))),
+                ("read_rows student.csv (quoted)", lambda: sum(1 for fields in read_rows("student_quoted.csv", 6))),
+                ("read_rows authentication.csv", lambda: sum(1 for fields in read_rows("authentication.csv", 3))),
+                ("Student._parse_file", lambda: len(Student()._parse_file())),
+                ("Authentication._parse_file", lambda: len(Authentication()._parse_file())),
+            ]
+            results = {}
+            for name, parse in cases:
+                timings = []
+                for i in range(repeat):
+                    start = time.perf_counter_ns()
+                    rows = parse()
+                    timings.append(time.perf_counter_ns() - start)
+                timings.sort()
+                median_seconds = percentile(timings, 0.50) / 1e9
+                results[name] = {
+                    "rows": rows,
+                    "p50_ms": median_seconds * 1e3,
+                    "rows_per_second": rows / median_seconds if median_seconds else None
+                }
+            report["sizes"][str(size)] = results
+        finally:
+            os.chdir(original_dir)
+            table_cache.invalidate()
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from student import Student
+from grades import Grades
+from course import Course
+from professor import Professor
+from authentication import Authentication
+tables = {}
+for cls in (Student, Grades, Course, Professor, Authentication):
+    table_start = time.perf_counter()
+    cls().read_data()
+    tables[cls.__name__] = (time.perf_counter() - table_start) * 1e3
+json.dump({"load_ms": (time.perf_counter() - start) * 1e3, "tables_ms": tables}, sys.stdout)
+"""
+
+
+def _startup_run(data_dir, snapshots):
+    """Load every table in a fresh interpreter; return its timings plus the process wall time"""
+    import subprocess
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)), CHECKMYGRADE_SNAPSHOTS=snapshots)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=data_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout)
+    timings["process_ms"] = (time.perf_counter() - start) * 1e3
+    return timings
+
+
+def run_startup_benchmarks(sizes=DEFAULT_SIZES, seed=0, work_dir=None):
+    """Time a fresh process loading every table: without snapshots, writing them, and from them"""
+    report = {"python": sys.version.split()[0], "seed": seed, "sizes": {}}
+    for size in sizes:
+        data_dir = tempfile.mkdtemp(prefix=f"checkmygrade-startup-{size}-", dir=work_dir)
+        try:
+            generate_dataset(data_dir, size, seed)
+            report["sizes"][str(size)] = {
+                "cold": _startup_run(data_dir, "0"),
+                "cold_writing_snapshots": _startup_run(data_dir, "1"),
+                "warm": _startup_run(data_dir, "1")
+            }
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return report
+
+
+@click.command()
+@click.option("--size", "sizes", type=int, multiple=True, help="Student rows to generate (repeatable).")
+@click.option("--repeat", default=5, show_default=True, help="Timed runs per operation.")
+@click.option("--seed", default=0, show_default=True, help="Seed for the dataset generator.")
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the JSON report here instead of stdout.")
+@click.option("--generate-only", type=click.Path(file_okay=False),
+              help="Only write a dataset of the first --size into this directory.")
+@click.option("--parse", "parse_only", is_flag=True, help="Only measure CSV parse throughput (rows per second).")
+@click.option("--startup", "startup_only", is_flag=True,
+              help="Only measure cold and warm (snapshot) startup of a fresh process.")
+def main(sizes, repeat, seed, output, generate_only, parse_only, startup_only):
+    """Benchmark CheckMyGrade operations on generated datasets and print JSON results."""
+    sizes = sizes or DEFAULT_SIZES
+    if generate_only:
+        generate_dataset(generate_only, sizes[0], seed)
+        click.echo(f"Generated {sizes[0]} students in {generate_only}")
+        return
+
+    if startup_only:
+        report = run_startup_benchmarks(sizes, seed)
+    elif parse_only:
+        report = run_parse_benchmarks(sizes, repeat, seed)
+    else:
+        report = run_benchmarks(sizes, repeat, seed)
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+    else:
+        click.echo(text)
+
+
+if __name__ == "__main__":
+    main()
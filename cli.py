@@ -0,0 +1,471 @@
+import sys
+import functools
+import click
+from output_writer import FORMATS
+
+# Every command imports the record classes it uses when it runs, so a
+# command only pays for the modules it needs and nothing waits on the
+# interactive welcome screen.
+
+LISTING_FORMATS = ("auto",) + FORMATS
+USER_ENV = "CHECKMYGRADE_USER"
+PASSWORD_ENV = "CHECKMYGRADE_PASSWORD"
+
+
+def _succeeded(result):
+    """Exit with status 1 unless the record method reported success, so scripts can stop on errors"""
+    if not result:
+        sys.exit(1)
+
+
+def _professor_only(command):
+    """Run command only once the --user account has logged in as a Professor, as the menu's write actions need"""
+    @functools.wraps(command)
+    def checked(*args, **kwargs):
+        login = click.get_current_context().find_root().params
+        email, password = login["user"], login["password"]
+        if email is None:
+            raise click.UsageError(f"Changing records needs a Professor login; pass --user or set {USER_ENV}.")
+        if password is None:
+            password = click.prompt("Password", hide_input=True)
+        from authentication import Authentication
+        role = Authentication().login(email, password)
+        if role != "Professor":
+            if role is not None:
+                click.echo("Only professors can change records.")
+            sys.exit(1)
+        return command(*args, **kwargs)
+    return checked
+
+
+def _require_one(**options):
+    """Reject a call that passes none of the given optional values"""
+    if all(value is None for value in options.values()):
+        names = ", ".join("--" + name.replace("_", "-") for name in options)
+        raise click.UsageError(f"Give at least one of {names}.")
+
+
+@click.group(invoke_without_command=True)
+@click.option("--user", envvar=USER_ENV, help=f"Professor account for commands that change records [env: {USER_ENV}].")
+@click.option("--password", envvar=PASSWORD_ENV, help=f"Its password [env: {PASSWORD_ENV}; prompted if left off].")
+@click.pass_context
+def cli(ctx, user, password):
+    """CheckMyGrade student, course, professor and grade records.
+
+    Run without a command for the interactive menu.  Commands take every
+    value as an argument or option and never prompt (except for passwords
+    left off the command line), so they can be scripted.  Commands that
+    add, change, delete, enter or import records need a Professor login,
+    as in the menu: pass --user and --password before the command, or set
+    them in the environment.  A command that changes a record exits with
+    status 1 when the login or the change is refused.  Set
+    CHECKMYGRADE_LATENCY_FILE to a path to get the run's per-operation
+    latency histograms written there as JSON on exit.
+    """
+    import transaction
+    transaction.recover()  # Finish a multi-file write cut short by a crash before reading anything
+    if ctx.invoked_subcommand is None:
+        from main import CheckMyGradeApp
+        CheckMyGradeApp().main_menu()
+
+
+@cli.group()
+def student():
+    """Add, change, delete, list and search students."""
+
+
+@student.command("add")
+@click.argument("first_name")
+@click.argument("last_name")
+@click.option("--email", required=True)
+@click.option("--course-id", required=True)
+@click.option("--mark", help="Mark from 0 to 100; the grade is derived from it.")
+@click.option("--grade", help="Letter grade A-F; a representative mark is assigned.")
+@_professor_only
+def student_add(first_name, last_name, email, course_id, mark, grade):
+    """Add a student."""
+    _require_one(mark=mark, grade=grade)
+    from student import Student
+    _succeeded(Student().add_new_student(first_name, last_name, email, course_id, grade, mark))
+
+
+@student.command("modify")
+@click.argument("first_name")
+@click.argument("last_name")
+@click.option("--email")
+@click.option("--course-id")
+@click.option("--mark")
+@click.option("--grade")
+@_professor_only
+def student_modify(first_name, last_name, email, course_id, mark, grade):
+    """Change a student's email, course, mark or grade."""
+    _require_one(email=email, course_id=course_id, mark=mark, grade=grade)
+    from student import Student
+    _succeeded(Student().modify_student_details(first_name, last_name, email, course_id, grade, mark))
+
+
+@student.command("delete")
+@click.argument("first_name")
+@click.argument("last_name")
+@_professor_only
+def student_delete(first_name, last_name):
+    """Delete a student."""
+    from student import Student
+    _succeeded(Student().delete_student(first_name, last_name))
+
+
+@student.command("show")
+@click.argument("first_name", required=False)
+@click.argument("last_name", required=False)
+@click.option("--email", help="Find the student by email instead of name.")
+def student_show(first_name, last_name, email):
+    """Print a student's record."""
+    from student import Student
+    if email is not None:
+        found = Student().find_student_by_email(email)
+        if found is None:
+            click.echo("Student not found.")
+            sys.exit(1)
+        first_name, last_name = found[0]
+    elif last_name is None:
+        raise click.UsageError("Give FIRST_NAME and LAST_NAME, or --email.")
+    Student().get_student_details(first_name, last_name)
+
+
+@student.command("list")
+@click.option("--by", "sort_by", type=click.Choice(["name", "marks", "email"]), default="name", show_default=True)
+@click.option("--order", type=click.Choice(["asc", "desc"]), default="asc", show_default=True)
+@click.option("--course-id", help="Only list the students of this course.")
+@click.option("--limit", type=click.IntRange(min=1), help="Show at most this many students.")
+@click.option("--offset", type=click.IntRange(min=0), default=0, help="Skip this many students first.")
+@click.option("--format", "output_format", type=click.Choice(LISTING_FORMATS), default="auto", show_default=True,
+              help="auto is table on a terminal and csv otherwise.")
+def student_list(sort_by, order, course_id, limit, offset, output_format):
+    """List students sorted by name, marks or email."""
+    from student import Student
+    student_obj = Student()
+    sort = {"name": student_obj.sort_students_by_name,
+            "marks": student_obj.sort_students_by_marks,
+            "email": student_obj.sort_students_by_email}[sort_by]
+    sort(order, limit, offset, course_id, output_format)
+
+
+@student.command("search")
+@click.argument("term")
+@click.option("--format", "output_format", type=click.Choice(LISTING_FORMATS), default="auto", show_default=True)
+def student_search(term, output_format):
+    """Find students by name, email or course ID."""
+    from student import Student
+    Student().search_student(term, output_format)
+
+
+@cli.group()
+def grades():
+    """Add, set, delete, show and import grades."""
+
+
+@grades.command("add")
+@click.argument("first_name")
+@click.argument("last_name")
+@click.argument("course_id")
+@click.option("--mark")
+@click.option("--grade")
+@click.option("--email", help="Creates the student with this email if they are not on record.")
+@click.option("--allow-unassigned", is_flag=True, help="Accept a course without a professor.")
+@_professor_only
+def grades_add(first_name, last_name, course_id, mark, grade, email, allow_unassigned):
+    """Add a grade for a student in a course."""
+    _require_one(mark=mark, grade=grade)
+    from grades import Grades
+    from student import Student
+    if (first_name, last_name) not in Student().read_data() and email is None:
+        raise click.UsageError(f"{first_name} {last_name} is not on record; pass --email to create them.")
+    _succeeded(Grades().add_student_grade(first_name, last_name, course_id, email, grade, mark, allow_unassigned))
+
+
+@grades.command("set")
+@click.argument("first_name")
+@click.argument("last_name")
+@click.argument("course_id")
+@click.option("--mark")
+@click.option("--grade")
+@_professor_only
+def grades_set(first_name, last_name, course_id, mark, grade):
+    """Change a grade by mark or by letter."""
+    _require_one(mark=mark, grade=grade)
+    from grades import Grades
+    _succeeded(Grades().modify_student_grade(first_name, last_name, course_id, grade=grade, mark=mark))
+
+
+@grades.command("delete")
+@click.argument("first_name")
+@click.argument("last_name")
+@click.argument("course_id")
+@_professor_only
+def grades_delete(first_name, last_name, course_id):
+    """Delete a grade."""
+    from grades import Grades
+    _succeeded(Grades().delete_student_grade(first_name, last_name, course_id))
+
+
+@grades.command("show")
+@click.argument("first_name")
+@click.argument("last_name")
+@click.argument("course_id")
+def grades_show(first_name, last_name, course_id):
+    """Print the grade report of a student in a course."""
+    from grades import Grades
+    Grades().display_grade_report(first_name, last_name, course_id)
+
+
+@grades.command("enter")
+@click.argument("course_id")
+@click.option("--allow-unassigned", is_flag=True, help="Accept a course without a professor.")
+@_professor_only
+def grades_enter(course_id, allow_unassigned):
+    """Enter the grades of a course's roster one student after another, saved in one write."""
+    from grades import Grades
+    _succeeded(Grades().enter_course_grades(course_id, allow_unassigned))
+
+
+@grades.command("import")
+@click.argument("source_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--rejects", "rejects_path", type=click.Path(dir_okay=False),
+              help="Where to write rejected rows [default: SOURCE_PATH.rejects.csv].")
+@click.option("--allow-unassigned", is_flag=True, help="Accept courses without a professor.")
+@_professor_only
+def grades_import(source_path, rejects_path, allow_unassigned):
+    """Import grades from a CSV or JSON Lines file; exits 1 if any row is rejected."""
+    from grades import Grades
+    imported, rejected = Grades().import_grades(source_path, rejects_path, allow_unassigned)
+    _succeeded(not rejected)
+
+
+@cli.group()
+def course():
+    """Add, change, delete and show courses."""
+
+
+@course.command("add")
+@click.argument("course_id")
+@click.option("--name", "course_name", required=True)
+@click.option("--credits", required=True)
+@click.option("--description", default="")
+@_professor_only
+def course_add(course_id, course_name, credits, description):
+    """Add a course."""
+    from course import Course
+    _succeeded(Course().add_new_course(course_id, course_name, credits, description))
+
+
+@course.command("modify")
+@click.argument("course_id")
+@click.option("--name", "course_name")
+@click.option("--credits")
+@click.option("--description")
+@_professor_only
+def course_modify(course_id, course_name, credits, description):
+    """Change a course's name, credits or description."""
+    _require_one(name=course_name, credits=credits, description=description)
+    from course import Course
+    _succeeded(Course().modify_course_details(course_id, course_name, credits, description))
+
+
+@course.command("delete")
+@click.argument("course_id")
+@_professor_only
+def course_delete(course_id):
+    """Delete a course."""
+    from course import Course
+    _succeeded(Course().delete_course(course_id))
+
+
+@course.command("show")
+@click.argument("course_id")
+def course_show(course_id):
+    """Print a course's record."""
+    from course import Course
+    Course().print_course_details(course_id)
+
+
+@cli.group()
+def professor():
+    """Add, change, delete and show professors."""
+
+
+@professor.command("add")
+@click.argument("name")
+@click.option("--email", required=True)
+@click.option("--rank", required=True)
+@click.option("--course-id", required=True)
+@_professor_only
+def professor_add(name, email, rank, course_id):
+    """Add a professor."""
+    from professor import Professor
+    _succeeded(Professor().add_new_professor(name, email, rank, course_id))
+
+
+@professor.command("modify")
+@click.argument("name")
+@click.option("--email")
+@click.option("--rank")
+@click.option("--course-id")
+@_professor_only
+def professor_modify(name, email, rank, course_id):
+    """Change a professor's email, rank or course."""
+    _require_one(email=email, rank=rank, course_id=course_id)
+    from professor import Professor
+    _succeeded(Professor().modify_professor_details(name, email, rank, course_id))
+
+
+@professor.command("delete")
+@click.argument("name")
+@_professor_only
+def professor_delete(name):
+    """Delete a professor."""
+    from professor import Professor
+    _succeeded(Professor().delete_professor(name))
+
+
+@professor.command("show")
+@click.argument("name")
+def professor_show(name):
+    """Print a professor's record."""
+    from professor import Professor
+    Professor().get_professor_details(name)
+
+
+@cli.group()
+def report():
+    """Course, professor and student reports."""
+
+
+@report.command("course")
+@click.argument("course_id")
+@click.option("--format", "output_format", type=click.Choice(LISTING_FORMATS), default="auto", show_default=True)
+def report_course(course_id, output_format):
+    """Report a course and its students."""
+    from course import Course
+    Course().generate_course_wise_report(course_id, output_format)
+
+
+@report.command("professor")
+@click.argument("name")
+@click.option("--format", "output_format", type=click.Choice(LISTING_FORMATS), default="auto", show_default=True)
+def report_professor(name, output_format):
+    """Report a professor and the students of their course."""
+    from professor import Professor
+    Professor().generate_professor_wise_report(name, output_format)
+
+
+@report.command("student")
+@click.argument("first_name")
+@click.argument("last_name")
+def report_student(first_name, last_name):
+    """Report a student."""
+    from student import Student
+    Student().generate_student_wise_report(first_name, last_name)
+
+
+@report.command("all")
+@click.option("--output-dir", default="reports", show_default=True, type=click.Path(file_okay=False))
+@click.option("--workers", type=click.IntRange(min=1), help="Report writer processes [default: one per CPU].")
+def report_all(output_dir, workers):
+    """Write a text and a JSON report for every course."""
+    from course import Course
+    Course().generate_all_course_reports(output_dir, workers)
+
+
+@cli.group()
+def stats():
+    """Grade statistics."""
+
+
+@stats.command("mean")
+@click.argument("course_id")
+def stats_mean(course_id):
+    """Average mark of a course."""
+    from student import Student
+    mean = Student().get_mean_grade(course_id)
+    click.echo(f"Average grade for {course_id}: {mean:.2f}")
+
+
+@stats.command("median")
+@click.argument("course_id")
+def stats_median(course_id):
+    """Median mark of a course."""
+    from student import Student
+    median = Student().get_median_grade(course_id)
+    click.echo(f"Median grade for {course_id}: {median:.2f}")
+
+
+@stats.command("all")
+@click.option("--format", "output_format", type=click.Choice(["table", "json"]), default="table", show_default=True)
+def stats_all(output_format):
+    """Count, mean, median, spread and grade distribution of every course (needs NumPy)."""
+    from grade_analytics import GradeAnalytics
+    GradeAnalytics().display(output_format)
+
+
+@cli.group()
+def account():
+    """Create accounts and change passwords."""
+
+
+@account.command("create")
+@click.argument("email")
+@click.option("--role", type=click.Choice(["Student", "Professor"], case_sensitive=False), required=True)
+@click.option("--password", prompt=True, hide_input=True, confirmation_prompt=True)
+def account_create(email, role, password):
+    """Create a login account."""
+    from authentication import Authentication
+    _succeeded(Authentication().create_new_account(email, password, role.capitalize()))
+
+
+@account.command("passwd")
+@click.argument("email")
+@click.option("--old-password", prompt=True, hide_input=True)
+@click.option("--new-password", prompt=True, hide_input=True, confirmation_prompt=True)
+def account_passwd(email, old_password, new_password):
+    """Change an account's password."""
+    from authentication import Authentication
+    _succeeded(Authentication().change_password(email, old_password, new_password))
+
+
+@cli.group()
+def db():
+    """Copy data between the CSV files and a SQLite database."""
+
+
+@db.command("import")
+@click.option("--db", "db_path", default="checkmygrade.db", show_default=True, help="SQLite database to fill.")
+@click.pass_context
+def db_import(ctx, db_path):
+    """Copy every CSV file into the database, replacing its tables."""
+    import storage
+    ctx.invoke(storage.import_command, db_path=db_path)
+
+
+@db.command("export")
+@click.option("--db", "db_path", default="checkmygrade.db", show_default=True, help="SQLite database to read.")
+@click.pass_context
+def db_export(ctx, db_path):
+    """Write every table of the database back to its CSV file."""
+    import storage
+    ctx.invoke(storage.export_command, db_path=db_path)
+
+
+@cli.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8765, show_default=True)
+@click.option("--socket", "socket_path", type=click.Path(dir_okay=False), help="Listen on a Unix socket instead.")
+@click.option("--allow-remote", is_flag=True, help="Allow a --host other than a loopback address.")
+@click.pass_context
+def serve(ctx, host, port, socket_path, allow_remote):
+    """Keep every table in memory and answer JSON-RPC requests (see server.py)."""
+    import server
+    ctx.invoke(server.serve_command, host=host, port=port, socket_path=socket_path, allow_remote=allow_remote)
+
+
+if __name__ == "__main__":
+    cli()
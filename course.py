@@ -1,34 +1,83 @@
 import os
 import click
+import grade_scale
+from table_cache import table_cache
+from output_writer import OutputWriter
+from csv_format import read_rows, write_rows
+from file_lock import FileVersion, ConflictError, merge_edit, optimistic_update, replace_file
+from instrumentation import timed
+
+REPORT_FIELDS = ("first_name", "last_name", "email", "grade", "mark")
 
 class Course:
     def __init__(self):
         self.file_path = "course.csv"
+        from storage import open_storage
+        self.storage = open_storage()
+        self.version = FileVersion(self.file_path)
 
+    @timed("course.read_data")
     def read_data(self):
+        if self.storage:
+            return self.storage.load("courses", "courses", self._records_from_rows)
+        return table_cache.load(self.file_path, "courses", self._parse_file, depends_on=(self.version.path,))
+
+    def _records_from_rows(self, rows):
+        return {course_id: {"course_name": course_name, "credits": credits, "description": description}
+                for course_id, course_name, credits, description in rows}
+
+    @timed("course.parse")
+    def _parse_file(self):
         courses = {}
-        if os.path.exists(self.file_path):
-            with open(self.file_path, "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line:  # Skip empty lines
-                        continue
-                    try:
-                        course_id, course_name, credits, description = line.split(",")
-                        courses[course_id] = {
-                            "course_name": course_name,
-                            "credits": credits,
-                            "description": description
-                        }
-                    except ValueError as e:
-                        click.echo(f"Warning: Skipping malformed line in {self.file_path}: {line}")
-                        continue
+        for course_id, course_name, credits, description in read_rows(self.file_path, 4):
+            courses[course_id] = {
+                "course_name": course_name,
+                "credits": credits,
+                "description": description
+            }
         return courses
 
-    def write_data(self, data):
-        with open(self.file_path, "w") as file:
-            for course_id, info in data.items():
-                file.write(f"{course_id},{info['course_name']},{info['credits']},{info['description']}\n")
+    @timed("course.write_data")
+    def write_data(self, data, expected_version=None):
+        if self.storage:
+            rows = [(course_id, info['course_name'], info['credits'], info['description'])
+                    for course_id, info in data.items()]
+            self.storage.replace("courses", rows, "courses", data, expected_version)
+            return
+        with self.version.locked():
+            self.version.check(expected_version)
+            with replace_file(self.file_path) as file:
+                write_rows(file, ((course_id, info['course_name'], info['credits'], info['description'])
+                                  for course_id, info in data.items()))
+            self.version.bump()
+            table_cache.store(self.file_path, "courses", data, depends_on=(self.version.path,))
+
+    def current_version(self):
+        return self.storage.version("courses") if self.storage else self.version.current()
+
+    def update_data(self, change):
+        """Apply change(courses) to a copy of the latest table and write it back.
+
+        Retried from a fresh read whenever another session wrote the table in
+        between, so concurrent edits of different courses are all kept.
+        """
+        return optimistic_update(self.current_version, lambda: dict(self.read_data()), change, self.write_data)
+
+    def save_course(self, course_id, info, based_on=None):
+        """Write one course record as an edit of based_on (None for a new course)"""
+        def change(courses):
+            courses[course_id] = merge_edit(based_on, info, courses.get(course_id))
+        self.update_data(change)
+
+    def remove_course(self, course_id, based_on):
+        def change(courses):
+            current = courses.get(course_id)
+            if current is None:
+                return False
+            if current != based_on:
+                raise ConflictError("The record was changed by another session")
+            del courses[course_id]
+        self.update_data(change)
 
     def validate_not_null(self, value, field_name):
         if not value or value.strip() == "":
@@ -36,10 +85,12 @@ class Course:
             return False
         return True
 
-    def add_new_course(self):
+    def add_new_course(self, course_id=None, course_name=None, credits=None, description=None):
+        """Add a course, prompting only for the details that were not passed in"""
         courses = self.read_data()
-        click.echo("Please provide the following details to add a new course:")
-        course_id = click.prompt("Course ID")
+        if course_id is None:
+            click.echo("Please provide the following details to add a new course:")
+            course_id = click.prompt("Course ID")
 
         if not self.validate_not_null(course_id, "Course ID"):
             return
@@ -48,25 +99,34 @@ class Course:
             click.echo("Course already exists.")
             return
         
-        course_name = click.prompt("Course Name")
+        if course_name is None:
+            course_name = click.prompt("Course Name")
         if not self.validate_not_null(course_name, "Course Name"):
             return
 
-        credits = click.prompt("Credits")
-        description = click.prompt("Description")
-
-        courses[course_id] = {
-            "course_name": course_name,
-            "credits": credits,
-            "description": description
-        }
-        self.write_data(courses)
+        if credits is None:
+            credits = click.prompt("Credits")
+        if description is None:
+            description = click.prompt("Description")
+
+        try:
+            self.save_course(course_id, {
+                "course_name": course_name,
+                "credits": credits,
+                "description": description
+            })
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("The new course record has been added.")
         self.print_course_details(course_id)
+        return True
 
-    def modify_course_details(self):
-        click.echo("Please provide the following details to modify a course:")
-        course_id = click.prompt("Course ID")
+    def modify_course_details(self, course_id=None, course_name=None, credits=None, description=None):
+        """Change a course; without any new value every field is prompted for, current values as defaults"""
+        if course_id is None:
+            click.echo("Please provide the following details to modify a course:")
+            course_id = click.prompt("Course ID")
 
         courses = self.read_data()
 
@@ -74,21 +134,31 @@ class Course:
             click.echo("Course not found.")
             return
 
-        course_name = click.prompt("Course Name", default=courses[course_id]["course_name"], show_default=True)
-        credits = click.prompt("Credits", default=courses[course_id]["credits"], show_default=True)
-        description = click.prompt("Description", default=courses[course_id]["description"], show_default=True)
+        current = courses[course_id]
+        if course_name is None and credits is None and description is None:
+            course_name = click.prompt("Course Name", default=current["course_name"], show_default=True)
+            credits = click.prompt("Credits", default=current["credits"], show_default=True)
+            description = click.prompt("Description", default=current["description"], show_default=True)
+        else:
+            course_name = current["course_name"] if course_name is None else course_name
+            credits = current["credits"] if credits is None else credits
+            description = current["description"] if description is None else description
 
         if not self.validate_not_null(course_name, "Course Name"):
             return
 
-        courses[course_id] = {
-            "course_name": course_name,
-            "credits": credits,
-            "description": description
-        }
-        self.write_data(courses)
+        try:
+            self.save_course(course_id, {
+                "course_name": course_name,
+                "credits": credits,
+                "description": description
+            }, based_on=courses[course_id])
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Course information modified successfully.")
         self.print_course_details(course_id)
+        return True
 
     def delete_course(self, course_id):
         courses = self.read_data()
@@ -97,9 +167,13 @@ class Course:
             click.echo("Course not found")
             return
 
-        del courses[course_id]
-        self.write_data(courses)
+        try:
+            self.remove_course(course_id, courses[course_id])
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Course deleted successfully")
+        return True
 
     def print_course_details(self, course_id):
         courses = self.read_data()
@@ -111,66 +185,148 @@ class Course:
         info = courses[course_id]
         click.echo(f"Course ID: {course_id}, Course Name: {info['course_name']}, Credits: {info['credits']}, Description: {info['description']}")
 
-    def generate_course_wise_report(self, course_id):
+    @timed("report.course_data")
+    def course_report(self, course_id):
+        """Return the build_course_report() dict for course_id, or None if there is no such course"""
         courses = self.read_data()
 
         if course_id not in courses:
-            click.echo("Course not found.")
-            return
-
-        course_info = courses[course_id]
-
-        click.echo("\n" + "=" * 80)
-        click.echo(f"COURSE REPORT: {course_id}")
-        click.echo("=" * 80)
-        click.echo(f"Course Name: {course_info['course_name']}")
-        click.echo(f"Credits: {course_info['credits']}")
-        click.echo(f"Description: {course_info['description']}")
+            return None
 
         from professor import Professor
         professor_obj = Professor()
-        professors = professor_obj.read_data()
-        professor_name = None
-        for name, info in professors.items():
-            if info['course_id'] == course_id:
-                professor_name = name
-                break
-
-        if professor_name:
-            click.echo(f"Professor: {professor_name}")
-        else:
-            click.echo("Professor: Not assigned")
-
-        click.echo("\nEnrolled Students:")
-        click.echo("-" * 80)
+        course_professors = professor_obj.get_course_professors(course_id)
+        professor_name = ", ".join(name for name, info in course_professors)
 
         from student import Student
         student_obj = Student()
         students = student_obj.read_data()
+        enrolled = [(first_name, last_name, info) for (first_name, last_name), info in students.in_course(course_id)]
 
-        found_students = False
-        total_marks = 0
-        count = 0
-
-        for (first_name, last_name), info in students.items():
-            if info['course_id'] == course_id:
-                found_students = True
-                click.echo(f"Name: {first_name} {last_name}")
-                click.echo(f"Email: {info['email']}")
-                click.echo(f"Grade: {info['grade']}, Mark: {info['mark']}")
-                click.echo("-" * 80)
-                try:
-                    total_marks += float(info['mark'])
-                    count += 1
-                except ValueError:
-                    pass
-
-        if not found_students:
-            click.echo("No students enrolled in this course.")
-            click.echo("-" * 80)
-        else:
-            avg_mark = total_marks / count if count > 0 else 0
-            click.echo(f"Total Students: {count}")
-            click.echo(f"Average Mark: {avg_mark:.2f}")
+        return build_course_report(course_id, courses[course_id], professor_name, enrolled)
+
+    @timed("report.course")
+    def generate_course_wise_report(self, course_id, output_format="table"):
+        report = self.course_report(course_id)
+
+        if report is None:
+            click.echo("Course not found.")
+            return
+
+        with OutputWriter(output_format, REPORT_FIELDS) as writer:
+            if writer.is_table:
+                writer.text(*render_course_report_lines(report))
+            else:
+                for student in report["students"]:
+                    writer.row(student)
+
+    @timed("report.all_courses")
+    def generate_all_course_reports(self, output_dir, workers=None):
+        """Write a text and a JSON report for every course into output_dir.
+
+        Each table is read once and every course's students come from the
+        course index, in the same order course_report() lists them; the
+        reports are then rendered by a process pool.
+        """
+        courses = self.read_data()
 
-        click.echo("=" * 80)
\ No newline at end of file
+        from professor import Professor
+        professors = Professor().read_data()
+
+        from student import Student
+        students = Student().read_data()
+
+        enrolled = {course_id: [(first_name, last_name, info)
+                                for (first_name, last_name), info in students.in_course(course_id)]
+                    for course_id in courses}
+
+        os.makedirs(output_dir, exist_ok=True)
+        jobs = []
+        for course_id, course_info in courses.items():
+            professor_name = ", ".join(name for name, info in professors.teaching(course_id))
+            jobs.append((output_dir, build_course_report(course_id, course_info, professor_name,
+                                                         enrolled[course_id])))
+
+        if workers == 1 or len(jobs) < 2:
+            for job in jobs:
+                _write_course_report(job)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(_write_course_report, jobs, chunksize=max(1, len(jobs) // 32)))
+
+        click.echo(f"Generated reports for {len(jobs)} course(s) in {output_dir}")
+        return len(jobs)
+
+
+def build_course_report(course_id, course_info, professor_name, enrolled):
+    """Collect everything a course report shows; enrolled is [(first_name, last_name, info), ...]"""
+    total_marks = 0
+    count = 0
+    students = []
+    for first_name, last_name, info in enrolled:
+        students.append({
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": info["email"],
+            "grade": info["grade"],
+            "mark": info["mark"]
+        })
+        # Count marks the way the course statistics do, so a NaN mark can't turn the average into NaN
+        mark_value = grade_scale.mark_value(info["mark"])
+        if mark_value is not None:
+            total_marks += mark_value
+            count += 1
+
+    return {
+        "course_id": course_id,
+        "course_name": course_info["course_name"],
+        "credits": course_info["credits"],
+        "description": course_info["description"],
+        "professor": professor_name,
+        "students": students,
+        "total_students": count,
+        "average_mark": round(total_marks / count, 2) if count > 0 else 0
+    }
+
+
+def render_course_report_lines(report):
+    lines = [
+        "\n" + "=" * 80,
+        f"COURSE REPORT: {report['course_id']}",
+        "=" * 80,
+        f"Course Name: {report['course_name']}",
+        f"Credits: {report['credits']}",
+        f"Description: {report['description']}",
+        f"Professor: {report['professor'] or 'Not assigned'}",
+        "\nEnrolled Students:",
+        "-" * 80
+    ]
+
+    for student in report["students"]:
+        lines.append(f"Name: {student['first_name']} {student['last_name']}")
+        lines.append(f"Email: {student['email']}")
+        lines.append(f"Grade: {student['grade']}, Mark: {student['mark']}")
+        lines.append("-" * 80)
+
+    if not report["students"]:
+        lines.append("No students enrolled in this course.")
+        lines.append("-" * 80)
+    else:
+        lines.append(f"Total Students: {report['total_students']}")
+        lines.append(f"Average Mark: {report['average_mark']:.2f}")
+
+    lines.append("=" * 80)
+    return lines
+
+
+def _write_course_report(job):
+    """Process pool worker: write <course_id>.txt and <course_id>.json"""
+    import json
+    output_dir, report = job
+    base_name = os.path.join(output_dir, report["course_id"].replace(os.sep, "_"))
+    with open(base_name + ".txt", "w") as file:
+        file.write("\n".join(render_course_report_lines(report)) + "\n")
+    with open(base_name + ".json", "w") as file:
+        json.dump(report, file, indent=2)
+    return report["course_id"]
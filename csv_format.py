@@ -0,0 +1,79 @@
+import io
+import gc
+import csv
+import click
+
+# Characters that force a field to be quoted on write
+_SPECIAL = (",", '"', "\n", "\r")
+
+
+def _needs_quoting(field):
+    return any(char in field for char in _SPECIAL)
+
+
+def parse_text(text):
+    """Yield the field lists of every non-blank row of a CSV text.
+
+    Text without a quote character is split in bulk with str.split, the
+    fastest way to parse the files this application writes itself; any
+    quote sends the whole text through the csv module's C reader, so quoted
+    fields holding commas, quotes or line breaks come back intact.  Like the
+    original per-line parsers, surrounding whitespace of unquoted rows is
+    ignored.
+    """
+    if '"' not in text:
+        for line in text.split("\n"):
+            line = line.strip()
+            if line:
+                yield line.split(",")
+        return
+    for fields in csv.reader(io.StringIO(text)):
+        if fields and any(field.strip() for field in fields):
+            yield fields
+
+
+def parse_line(line):
+    """Fields of a single CSV line"""
+    if '"' not in line:
+        return line.strip().split(",")
+    return next(csv.reader([line]), [])
+
+
+def format_row(fields):
+    """One CSV line (with its newline), quoting only the fields that need it"""
+    if not any(_needs_quoting(field) for field in fields):
+        return ",".join(fields) + "\n"
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(fields)
+    return buffer.getvalue()
+
+
+def write_rows(file, rows):
+    """Write rows of string fields to an open text file, quoting as format_row does"""
+    csv.writer(file, lineterminator="\n").writerows(rows)
+
+
+def read_rows(file_path, width):
+    """Yield the rows of file_path that have exactly width fields; an absent file has none.
+
+    Rows with another field count are skipped with a warning.  The cyclic
+    garbage collector is paused until the generator is exhausted or closed:
+    a table load allocates millions of objects that all stay alive, and
+    the collections they would trigger cost more than the parse itself.
+    """
+    try:
+        with open(file_path, "r", newline="") as file:
+            text = file.read()
+    except FileNotFoundError:
+        return
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for fields in parse_text(text):
+            if len(fields) != width:
+                click.echo(f"Warning: Skipping malformed line in {file_path}: {','.join(fields)}")
+                continue
+            yield fields
+    finally:
+        if gc_enabled:
+            gc.enable()
@@ -0,0 +1,199 @@
+import os
+import threading
+from contextlib import contextmanager
+import transaction
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; locking is then a no-op
+    fcntl = None
+
+WRITE_ATTEMPTS = 10
+
+# (thread ID, absolute stamp path) -> [open file, depth] for the locks this process holds.
+# Keyed by thread so another thread opens its own file and waits on the flock
+# rather than re-entering a lock taken for someone else's transaction
+_held = {}
+
+
+def _held_key(path):
+    return threading.get_ident(), os.path.abspath(path)
+
+
+class ConflictError(Exception):
+    """Another session changed the record being written since it was read"""
+
+
+class StaleVersionError(ConflictError):
+    """The file was written by another session after the caller's snapshot; re-read and retry"""
+
+
+class FileVersion:
+    """Advisory write lock and version stamp for one data file, kept in <file>.version.
+
+    Writers hold an exclusive fcntl lock on the stamp file for the short
+    critical section of a write and append one byte to it once the data is
+    on disk, so the stamp's size is a version number that grows with every
+    write.  Listing the stamp in the table cache's depends_on means a table
+    parsed before another session's write is never reused, even when the
+    data file's size and mtime look unchanged.  The lock is reentrant
+    within a thread, across every FileVersion of the same file.
+    """
+
+    def __init__(self, file_path):
+        self.path = file_path + ".version"
+
+    def current(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    @contextmanager
+    def locked(self):
+        """Hold the write lock; inside a Transaction it stays held until the transaction ends"""
+        key = _held_key(self.path)
+        held = _held.get(key)
+        if held is None:
+            file = open(self.path, "ab")
+            try:
+                if fcntl is not None:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+                held = _held[key] = [file, 0]
+                transaction.recover()
+                active = transaction.current()
+                if active is not None:
+                    held[1] += 1
+                    active.on_end(lambda: _release(key))
+            except BaseException:
+                # A failed recovery must not leave the lock held, or look re-entrant to the next writer
+                _held.pop(key, None)
+                file.close()
+                raise
+        held[1] += 1
+        try:
+            yield
+        finally:
+            _release(key)
+
+    def check(self, expected_version):
+        """Raise StaleVersionError unless the stamp still reads expected_version (None skips the check)"""
+        if expected_version is not None and self.current() != expected_version:
+            raise StaleVersionError(f"{self.path[:-len('.version')]} was changed by another session")
+
+    def bump(self):
+        """Advance the version; only call while holding the lock, after the write is durable"""
+        active = transaction.current()
+        if active is not None:
+            active.stage_bump(self.path, self._bump)
+        else:
+            self._bump()
+
+    def _bump(self):
+        file = _held[_held_key(self.path)][0]
+        file.write(b".")
+        file.flush()
+
+
+def _release(key):
+    held = _held[key]
+    held[1] -= 1
+    if not held[1]:
+        del _held[key]
+        held[0].close()  # Closing releases the flock
+
+
+@contextmanager
+def replace_file(file_path):
+    """Write a complete new version of file_path to a temporary file and rename it into place.
+
+    Inside a Transaction the rename is left to its commit.
+    """
+    active = transaction.current()
+    temp_path = active.temp_path(file_path) if active is not None else file_path + ".tmp"
+    try:
+        with open(temp_path, "w") as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    if active is not None:
+        active.stage_replace(temp_path, file_path)
+    else:
+        os.replace(temp_path, file_path)
+
+
+def merge_edit(based_on, edited, current):
+    """Three-way merge of one record: apply the fields edited since based_on to current.
+
+    based_on is the record the edit started from (None for a new record)
+    and current is the record as it is now (None if absent).  Raises
+    ConflictError when the record was created, deleted, or had one of the
+    edited fields changed by another session in the meantime, even to the
+    value this edit sets: two sessions that both raised a mark from 5 to 6
+    are two increments, not one.
+    """
+    if based_on is None:
+        if current is not None:
+            raise ConflictError("The record was created by another session")
+        return dict(edited)
+    if current is None:
+        raise ConflictError("The record was deleted by another session")
+    merged = dict(current)
+    for field, value in edited.items():
+        if value == based_on.get(field):
+            continue
+        if current.get(field) != based_on.get(field):
+            raise ConflictError(f"The {field} of the record was changed by another session")
+        merged[field] = value
+    return merged
+
+
+def optimistic_update(current_version, read, change, write):
+    """Apply change(data) to a fresh read and write it, retrying while other sessions write.
+
+    read() returns a private copy of the current table; change mutates it
+    in place and returns False to cancel; write(data, expected_version)
+    raises StaleVersionError when the version moved past expected_version.
+    Returns False if cancelled, True once written.
+    """
+    for attempt in range(WRITE_ATTEMPTS):
+        version = current_version()
+        data = read()
+        if change(data) is False:
+            return False
+        try:
+            write(data, expected_version=version)
+            return True
+        except StaleVersionError:
+            continue
+    raise ConflictError("Too many concurrent writes")
+
+
+def write_record(current_version, read_current, based_on, edited, write):
+    """Write one edited record (edited=None deletes it), retrying while other sessions write.
+
+    read_current() returns the record as it is now; the edit is merged
+    into it with merge_edit and passed to write(merged, current,
+    expected_version), which raises StaleVersionError when the file or
+    table moved past expected_version.  A record that another session
+    already deleted is not deleted again.  Returns the merged record.
+    """
+    for attempt in range(WRITE_ATTEMPTS):
+        version = current_version()
+        current = read_current()
+        if edited is None:
+            if current is None:
+                return None
+            if based_on is not None and dict(current) != dict(based_on):
+                raise ConflictError("The record was changed by another session")
+            merged = None
+        else:
+            merged = merge_edit(based_on, edited, current)
+        try:
+            write(merged, current, expected_version=version)
+            return merged
+        except StaleVersionError:
+            continue
+    raise ConflictError("Too many concurrent writes")
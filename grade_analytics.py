@@ -0,0 +1,123 @@
+import json
+import click
+import grade_scale
+from grade_scale import LETTERS
+from student import Student
+from instrumentation import timed
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+NUMPY_MISSING = "Grade statistics require NumPy. Please install it with 'pip install numpy'."
+
+
+def require_numpy():
+    """Import NumPy, the optional dependency of this module, or raise a ClickException saying how to get it"""
+    try:
+        import numpy
+    except ImportError:
+        raise click.ClickException(NUMPY_MISSING)
+    return numpy
+
+
+class GradeAnalytics:
+    """Department-wide grade statistics for every course in one vectorized pass.
+
+    All usable marks are loaded into one float array alongside an integer
+    course-code array; counts, means, standard deviations, percentiles and
+    letter-grade histograms for all courses then come from a handful of
+    NumPy operations instead of one Python loop per course.  Requires NumPy,
+    which is imported when a GradeAnalytics is created rather than with the
+    module.
+    """
+
+    def __init__(self, percentiles=DEFAULT_PERCENTILES):
+        self.numpy = require_numpy()
+        self.percentiles = tuple(percentiles)
+
+    def load_arrays(self):
+        """Return (course_ids, codes, marks) for every student with a usable mark"""
+        np = self.numpy
+        records = list(Student().read_data().values())
+        values = grade_scale.mark_values([info["mark"] for info in records])
+        usable = [value is not None for value in values]
+        marks = np.array([value for value in values if value is not None], dtype=np.float64)
+        course_column = np.array([info["course_id"] for info in records], dtype=object)[np.array(usable, dtype=bool)]
+        course_ids, codes = np.unique(course_column, return_inverse=True)
+        return list(course_ids), codes.astype(np.intp), marks
+
+    @timed("stats.all_courses")
+    def compute(self):
+        """Return a list of per-course statistic dicts, ordered by course ID"""
+        np = self.numpy
+        course_ids, codes, marks = self.load_arrays()
+        course_count = len(course_ids)
+        if course_count == 0:
+            return []
+
+        counts = np.bincount(codes, minlength=course_count)
+        sums = np.bincount(codes, weights=marks, minlength=course_count)
+        squares = np.bincount(codes, weights=marks * marks, minlength=course_count)
+        means = sums / counts
+        stds = np.sqrt(np.maximum(squares / counts - means * means, 0.0))
+
+        # Sort by course, then by mark, so each course is one contiguous sorted run
+        order = np.lexsort((marks, codes))
+        sorted_marks = marks[order]
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        def percentile(fraction):
+            position = starts + fraction * (counts - 1)
+            low = np.floor(position).astype(np.intp)
+            high = np.ceil(position).astype(np.intp)
+            return sorted_marks[low] + (sorted_marks[high] - sorted_marks[low]) * (position - low)
+
+        percentile_values = {p: percentile(p / 100.0) for p in self.percentiles}
+        medians = percentile(0.5)
+        minimums = sorted_marks[starts]
+        maximums = sorted_marks[starts + counts - 1]
+
+        letters = grade_scale.letter_codes(marks)
+        histograms = np.bincount(codes * len(LETTERS) + letters,
+                                 minlength=course_count * len(LETTERS)).reshape(course_count, len(LETTERS))
+
+        results = []
+        for i, course_id in enumerate(course_ids):
+            results.append({
+                "course_id": course_id,
+                "count": int(counts[i]),
+                "mean": round(float(means[i]), 2),
+                "median": round(float(medians[i]), 2),
+                "std": round(float(stds[i]), 2),
+                "min": float(minimums[i]),
+                "max": float(maximums[i]),
+                "percentiles": {f"p{p}": round(float(values[i]), 2) for p, values in percentile_values.items()},
+                "histogram": {letter: int(histograms[i][j]) for j, letter in reversed(list(enumerate(LETTERS)))}
+            })
+        return results
+
+    def to_json(self, results=None):
+        return json.dumps(self.compute() if results is None else results, indent=2)
+
+    def table_lines(self, results=None):
+        results = self.compute() if results is None else results
+        percentile_names = [f"p{p}" for p in self.percentiles]
+        header = (f"{'Course':<10}{'Count':>7}{'Mean':>8}{'Median':>8}{'Std':>7}{'Min':>7}{'Max':>7}"
+                  + "".join(f"{name:>7}" for name in percentile_names)
+                  + "".join(f"{letter:>6}" for letter in reversed(LETTERS)))
+        lines = [header, "-" * len(header)]
+        for row in results:
+            lines.append(f"{row['course_id']:<10}{row['count']:>7}{row['mean']:>8.2f}{row['median']:>8.2f}"
+                         f"{row['std']:>7.2f}{row['min']:>7.1f}{row['max']:>7.1f}"
+                         + "".join(f"{row['percentiles'][name]:>7.2f}" for name in percentile_names)
+                         + "".join(f"{row['histogram'][letter]:>6}" for letter in reversed(LETTERS)))
+        return lines
+
+    def display(self, output_format="table"):
+        results = self.compute()
+        if not results:
+            click.echo("No grades found.")
+            return results
+        if output_format == "json":
+            click.echo(self.to_json(results))
+        else:
+            click.echo("\n".join(self.table_lines(results)))
+        return results
@@ -0,0 +1,110 @@
+import math
+
+LETTERS = ["F", "D", "C", "B", "A"]
+GRADE_BOUNDARIES = [60, 75, 85, 93]  # Lowest mark that earns D, C, B and A
+GRADE_MARKS = {
+    'A': 96.5,  # Middle of 93-100
+    'B': 88.5,  # Middle of 85-92
+    'C': 79.5,  # Middle of 75-84
+    'D': 67.0,  # Middle of 60-74
+    'F': 30.0   # Representative failing grade
+}
+VALID_GRADES = set(GRADE_MARKS)
+
+# Every boundary is a whole mark, so the letter only depends on floor(mark):
+# one 101-entry table answers every scalar conversion.
+_GRADE_BY_WHOLE_MARK = [LETTERS[sum(whole_mark >= boundary for boundary in GRADE_BOUNDARIES)]
+                        for whole_mark in range(101)]
+
+
+def _grade_for_value(mark_value):
+    # Clamping first also sends NaN and -inf to F and inf to A, as the old if/elif chain did
+    return _GRADE_BY_WHOLE_MARK[math.floor(min(100.0, max(0.0, mark_value)))]
+
+
+def mark_to_grade(mark):
+    """Convert numerical mark to letter grade; non-numeric marks are returned as-is"""
+    try:
+        value = float(mark)
+    except ValueError:
+        return mark
+    return _grade_for_value(value)
+
+
+def grade_to_mark(grade):
+    """Convert letter grade to representative numerical mark; unknown grades are returned as-is"""
+    return GRADE_MARKS.get(grade.upper(), grade)
+
+
+def grade_and_mark(grade=None, mark=None):
+    """Validate a user-entered mark (0-100) or, failing that, a letter grade and return (grade, mark).
+
+    The missing column is derived from the given one.  Raises ValueError
+    with a message for the user when the value is not acceptable.
+    """
+    if mark is not None:
+        try:
+            value = float(mark)
+        except ValueError:
+            raise ValueError("Mark must be a number.") from None
+        if not math.isfinite(value):
+            raise ValueError("Mark must be a number.")
+        if value < 0 or value > 100:
+            raise ValueError("Mark must be between 0 and 100.")
+        return _grade_for_value(value), mark
+    grade = (grade or "").upper()
+    if grade not in VALID_GRADES:
+        raise ValueError("Grade must be A, B, C, D, or F.")
+    return grade, str(GRADE_MARKS[grade])
+
+
+def mark_value(mark):
+    """Numeric value of a mark column entry (a number or a letter grade), or None if unusable"""
+    try:
+        value = float(mark)
+    except ValueError:
+        return GRADE_MARKS.get(mark.upper())
+    # NaN and infinities would break the sorted mark lists and running sums of the statistics
+    return value if math.isfinite(value) else None
+
+
+def marks_to_grades(marks):
+    """Convert a column of marks to letter grades in one pass"""
+    table = _GRADE_BY_WHOLE_MARK
+    grades = []
+    for mark in marks:
+        try:
+            value = float(mark)
+        except ValueError:
+            grades.append(mark)
+            continue
+        grades.append(table[math.floor(min(100.0, max(0.0, value)))])
+    return grades
+
+
+def grades_to_marks(grades):
+    """Convert a column of letter grades to representative marks in one pass"""
+    lookup = GRADE_MARKS.get
+    return [lookup(grade.upper(), grade) for grade in grades]
+
+
+def mark_values(marks):
+    """Convert a column of marks to floats (None where unusable), e.g. for sort keys"""
+    lookup = GRADE_MARKS.get
+    isfinite = math.isfinite
+    values = []
+    for mark in marks:
+        try:
+            value = float(mark)
+        except ValueError:
+            values.append(lookup(mark.upper()))
+            continue
+        values.append(value if isfinite(value) else None)
+    return values
+
+
+def letter_codes(mark_array):
+    """Map a NumPy array of marks to indexes into LETTERS with np.digitize, agreeing with mark_to_grade"""
+    import numpy as np
+    # np.digitize puts NaN past the last boundary (A); the scalar conversion treats it as 0 (F)
+    return np.digitize(np.nan_to_num(mark_array, nan=0.0), GRADE_BOUNDARIES)
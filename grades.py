@@ -1,66 +1,126 @@
-import os
+import sys
+import math
 import click
+import grade_scale
+from table_cache import table_cache
+from student_journal import StudentJournal
+from student_index import StudentIndex
+from student_records import GradeRecord, GradeRecords
 from professor import Professor
+from csv_format import read_rows, write_rows, parse_line, format_row
+from file_lock import ConflictError, merge_edit, optimistic_update, write_record
+import transaction
+from transaction import Transaction
+from instrumentation import timed
 
 class Grades:
     def __init__(self):
         self.file_path = "student.csv"
+        from storage import open_storage
+        self.storage = open_storage()
+        self.journal = self.storage.student_log if self.storage else StudentJournal(self.file_path)
+        self.index = None if self.storage else StudentIndex(self.file_path, self.journal)
     
     def mark_to_grade(self, mark):
         """Convert numerical mark to letter grade"""
-        try:
-            mark_value = float(mark)
-            if mark_value >= 93:
-                return 'A'
-            elif mark_value >= 85:
-                return 'B'
-            elif mark_value >= 75:
-                return 'C'
-            elif mark_value >= 60:
-                return 'D'
-            else:
-                return 'F'
-        except ValueError:
-            return mark  # Return as-is if not a number
+        return grade_scale.mark_to_grade(mark)
     
     def grade_to_mark(self, grade):
         """Convert letter grade to representative numerical mark"""
-        grade_map = {
-            'A': 96.5,  # Middle of 93-100
-            'B': 88.5,  # Middle of 85-92
-            'C': 79.5,  # Middle of 75-84
-            'D': 67.0,  # Middle of 60-74
-            'F': 30.0   # Representative failing grade
-        }
-        return grade_map.get(grade.upper(), grade)
+        return grade_scale.grade_to_mark(grade)
 
+    @timed("grades.read_data")
     def read_data(self):
-        grades = {}
-        if os.path.exists(self.file_path):
-            with open(self.file_path, "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line:  # Skip empty lines
-                        continue
-                    try:
-                        email, first_name, last_name, course_id, grade, mark = line.split(",")
-                        key = (first_name, last_name, course_id)
-                        grades[key] = {
-                            "email": email,
-                            "grade": grade,
-                            "mark": mark
-                        }
-                    except ValueError as e:
-                        click.echo(f"Warning: Skipping malformed line in {self.file_path}: {line}")
-                        continue
-        return grades
+        if self.storage:
+            return self.storage.load("students", "grades", self._records_from_rows)
+        return table_cache.load(self.file_path, "grades", self._parse_file,
+                                depends_on=self.journal.depends_on)
+
+    def _records_from_rows(self, rows):
+        return GradeRecords.loaded(((sys.intern(first_name), last_name, sys.intern(course_id)),
+                                    GradeRecord(email, grade, mark))
+                                   for email, first_name, last_name, course_id, grade, mark in rows)
+
+    @timed("grades.parse")
+    def _parse_file(self):
+        grades = GradeRecords.loaded(((sys.intern(first_name), last_name, sys.intern(course_id)),
+                                      GradeRecord(email, grade, mark))
+                                     for email, first_name, last_name, course_id, grade, mark in read_rows(self.file_path, 6))
+        return StudentJournal(self.file_path).replay(grades)
+
+    @timed("grades.write_data")
+    def write_data(self, data, expected_version=None):
+        if not isinstance(data, GradeRecords):  # data becomes the cached table
+            data = GradeRecords((key, GradeRecord.from_mapping(info)) for key, info in data.items())
+        if self.storage:
+            rows = [(info['email'], first_name, last_name, course_id, info['grade'], info['mark'])
+                    for (first_name, last_name, course_id), info in data.items()]
+            self.storage.replace("students", rows, "grades", data, expected_version)
+            return
+        with self.journal.version.locked():
+            with self.journal.rewrite_base(expected_version) as file:
+                write_rows(file, ((info['email'], first_name, last_name, course_id, info['grade'], info['mark'])
+                                  for (first_name, last_name, course_id), info in data.items()))
+            table_cache.store(self.file_path, "grades", data, depends_on=self.journal.depends_on)
 
-    def write_data(self, data):
-        with open(self.file_path, "w") as file:
-            for (first_name, last_name, course_id), info in data.items():
-                file.write(f"{info['email']},{first_name},{last_name},{course_id},{info['grade']},{info['mark']}\n")
+    @timed("grades.save")
+    def save_grade(self, first_name, last_name, course_id, info, based_on=None):
+        """Write a single grade record through the journal (or the database) instead of rewriting student.csv.
 
-    def add_student_grade(self, first_name, last_name, course_id, email=None, grade=None, mark=None):
+        As with Student.save_student, info is merged into the latest record
+        as an edit of based_on (None for a new grade) and retried if another
+        session wrote in between.  Raises ConflictError on conflicting edits.
+        """
+        key = (first_name, last_name, course_id)
+
+        def write(merged, current, expected_version):
+            self.journal.put(merged["email"], first_name, last_name, course_id, merged["grade"], merged["mark"],
+                             expected_version=expected_version)
+
+        write_record(self.journal.current_version, lambda: self.read_data().get(key), based_on, info, write)
+        self.compact_if_needed()
+
+    @timed("grades.remove")
+    def remove_grade(self, first_name, last_name, course_id, based_on=None):
+        key = (first_name, last_name, course_id)
+
+        def write(merged, current, expected_version):
+            self.journal.delete(first_name, last_name, course_id, expected_version)
+
+        write_record(self.journal.current_version, lambda: self.read_data().get(key), based_on, None, write)
+        self.compact_if_needed()
+
+    def compact_if_needed(self):
+        """Merge the journal back into student.csv once it passes its size threshold.
+
+        Inside a Transaction this waits until it has committed, since the
+        rewrite would otherwise be built from data that lacks the staged
+        entries.  A compaction that loses to concurrent writers is left to
+        the next write; the write that triggered it has already succeeded.
+        """
+        active = transaction.current()
+        if active is not None:
+            active.after_commit(self.compact_if_needed)
+            return
+        if self.journal.needs_compaction():
+            try:
+                self.compact()
+            except ConflictError:
+                pass
+
+    @timed("grades.compact")
+    def compact(self):
+        """Rewrite student.csv from the latest data, retrying if another session writes meanwhile"""
+        optimistic_update(self.journal.current_version, self.read_data, lambda grades: None, self.write_data)
+
+    def add_student_grade(self, first_name, last_name, course_id, email=None, grade=None, mark=None,
+                          allow_unassigned=None):
+        """Add a grade, prompting only for what was not passed in.
+
+        A student who is not on record yet is created with email, or after
+        asking for one.  allow_unassigned decides whether a course without a
+        professor is accepted (None asks).
+        """
         grades = self.read_data()
         key = (first_name, last_name, course_id)
 
@@ -76,17 +136,18 @@ class Grades:
         
         # If student doesn't exist, ask if they want to create student record
         if student_key not in students:
-            click.echo(f"\nStudent {first_name} {last_name} not found in the system.")
-            create_student = click.prompt("Would you like to create the student record now?", 
-                                        type=click.Choice(['yes', 'no'], case_sensitive=False))
-            
-            if create_student.lower() == 'no':
-                click.echo("Grade addition cancelled. Please add the student record first.")
-                return
-            
-            # Create student record
-            click.echo("\n--- Creating Student Record ---")
-            email = click.prompt("Email")
+            if email is None:
+                click.echo(f"\nStudent {first_name} {last_name} not found in the system.")
+                create_student = click.prompt("Would you like to create the student record now?", 
+                                            type=click.Choice(['yes', 'no'], case_sensitive=False))
+
+                if create_student.lower() == 'no':
+                    click.echo("Grade addition cancelled. Please add the student record first.")
+                    return
+
+                # Create student record
+                click.echo("\n--- Creating Student Record ---")
+                email = click.prompt("Email")
             
             # Validate email
             if not student_obj.validate_not_null(email, "Email"):
@@ -105,6 +166,9 @@ class Grades:
                 return
         else:
             # Student exists, get their email
+            if email is not None and email != students[student_key]['email']:
+                click.echo(f"Error: Email does not match the record for {first_name} {last_name}.")
+                return
             email = students[student_key]['email']
             
             # Verify course exists
@@ -119,75 +183,52 @@ class Grades:
         
         # Check if professor is assigned to this course
         professor_obj = Professor()
-        professors = professor_obj.read_data()
-        professor_info = next((prof for prof in professors.values() if prof['course_id'] == course_id), None)
-        
-        if not professor_info:
+        if not professor_obj.get_course_professors(course_id):
             click.echo(f"\nWarning: No professor is assigned to course {course_id}.")
-            click.echo("You may want to assign a professor to this course first.")
-            continue_anyway = click.prompt("Do you want to continue adding the grade anyway?", 
-                                          type=click.Choice(['yes', 'no'], case_sensitive=False))
-            if continue_anyway.lower() == 'no':
+            if allow_unassigned is None:
+                click.echo("You may want to assign a professor to this course first.")
+                continue_anyway = click.prompt("Do you want to continue adding the grade anyway?", 
+                                              type=click.Choice(['yes', 'no'], case_sensitive=False))
+                allow_unassigned = continue_anyway.lower() == 'yes'
+            if not allow_unassigned:
                 click.echo("Grade addition cancelled.")
                 return
 
-        # Ask user if they want to enter grade or mark
-        click.echo("\nHow would you like to enter the grade?")
-        click.echo("1. Enter numerical mark (0-100) - grade will be calculated automatically")
-        click.echo("2. Enter letter grade (A, B, C, D, F) - representative mark will be assigned")
-        
+        if grade is None and mark is None:
+            entered = student_obj.prompt_grade_or_mark()
+            if entered is None:
+                return
+            grade, mark = entered
+        entered_mark = mark is not None
         try:
-            choice = click.prompt("Enter your choice (1-2)", type=int)
-        except ValueError:
-            click.echo("Invalid input.")
+            grade, mark = grade_scale.grade_and_mark(grade, mark)
+        except ValueError as error:
+            click.echo(f"Error: {error}")
             return
-        
-        if choice == 1:
-            mark = click.prompt("Mark (0-100)")
-            try:
-                mark_value = float(mark)
-                if mark_value < 0 or mark_value > 100:
-                    click.echo("Error: Mark must be between 0 and 100.")
-                    return
-                grade = self.mark_to_grade(mark)
-                click.echo(f"Automatically assigned grade: {grade}")
-            except ValueError:
-                click.echo("Error: Mark must be a number.")
-                return
-        elif choice == 2:
-            grade = click.prompt("Grade (A/B/C/D/F)").upper()
-            if grade not in ['A', 'B', 'C', 'D', 'F']:
-                click.echo("Error: Grade must be A, B, C, D, or F.")
-                return
-            mark = str(self.grade_to_mark(grade))
-            click.echo(f"Automatically assigned mark: {mark}")
+        if entered_mark:
+            click.echo(f"Automatically assigned grade: {grade}")
         else:
-            click.echo("Invalid choice.")
-            return
+            click.echo(f"Automatically assigned mark: {mark}")
 
-        # Save to grades (student.csv)
-        grades[key] = {
+        # Save to grades (student.csv); the same journal entry creates the
+        # student record when the student is new
+        new_student = student_key not in students
+        if not self._save_edit(first_name, last_name, course_id, {
             "email": email,
             "grade": grade,
             "mark": mark
-        }
-        self.write_data(grades)
-        
-        # Also save to student records if new student
-        if student_key not in students:
-            students[student_key] = {
-                "email": email,
-                "course_id": course_id,
-                "grade": grade,
-                "mark": mark
-            }
-            student_obj.write_data(students)
+        }):
+            return
+
+        if new_student:
             click.echo(f"\nStudent record created for {first_name} {last_name}")
         
         click.echo("The new grade record has been added.")
         self.display_grade_report(first_name, last_name, course_id)
+        return True
 
     def modify_student_grade(self, first_name, last_name, course_id, email=None, grade=None, mark=None):
+        """Change a grade; without a new grade or mark the user picks what to change from a menu"""
         grades = self.read_data()
         key = (first_name, last_name, course_id)
 
@@ -195,121 +236,119 @@ class Grades:
             click.echo("Student or course not found")
             return
 
-        # Show current professor assignment
-        professor_obj = Professor()
-        professors = professor_obj.read_data()
-        current_professor = None
-        current_professor_name = None
-        
-        for prof_name, prof_info in professors.items():
-            if prof_info['course_id'] == course_id:
-                current_professor = prof_info
-                current_professor_name = prof_name
-                break
-        
-        if current_professor:
-            click.echo(f"\nCurrent Professor for {course_id}: {current_professor_name}")
-        else:
-            click.echo(f"\nNo professor currently assigned to {course_id}")
-        
-        click.echo(f"\nCurrent Grade: {grades[key]['grade']}, Current Mark: {grades[key]['mark']}")
-        click.echo("\nWhat would you like to modify?")
-        click.echo("1. Grade only (mark will be updated automatically)")
-        click.echo("2. Mark only (grade will be updated automatically)")
-        click.echo("3. Professor only")
-        click.echo("4. Both grade/mark and professor")
-        
-        try:
-            choice = click.prompt("Enter your choice (1-4)", type=int)
-        except ValueError:
-            click.echo("Invalid input.")
-            return
-        
-        if choice == 1:
-            # Modify grade only
-            new_grade = click.prompt("Grade (A/B/C/D/F)", default=grades[key]["grade"], show_default=True).upper()
-            if new_grade not in ['A', 'B', 'C', 'D', 'F']:
-                click.echo("Error: Grade must be A, B, C, D, or F.")
-                return
-            new_mark = str(self.grade_to_mark(new_grade))
-            grades[key]["grade"] = new_grade
-            grades[key]["mark"] = new_mark
-            click.echo(f"Grade updated to {new_grade}, mark automatically updated to {new_mark}")
-            self.write_data(grades)
-            
-        elif choice == 2:
-            # Modify mark only
-            new_mark = click.prompt("Mark (0-100)", default=grades[key]["mark"], show_default=True)
-            try:
-                mark_value = float(new_mark)
-                if mark_value < 0 or mark_value > 100:
-                    click.echo("Error: Mark must be between 0 and 100.")
-                    return
-                new_grade = self.mark_to_grade(new_mark)
-                grades[key]["mark"] = new_mark
-                grades[key]["grade"] = new_grade
-                click.echo(f"Mark updated to {new_mark}, grade automatically updated to {new_grade}")
-                self.write_data(grades)
-            except ValueError:
-                click.echo("Error: Mark must be a number.")
-                return
-            
-        elif choice == 3:
-            # Modify professor only
-            self._modify_professor_assignment(course_id, professors, current_professor_name)
-            
-        elif choice == 4:
-            # Modify both
-            click.echo("\nHow would you like to update the grade?")
-            click.echo("1. Update numerical mark (grade will be calculated)")
-            click.echo("2. Update letter grade (mark will be assigned)")
-            
+        original = grades[key]
+        info = dict(original)
+        change_professor = False
+
+        if grade is None and mark is None:
+            # Show current professor assignment
+            professor_obj = Professor()
+            professors = professor_obj.read_data()
+            course_professors = professor_obj.get_course_professors(course_id)
+            current_professor_name = course_professors[0][0] if course_professors else None
+
+            if course_professors:
+                names = ", ".join(name for name, prof_info in course_professors)
+                click.echo(f"\nCurrent Professor for {course_id}: {names}")
+            else:
+                click.echo(f"\nNo professor currently assigned to {course_id}")
+
+            click.echo(f"\nCurrent Grade: {grades[key]['grade']}, Current Mark: {grades[key]['mark']}")
+            click.echo("\nWhat would you like to modify?")
+            click.echo("1. Grade only (mark will be updated automatically)")
+            click.echo("2. Mark only (grade will be updated automatically)")
+            click.echo("3. Professor only")
+            click.echo("4. Both grade/mark and professor")
+
             try:
-                sub_choice = click.prompt("Enter your choice (1-2)", type=int)
+                choice = click.prompt("Enter your choice (1-4)", type=int)
             except ValueError:
                 click.echo("Invalid input.")
                 return
-            
-            if sub_choice == 1:
-                new_mark = click.prompt("Mark (0-100)", default=grades[key]["mark"], show_default=True)
+
+            if choice == 4:
+                click.echo("\nHow would you like to update the grade?")
+                click.echo("1. Update numerical mark (grade will be calculated)")
+                click.echo("2. Update letter grade (mark will be assigned)")
+
                 try:
-                    mark_value = float(new_mark)
-                    if mark_value < 0 or mark_value > 100:
-                        click.echo("Error: Mark must be between 0 and 100.")
-                        return
-                    new_grade = self.mark_to_grade(new_mark)
-                    grades[key]["mark"] = new_mark
-                    grades[key]["grade"] = new_grade
-                    click.echo(f"Mark updated to {new_mark}, grade automatically updated to {new_grade}")
+                    sub_choice = click.prompt("Enter your choice (1-2)", type=int)
                 except ValueError:
-                    click.echo("Error: Mark must be a number.")
+                    click.echo("Invalid input.")
                     return
-            elif sub_choice == 2:
-                new_grade = click.prompt("Grade (A/B/C/D/F)", default=grades[key]["grade"], show_default=True).upper()
-                if new_grade not in ['A', 'B', 'C', 'D', 'F']:
-                    click.echo("Error: Grade must be A, B, C, D, or F.")
+                if sub_choice not in (1, 2):
+                    click.echo("Invalid choice.")
                     return
-                new_mark = str(self.grade_to_mark(new_grade))
-                grades[key]["grade"] = new_grade
-                grades[key]["mark"] = new_mark
-                click.echo(f"Grade updated to {new_grade}, mark automatically updated to {new_mark}")
+                # Same prompts as "Mark only" and "Grade only"
+                choice = 2 if sub_choice == 1 else 1
+                change_professor = True
+
+            if choice == 1:
+                grade = click.prompt("Grade (A/B/C/D/F)", default=grades[key]["grade"], show_default=True)
+            elif choice == 2:
+                mark = click.prompt("Mark (0-100)", default=grades[key]["mark"], show_default=True)
+            elif choice == 3:
+                change_professor = True
             else:
                 click.echo("Invalid choice.")
                 return
-            
-            self.write_data(grades)
-            self._modify_professor_assignment(course_id, professors, current_professor_name)
-            
-        else:
-            click.echo("Invalid choice.")
+
+        grade_changed = grade is not None or mark is not None
+        if grade_changed:
+            try:
+                info["grade"], info["mark"] = grade_scale.grade_and_mark(grade, mark)
+            except ValueError as error:
+                click.echo(f"Error: {error}")
+                return
+
+        professor_change = professor_message = None
+        if change_professor:
+            prompted = self._prompt_professor_assignment(course_id, professors, current_professor_name)
+            if prompted is None:
+                return
+            professor_change, professor_message = prompted
+
+        # Every prompt has been answered: the grade and the professor table
+        # are written together, or neither is
+        try:
+            with Transaction():
+                if grade_changed:
+                    self.save_grade(first_name, last_name, course_id, info, original)
+                if professor_change is not None:
+                    Professor().update_data(professor_change)
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Nothing was changed; please try again.")
             return
 
+        if grade_changed:
+            if mark is not None:
+                click.echo(f"Mark updated to {info['mark']}, grade automatically updated to {info['grade']}")
+            else:
+                click.echo(f"Grade updated to {info['grade']}, mark automatically updated to {info['mark']}")
+        if professor_message:
+            click.echo(professor_message)
+
         click.echo("\nGrade information modified successfully")
         click.echo(f"The new information for {first_name} {last_name} in course {course_id} is:")
         self.display_grade_report(first_name, last_name, course_id)
+        return True
     
-    def _modify_professor_assignment(self, course_id, professors, current_professor_name):
-        """Helper method to modify professor assignment for a course"""
+    def _save_edit(self, first_name, last_name, course_id, info, based_on=None):
+        """save_grade for the interactive commands: report a conflict instead of raising it"""
+        try:
+            self.save_grade(first_name, last_name, course_id, info, based_on)
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return False
+        return True
+
+    def _prompt_professor_assignment(self, course_id, professors, current_professor_name):
+        """Ask how to change the professor assignment of a course.
+
+        Returns (change, message): change(professors) applies the answer to
+        the latest professor table (None when there is nothing to write) and
+        message reports it once written.  Returns None if the input was invalid.
+        """
         click.echo("\nAvailable actions:")
         click.echo("1. Assign a different professor")
         click.echo("2. Remove professor assignment")
@@ -332,32 +371,37 @@ class Grades:
                 click.echo("Professor not found.")
                 return
             
-            # Update the new professor's course
-            professors[new_professor_name]['course_id'] = course_id
-            
             # If there was a previous professor, we might want to unassign them
+            unassign = 'no'
             if current_professor_name and current_professor_name != new_professor_name:
                 unassign = click.prompt(
                     f"Do you want to unassign {current_professor_name} from {course_id}?",
                     type=click.Choice(['yes', 'no'], case_sensitive=False)
                 )
+
+            # Reassign against the latest professor table, once it is written
+            def change(latest):
+                latest[new_professor_name] = merge_edit(
+                    professors[new_professor_name], dict(professors[new_professor_name], course_id=course_id),
+                    latest.get(new_professor_name))
                 if unassign.lower() == 'yes':
-                    professors[current_professor_name]['course_id'] = ""
-            
-            # Save professor data
-            professor_obj = Professor()
-            professor_obj.write_data(professors)
-            click.echo(f"\n{new_professor_name} has been assigned to {course_id}")
-            
+                    latest[current_professor_name] = merge_edit(
+                        professors[current_professor_name], dict(professors[current_professor_name], course_id=""),
+                        latest.get(current_professor_name))
+
+            return change, f"\n{new_professor_name} has been assigned to {course_id}"
+
         elif action == 2:
             # Remove professor assignment
-            if current_professor_name:
-                professors[current_professor_name]['course_id'] = ""
-                professor_obj = Professor()
-                professor_obj.write_data(professors)
-                click.echo(f"\n{current_professor_name} has been unassigned from {course_id}")
-            else:
-                click.echo("No professor is currently assigned to this course.")
+            if not current_professor_name:
+                return None, "No professor is currently assigned to this course."
+
+            def change(latest):
+                latest[current_professor_name] = merge_edit(
+                    professors[current_professor_name], dict(professors[current_professor_name], course_id=""),
+                    latest.get(current_professor_name))
+
+            return change, f"\n{current_professor_name} has been unassigned from {course_id}"
         else:
             click.echo("Invalid choice.")
 
@@ -369,30 +413,307 @@ class Grades:
             click.echo("Student or course not found")
             return
 
-        del grades[key]
-        self.write_data(grades)
+        try:
+            self.remove_grade(first_name, last_name, course_id, grades[key])
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Student grade deleted successfully")
+        return True
+
+    def enter_course_grades(self, course_id, allow_unassigned=None):
+        """Step through a course's roster entering marks or grades, saving them in one write.
+
+        The course, its professor assignment and the roster are checked and
+        loaded once; every entry is validated as it is typed but only kept in
+        memory until "save" (a checkpoint) or the end of the session writes
+        them all.  allow_unassigned decides whether a course without a
+        professor is accepted (None asks).
+        """
+        from course import Course
+        if course_id not in Course().read_data():
+            click.echo(f"Course {course_id} not found in the system.")
+            return
+        if not Professor().get_course_professors(course_id):
+            click.echo(f"\nWarning: No professor is assigned to course {course_id}.")
+            if allow_unassigned is None:
+                continue_anyway = click.prompt("Do you want to enter grades anyway?",
+                                               type=click.Choice(['yes', 'no'], case_sensitive=False))
+                allow_unassigned = continue_anyway.lower() == 'yes'
+            if not allow_unassigned:
+                click.echo("Grade entry cancelled.")
+                return
 
-    def get_student_grade(self, first_name, last_name, course_id):
         grades = self.read_data()
-        key = (first_name, last_name, course_id)
+        roster = sorted((key for key in grades if key[2] == course_id), key=lambda key: (key[1], key[0]))
+        if not roster:
+            click.echo(f"No students are enrolled in {course_id}.")
+            return
+        based_on = {key: grades[key] for key in roster}
+        pending = {}
+        saved = 0
 
-        if key not in grades:
-            click.echo("Grade not found.")
+        click.echo(f"\n{len(roster)} student(s) in {course_id}. Enter a mark (0-100) or a grade (A/B/C/D/F);")
+        click.echo("press Enter to keep the current one. Commands: back, save, done, quit.")
+        position = 0
+        while position < len(roster):
+            key = roster[position]
+            info = pending.get(key, based_on[key])
+            answer = click.prompt(f"[{position + 1}/{len(roster)}] {key[0]} {key[1]} "
+                                  f"(Grade: {info['grade']}, Mark: {info['mark']})",
+                                  default="", show_default=False).strip()
+            command = answer.lower()
+            if command == "back":
+                position = max(position - 1, 0)
+            elif command == "quit":
+                if pending:
+                    click.echo(f"Discarded {len(pending)} unsaved grade(s).")
+                break
+            elif command in ("save", "done"):
+                saved += self._save_roster_edits(roster, based_on, pending)
+                if roster[position:position + 1] != [key]:  # Rows before this one were deleted
+                    position = roster.index(key) if key in roster else min(position, len(roster))
+                if command == "done":
+                    break
+            elif not answer:
+                position += 1
+            else:
+                try:
+                    if answer.upper() in grade_scale.VALID_GRADES:
+                        grade, mark = grade_scale.grade_and_mark(grade=answer)
+                    else:
+                        grade, mark = grade_scale.grade_and_mark(mark=answer)
+                except ValueError as error:
+                    click.echo(f"Error: {error}")
+                    continue
+                if (grade, mark) == (based_on[key]["grade"], based_on[key]["mark"]):
+                    pending.pop(key, None)
+                else:
+                    pending[key] = dict(based_on[key], grade=grade, mark=mark)
+                position += 1
+        else:
+            saved += self._save_roster_edits(roster, based_on, pending)
+
+        click.echo(f"Saved {saved} grade(s) for {course_id}.")
+        return True
+
+    @timed("grades.save_batch")
+    def _save_roster_edits(self, roster, based_on, pending):
+        """Append the pending edits of a grade entry session to the journal in one write; return how many were saved.
+
+        Each edit is merged into the current record; one whose record another
+        session changed is reported and dropped, and the session carries on
+        from the other session's value (deleted records leave the roster).
+        """
+        if not pending:
+            return 0
+        written, conflicts = {}, {}
+
+        def change(grades):
+            written.clear()
+            conflicts.clear()
+            for key, info in pending.items():
+                current = grades.get(key)
+                try:
+                    written[key] = merge_edit(based_on[key], info, current)
+                except ConflictError as error:
+                    conflicts[key] = (current, error)
+            if not written:
+                return False
+
+        def write(grades, expected_version):
+            self.journal.put_all([(info["email"], first_name, last_name, course_id, info["grade"], info["mark"], "")
+                                  for (first_name, last_name, course_id), info in written.items()],
+                                 expected_version)
+
+        try:
+            optimistic_update(self.journal.current_version, self.read_data, change, write)
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Nothing was saved; please try again.")
+            return 0
+        self.compact_if_needed()
+        pending.clear()
+        based_on.update(written)
+        for key, (current, error) in conflicts.items():
+            click.echo(f"Not saved for {key[0]} {key[1]}: {error}.")
+            if current is None:
+                roster.remove(key)
+            else:
+                based_on[key] = current
+        return len(written)
+
+    def _read_import_rows(self, source_path):
+        """Yield (line_number, row) from a CSV (email,first,last,course_id,mark-or-grade) or JSONL file"""
+        import json
+        with open(source_path, "r") as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line:  # Skip empty lines
+                    continue
+                if source_path.endswith(".jsonl"):
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        yield line_number, {"raw": line}
+                        continue
+                    if not isinstance(record, dict):
+                        yield line_number, {"raw": line, "reason": "Not a JSON object"}
+                        continue
+                    yield line_number, {
+                        "email": str(record.get("email", "")),
+                        "first_name": str(record.get("first_name", "")),
+                        "last_name": str(record.get("last_name", "")),
+                        "course_id": str(record.get("course_id", "")),
+                        "value": str(record.get("mark", record.get("grade", "")))
+                    }
+                else:
+                    fields = parse_line(line)
+                    if len(fields) != 5:
+                        yield line_number, {"raw": line}
+                        continue
+                    email, first_name, last_name, course_id, value = (field.strip() for field in fields)
+                    yield line_number, {
+                        "email": email,
+                        "first_name": first_name,
+                        "last_name": last_name,
+                        "course_id": course_id,
+                        "value": value
+                    }
+
+    def _plan_import(self, source_path, allow_unassigned, grades):
+        """Validate every row of source_path against grades; return (new_grades, rejects)"""
+        from course import Course
+        from student import Student
+
+        courses = Course().read_data()
+        professors = Professor().read_data()
+        students = Student().read_data()
+
+        new_grades = {}
+        new_emails = {}
+        rejects = []
+        mark_keys = []
+        grade_keys = []
+
+        for line_number, row in self._read_import_rows(source_path):
+            if "raw" in row:
+                rejects.append((line_number, row["raw"], row.get("reason", "Malformed line")))
+                continue
+
+            email, first_name, last_name = row["email"], row["first_name"], row["last_name"]
+            course_id, value = row["course_id"], row["value"]
+            raw = format_row([email, first_name, last_name, course_id, value])[:-1]
+            key = (first_name, last_name, course_id)
+            student_key = (first_name, last_name)
+
+            reason = None
+            if not all([email, first_name, last_name, course_id, value]):
+                reason = "Missing field"
+            elif course_id not in courses:
+                reason = f"Course {course_id} not found"
+            elif not allow_unassigned and not professors.teaching(course_id):
+                reason = f"No professor is assigned to course {course_id}"
+            elif key in grades or key in new_grades:
+                reason = "Student grade already exists"
+            elif student_key in students and students[student_key]["email"] != email:
+                reason = f"Email does not match the record for {first_name} {last_name}"
+            elif student_key not in students and (
+                    students.key_for_email(email) not in (None, student_key)
+                    or new_emails.get(email, student_key) != student_key):
+                reason = f"Email {email} already exists"
+
+            if reason is None:
+                try:
+                    mark_value = float(value)
+                    if not math.isfinite(mark_value) or mark_value < 0 or mark_value > 100:
+                        reason = "Mark must be between 0 and 100"
+                    else:
+                        mark_keys.append(key)
+                except ValueError:
+                    value = value.upper()
+                    if value not in grade_scale.VALID_GRADES:
+                        reason = "Grade must be A, B, C, D, or F"
+                    else:
+                        grade_keys.append(key)
+
+            if reason is not None:
+                rejects.append((line_number, raw, reason))
+                continue
+
+            new_emails[email] = student_key
+            new_grades[key] = {
+                "email": email,
+                "grade": value,
+                "mark": value
+            }
+
+        # Fill in the derived column for all accepted rows in one batch per direction
+        for key, grade in zip(mark_keys, grade_scale.marks_to_grades([new_grades[key]["mark"] for key in mark_keys])):
+            new_grades[key]["grade"] = grade
+        for key, mark in zip(grade_keys, grade_scale.grades_to_marks([new_grades[key]["grade"] for key in grade_keys])):
+            new_grades[key]["mark"] = str(mark)
+
+        return new_grades, rejects
+
+    @timed("grades.import")
+    def import_grades(self, source_path, rejects_path=None, allow_unassigned=False):
+        """Non-interactively add every valid grade in source_path with a single write of student.csv.
+
+        Rows are validated in one pass against in-memory course, professor and
+        email sets.  Rejected rows are written to rejects_path (by default
+        <source_path>.rejects.csv) as CSV rows of line number, the row as a CSV
+        line, and the reason.  If another session writes
+        student.csv before the import is saved, the rows are validated again
+        against its changes.  Returns (imported, rejected).
+        """
+        if rejects_path is None:
+            rejects_path = source_path + ".rejects.csv"
+
+        planned = {}
+
+        def change(grades):
+            planned["new_grades"], planned["rejects"] = self._plan_import(source_path, allow_unassigned, grades)
+            if not planned["new_grades"]:
+                return False
+            grades.update(planned["new_grades"])
+
+        try:
+            optimistic_update(self.journal.current_version, lambda: dict(self.read_data()), change, self.write_data)
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Nothing was imported; please try again.")
+            return 0, 0
+        new_grades, rejects = planned["new_grades"], planned["rejects"]
+
+        if rejects:
+            with open(rejects_path, "w", newline="") as file:
+                write_rows(file, ((str(line_number), raw, reason) for line_number, raw, reason in rejects))
+
+        click.echo(f"Imported {len(new_grades)} grade record(s), rejected {len(rejects)}.")
+        if rejects:
+            click.echo(f"Rejected rows written to {rejects_path}")
+        return len(new_grades), len(rejects)
+
+    def lookup_grade(self, first_name, last_name, course_id):
+        """Return one grade record, or None, without parsing student.csv"""
+        if self.storage:
+            for email, first, last, course, grade, mark in self.storage.find("students", "first_name", first_name):
+                if (last, course) == (last_name, course_id):
+                    return GradeRecord(email, grade, mark)
             return None
+        return self.index.grade(first_name, last_name, course_id)
+
+    @timed("grades.lookup")
+    def get_student_grade(self, first_name, last_name, course_id):
+        info = self.lookup_grade(first_name, last_name, course_id)
 
-        info = grades[key]
+        if info is None:
+            click.echo("Grade not found.")
+            return None
 
         professor_obj = Professor()
-        professors = professor_obj.read_data()
-        professor_name = None
-        professor_email = None
-        
-        for name, prof_info in professors.items():
-            if prof_info['course_id'] == course_id:
-                professor_name = name
-                professor_email = prof_info['email']
-                break
+        course_professors = professor_obj.get_course_professors(course_id)
+        professor_name = ", ".join(name for name, prof_info in course_professors)
+        professor_email = ", ".join(prof_info['email'] for name, prof_info in course_professors)
 
         return {
             "course": course_id,
@@ -0,0 +1,169 @@
+import os
+import mmap
+import struct
+import hashlib
+
+MAGIC = b"CMGHIDX1"
+HEADER = struct.Struct("<8sQQqQ")  # magic, bucket count, csv size, csv mtime_ns, entry count
+BUCKET = struct.Struct("<QQ")  # key hash, line offset + 1 (0 marks an empty bucket)
+MIN_BUCKETS = 1024
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def record_at(csv_map, offset):
+    """Raw bytes of the CSV record starting at offset; a quoted field may span several lines"""
+    end = offset
+    while True:
+        end = csv_map.find(b"\n", end)
+        if end < 0:
+            end = len(csv_map)
+            break
+        end += 1
+        if csv_map[offset:end].count(b'"') % 2 == 0:
+            break
+    return csv_map[offset:end]
+
+
+class HashIndex:
+    """On-disk open-addressing hash table mapping a key to the byte offset of its CSV line.
+
+    The sidecar file and the CSV are both read through mmap, so a lookup
+    costs a few page reads and decodes one record no matter how large the
+    CSV is.  Its header records the CSV's size
+    and mtime; when they no longer match (the CSV was edited elsewhere, or a
+    crash hit between a CSV write and the index update) the index is rebuilt
+    on the next lookup.  key_func(line) returns the key bytes of a raw CSV
+    line, or None for lines that should not be indexed.  When a key appears
+    on several lines the last one wins, as it does when the CSV is parsed
+    into a dict.
+    """
+
+    def __init__(self, csv_path, index_path, key_func):
+        self.csv_path = csv_path
+        self.index_path = index_path
+        self.key_func = key_func
+
+    def _csv_signature(self):
+        stat = os.stat(self.csv_path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _read_header(self):
+        try:
+            with open(self.index_path, "rb") as file:
+                header = file.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+        if len(header) != HEADER.size:
+            return None
+        magic, bucket_count, csv_size, csv_mtime_ns, entry_count = HEADER.unpack(header)
+        if magic != MAGIC:
+            return None
+        return bucket_count, csv_size, csv_mtime_ns, entry_count
+
+    def is_current(self):
+        header = self._read_header()
+        if header is None or not os.path.exists(self.csv_path):
+            return False
+        return header[1:3] == self._csv_signature()
+
+    def rebuild(self):
+        """Scan the CSV once and write a fresh index sized for a load factor of at most 1/2"""
+        positions = {}
+        csv_size = csv_mtime_ns = 0
+        try:
+            file = open(self.csv_path, "rb")
+        except FileNotFoundError:
+            file = None
+        if file is not None:
+            with file:
+                # Stamp the index with the file as it was before the scan: a write
+                # or replacement during the scan then leaves it marked outdated
+                stat = os.fstat(file.fileno())
+                csv_size, csv_mtime_ns = stat.st_size, stat.st_mtime_ns
+                offset = 0
+                pending = b""
+                for line in file:
+                    line = pending + line
+                    if line.count(b'"') % 2:  # Inside a quoted field that spans lines
+                        pending = line
+                        continue
+                    pending = b""
+                    key = self.key_func(line)
+                    if key is not None:
+                        positions[key] = offset
+                    offset += len(line)
+
+        bucket_count = MIN_BUCKETS
+        while bucket_count < 2 * len(positions):
+            bucket_count *= 2
+        buckets = bytearray(bucket_count * BUCKET.size)
+        mask = bucket_count - 1
+        for key, offset in positions.items():
+            hashed = key_hash(key)
+            slot = hashed & mask
+            while BUCKET.unpack_from(buckets, slot * BUCKET.size)[1]:
+                slot = (slot + 1) & mask
+            BUCKET.pack_into(buckets, slot * BUCKET.size, hashed, offset + 1)
+
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"  # Readers may rebuild concurrently
+        with open(temp_path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, bucket_count, csv_size, csv_mtime_ns, len(positions)))
+            file.write(buckets)
+        os.replace(temp_path, self.index_path)
+
+    def ensure_current(self):
+        if not self.is_current():
+            self.rebuild()
+
+    def _probe(self, index_map, csv_map, key):
+        """Return (slot, offset) of key, or (first empty slot, None)"""
+        bucket_count = HEADER.unpack_from(index_map, 0)[1]
+        mask = bucket_count - 1
+        hashed = key_hash(key)
+        slot = hashed & mask
+        while True:
+            stored_hash, stored_offset = BUCKET.unpack_from(index_map, HEADER.size + slot * BUCKET.size)
+            if not stored_offset:
+                return slot, None
+            if stored_hash == hashed and self.key_func(record_at(csv_map, stored_offset - 1)) == key:
+                return slot, stored_offset - 1
+            slot = (slot + 1) & mask
+
+    def lookup(self, key):
+        """Return (offset, raw record) for key, or None"""
+        self.ensure_current()
+        with open(self.index_path, "rb") as index_file, open(self.csv_path, "rb") as csv_file:
+            with mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ) as index_map:
+                if not HEADER.unpack_from(index_map, 0)[4]:
+                    return None  # Nothing indexed; the CSV may be empty, and an empty file cannot be mapped
+                with mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+                    slot, offset = self._probe(index_map, csv_map, key)
+                    if offset is None:
+                        return None
+                    return offset, record_at(csv_map, offset)
+
+    def record_write(self, key, offset):
+        """Point key at offset after the caller appended or rewrote that line of the CSV.
+
+        The index must have been current just before the CSV write.
+        """
+        header = self._read_header()
+        if header is None:
+            self.rebuild()
+            return
+        bucket_count, csv_size, csv_mtime_ns, entry_count = header
+        with open(self.index_path, "r+b") as index_file, open(self.csv_path, "rb") as csv_file:
+            with mmap.mmap(index_file.fileno(), 0) as index_map, \
+                    mmap.mmap(csv_file.fileno(), 0, access=mmap.ACCESS_READ) as csv_map:
+                slot, old_offset = self._probe(index_map, csv_map, key)
+                if old_offset is None:
+                    entry_count += 1
+                BUCKET.pack_into(index_map, HEADER.size + slot * BUCKET.size, key_hash(key), offset + 1)
+                csv_size, csv_mtime_ns = self._csv_signature()
+                HEADER.pack_into(index_map, 0, MAGIC, bucket_count, csv_size, csv_mtime_ns, entry_count)
+                index_map.flush()
+        if entry_count * 2 > bucket_count:
+            self.rebuild()
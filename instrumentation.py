@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import atexit
+import functools
+
+LATENCY_FILE_ENV = "CHECKMYGRADE_LATENCY_FILE"
+SUB_BUCKETS = 4  # Buckets per power of two: a percentile is within 19% of the true value
+
+
+def _bucket(ns):
+    """Log-linear histogram bucket of a duration in nanoseconds"""
+    if ns < SUB_BUCKETS:
+        return ns
+    exponent = ns.bit_length() - 1
+    return exponent * SUB_BUCKETS + ((ns >> (exponent - 2)) & (SUB_BUCKETS - 1))
+
+
+def _bucket_upper_bound(index):
+    """Largest duration in nanoseconds that falls into bucket index"""
+    if index < SUB_BUCKETS:
+        return index
+    exponent, sub = divmod(index, SUB_BUCKETS)
+    return ((SUB_BUCKETS + sub + 1) << (exponent - 2)) - 1
+
+
+class Histogram:
+    """Count, total, min, max and a log-linear bucket histogram of one operation's latencies"""
+
+    __slots__ = ("count", "total_ns", "min_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+        self.buckets = {}
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        index = _bucket(ns)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples, capped at the maximum"""
+        if not self.count:
+            return 0
+        rank = max(1, round(fraction * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(_bucket_upper_bound(index), self.max_ns)
+        return self.max_ns
+
+    def summary(self):
+        ms = 1e6
+        return {
+            "count": self.count,
+            "total_ms": self.total_ns / ms,
+            "mean_ms": self.total_ns / self.count / ms if self.count else 0,
+            "min_ms": (self.min_ns or 0) / ms,
+            "p50_ms": self.percentile(0.50) / ms,
+            "p90_ms": self.percentile(0.90) / ms,
+            "p99_ms": self.percentile(0.99) / ms,
+            "max_ms": self.max_ns / ms,
+            "buckets": {str(_bucket_upper_bound(index)): self.buckets[index] for index in sorted(self.buckets)}
+        }
+
+
+class Registry:
+    """Per-operation latency histograms of this process.
+
+    Operations are recorded with the timed() decorator or the measure()
+    context manager below.  Other sinks (a metrics exporter, a log) can be
+    plugged in with add_listener(); each listener is called with
+    (name, nanoseconds) for every sample.  Setting enabled to False turns
+    every measurement into a plain call.
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.histograms = {}
+        self.listeners = []
+
+    def record(self, name, ns):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.add(ns)
+        for listener in self.listeners:
+            listener(name, ns)
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def reset(self):
+        self.histograms.clear()
+
+    def snapshot(self):
+        """{operation: summary} for every operation recorded so far, slowest total first"""
+        return {name: histogram.summary() for name, histogram in
+                sorted(self.histograms.items(), key=lambda item: -item[1].total_ns)}
+
+    def dump_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"pid": os.getpid(), "operations": self.snapshot()}, file, indent=2)
+            file.write("\n")
+
+    def render_lines(self):
+        """The snapshot as table lines for the terminal"""
+        header = f"{'Operation':<40} {'Count':>7} {'Total ms':>10} {'Mean ms':>9} {'p50 ms':>9} " \
+                 f"{'p99 ms':>9} {'Max ms':>9}"
+        lines = [header, "-" * len(header)]
+        for name, summary in self.snapshot().items():
+            lines.append(f"{name:<40} {summary['count']:>7} {summary['total_ms']:>10.3f} {summary['mean_ms']:>9.3f} "
+                         f"{summary['p50_ms']:>9.3f} {summary['p99_ms']:>9.3f} {summary['max_ms']:>9.3f}")
+        if len(lines) == 2:
+            lines.append("No operations recorded yet.")
+        return lines
+
+
+registry = Registry()
+
+
+class measure:
+    """Context manager timing its block as one sample of name; elapsed_ns and seconds are set on exit"""
+
+    __slots__ = ("name", "start", "elapsed_ns")
+
+    def __init__(self, name):
+        self.name = name
+        self.elapsed_ns = 0
+
+    @property
+    def seconds(self):
+        return self.elapsed_ns / 1e9
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed_ns = time.perf_counter_ns() - self.start
+        if registry.enabled:
+            registry.record(self.name, self.elapsed_ns)
+
+
+def timed(name):
+    """Decorator recording every call of the function as a sample of name"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                registry.record(name, time.perf_counter_ns() - start)
+        return wrapper
+    return decorate
+
+
+def _dump_at_exit():
+    if registry.histograms:
+        registry.dump_json(os.environ[LATENCY_FILE_ENV])
+
+
+if os.environ.get(LATENCY_FILE_ENV):
+    atexit.register(_dump_at_exit)
@@ -1,18 +1,40 @@
-from professor import Professor
-from course import Course
-from student import Student
-from grades import Grades
 import time
 import click
-from authentication import Authentication
+from output_writer import FORMATS
 
 class CheckMyGradeApp:
     def __init__(self):
+        # Imported here so that "python main.py <command>" only loads what cli needs
+        from professor import Professor
+        from course import Course
+        from student import Student
+        from grades import Grades
         self.student = Student()
         self.professor = Professor()
         self.course = Course()
         self.grades = Grades()
 
+    def prompt_listing_options(self):
+        """Ask for (limit, offset, course_id, output_format) of a sorted student listing"""
+        course_id = click.prompt("Course ID to filter by (blank for all courses)", default="", show_default=False)
+        limit = click.prompt("Number of records to show (0 for all)", type=click.IntRange(min=0), default=0)
+        offset = 0
+        if limit:
+            offset = click.prompt("Records to skip", type=click.IntRange(min=0), default=0)
+        output_format = click.prompt("Output format", type=click.Choice(FORMATS), default="table")
+        return limit or None, offset, course_id or None, output_format
+
+    def show_latency_stats(self):
+        """Hidden "stats" menu entry: where this session's time went, per operation"""
+        from instrumentation import registry
+        click.echo("")
+        for line in registry.render_lines():
+            click.echo(line)
+        path = click.prompt("Save as JSON to (blank to skip)", default="", show_default=False)
+        if path:
+            registry.dump_json(path)
+            click.echo(f"Latency statistics saved to {path}")
+
     def professor_menu(self):
         while True:
             click.echo("\nProfessor Menu:")
@@ -38,7 +60,11 @@ class CheckMyGradeApp:
             click.echo("20. Generate Professor-wise Report")
             click.echo("21. Generate Student-wise Report")
             click.echo("22. Change Password")
-            click.echo("23. Exit")
+            click.echo("24. Import Grades from File")
+            click.echo("25. Generate Reports for All Courses")
+            click.echo("26. View Grade Statistics for All Courses")
+            click.echo("27. Enter Grades for a Course")
+            click.echo("23. Exit")  # Listed last but keeps the number it had before the menu grew
 
             try:
                 choice = input("Enter your choice: ")
@@ -99,13 +125,13 @@ class CheckMyGradeApp:
                 self.student.search_student(search_term)
             elif choice == "16":
                 order = click.prompt("Enter sort order", type=click.Choice(['asc', 'desc']))
-                self.student.sort_students_by_name(order)
+                self.student.sort_students_by_name(order, *self.prompt_listing_options())
             elif choice == "17":
                 order = click.prompt("Enter sort order", type=click.Choice(['asc', 'desc']))
-                self.student.sort_students_by_marks(order)
+                self.student.sort_students_by_marks(order, *self.prompt_listing_options())
             elif choice == "18":
                 order = click.prompt("Enter sort order", type=click.Choice(['asc', 'desc']))
-                self.student.sort_students_by_email(order)
+                self.student.sort_students_by_email(order, *self.prompt_listing_options())
             elif choice == "19":
                 course_id = click.prompt("Enter course ID")
                 self.course.generate_course_wise_report(course_id)
@@ -120,11 +146,32 @@ class CheckMyGradeApp:
                 email = click.prompt("Enter your email")
                 old_password = click.prompt("Enter old password", hide_input=True)
                 new_password = click.prompt("Enter new password", hide_input=True)
+                from authentication import Authentication
                 auth = Authentication()
                 auth.change_password(email, old_password, new_password)
+            elif choice == "24":
+                source_path = click.prompt("Enter path of the CSV or JSONL file to import")
+                self.grades.import_grades(source_path)
+            elif choice == "25":
+                output_dir = click.prompt("Enter output directory", default="reports", show_default=True)
+                self.course.generate_all_course_reports(output_dir)
+            elif choice == "26":
+                from grade_analytics import GradeAnalytics
+                try:
+                    analytics = GradeAnalytics()
+                except click.ClickException as error:
+                    click.echo(error.message)
+                    continue
+                output_format = click.prompt("Output format", type=click.Choice(['table', 'json']), default="table")
+                analytics.display(output_format)
+            elif choice == "27":
+                course_id = click.prompt("Enter course ID")
+                self.grades.enter_course_grades(course_id)
             elif choice == "23":
                 click.echo("Exiting Professor Menu.")
                 break
+            elif choice == "stats":
+                self.show_latency_stats()
             else:
                 click.echo("Invalid choice. Please try again.")
 
@@ -154,11 +201,14 @@ class CheckMyGradeApp:
                 email = click.prompt("Enter your email")
                 old_password = click.prompt("Enter old password", hide_input=True)
                 new_password = click.prompt("Enter new password", hide_input=True)
+                from authentication import Authentication
                 auth = Authentication()
                 auth.change_password(email, old_password, new_password)
             elif choice == "4":
                 click.echo("Exiting Student Menu.")
                 break
+            elif choice == "stats":
+                self.show_latency_stats()
             else:
                 click.echo("Invalid choice. Please try again.")
 
@@ -169,6 +219,7 @@ class CheckMyGradeApp:
 
     def create_account(self):
         """Create a new account"""
+        from authentication import Authentication
         auth = Authentication()
         click.echo("\n" + "="*60)
         click.echo("CREATE NEW ACCOUNT")
@@ -189,6 +240,7 @@ class CheckMyGradeApp:
         return True
 
     def login(self):
+        from authentication import Authentication
         auth = Authentication()
         click.echo("\n--- Login ---")
         email = click.prompt("Email")
@@ -231,8 +283,9 @@ class CheckMyGradeApp:
             click.echo("Unknown role. Exiting.")
 
 def main():
-    app = CheckMyGradeApp()
-    app.main_menu()
+    """Run a command given on the command line, or the interactive menu without one"""
+    from cli import cli
+    cli()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,102 @@
+import io
+import os
+import sys
+import csv
+import json
+
+FORMATS = ("table", "csv", "jsonl")
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def resolve_format(output_format, stream=None):
+    """Turn "auto" into "table" on a terminal and "csv" when stdout is a pipe or file"""
+    if output_format != "auto":
+        return output_format
+    stream = stream or sys.stdout
+    try:
+        return "table" if stream.isatty() else "csv"
+    except (AttributeError, ValueError):
+        return "csv"
+
+
+class OutputWriter:
+    """Buffers listing output and writes it to the stream in large chunks.
+
+    Rows are mappings holding at least the given fields.  In "table" format
+    each row is rendered with line_format (a str.format template) and the
+    lines passed to text() are written as-is.  In "csv" and "jsonl" formats
+    only the rows' fields are written (CSV with a header line), so the
+    output can be consumed directly by other tools; headings, separators
+    and timing lines are dropped.  Use as a context manager so the last
+    chunk is flushed.
+    """
+
+    def __init__(self, output_format="table", fields=(), line_format="", stream=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.stream = stream or sys.stdout
+        self.output_format = resolve_format(output_format, self.stream)
+        if self.output_format not in FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        self.fields = list(fields)
+        self.line_format = line_format
+        self.chunk_size = chunk_size
+        self._buffer = io.StringIO()
+        self._csv = None
+        self._closed = False
+        if self.output_format == "csv":
+            self._csv = csv.writer(self._buffer, lineterminator="\n")
+            self._csv.writerow(self.fields)
+
+    @property
+    def is_table(self):
+        return self.output_format == "table"
+
+    def text(self, *lines):
+        """Write decoration lines; ignored in machine-readable formats"""
+        if self.is_table:
+            for line in lines:
+                self._buffer.write(line)
+                self._buffer.write("\n")
+            self._flush_if_full()
+
+    def row(self, record):
+        """Write one result row"""
+        if self.output_format == "table":
+            self._buffer.write(self.line_format.format_map(record))
+            self._buffer.write("\n")
+        elif self.output_format == "csv":
+            self._csv.writerow([record[field] for field in self.fields])
+        else:
+            self._buffer.write(json.dumps({field: record[field] for field in self.fields}))
+            self._buffer.write("\n")
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if self._buffer.tell() >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        chunk = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        if self._closed:
+            return
+        try:
+            if chunk:
+                self.stream.write(chunk)
+            self.stream.flush()
+        except BrokenPipeError:
+            # The reader went away (e.g. "| head"); drop the rest of the output
+            # and point the descriptor at devnull so the interpreter's own
+            # flush at exit does not fail again
+            self._closed = True
+            try:
+                os.dup2(os.open(os.devnull, os.O_WRONLY), self.stream.fileno())
+            except (AttributeError, OSError, io.UnsupportedOperation):
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
@@ -1,34 +1,90 @@
-import os
 import click
+from table_cache import table_cache
+from professor_records import ProfessorRecords
+from output_writer import OutputWriter
+from csv_format import read_rows, write_rows
+from file_lock import FileVersion, ConflictError, merge_edit, optimistic_update, replace_file
+from instrumentation import timed
 
 class Professor:
     def __init__(self):
         self.file_path = "professor.csv"
+        from storage import open_storage
+        self.storage = open_storage()
+        self.version = FileVersion(self.file_path)
 
+    @timed("professor.read_data")
     def read_data(self):
-        data = {}
-        if os.path.exists(self.file_path):
-            with open(self.file_path, "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line:  # Skip empty lines
-                        continue
-                    try:
-                        email, professor_name, rank, course_id = line.split(",")
-                        data[professor_name] = {
-                            "email": email,
-                            "rank": rank,
-                            "course_id": course_id
-                        }
-                    except ValueError as e:
-                        click.echo(f"Warning: Skipping malformed line in {self.file_path}: {line}")
-                        continue
+        if self.storage:
+            return self.storage.load("professors", "professors", self._records_from_rows)
+        return table_cache.load(self.file_path, "professors", self._parse_file, depends_on=(self.version.path,))
+
+    def _records_from_rows(self, rows):
+        data = ProfessorRecords()
+        for email, professor_name, rank, course_id in rows:
+            data[professor_name] = {"email": email, "rank": rank, "course_id": course_id}
+        return data
+
+    @timed("professor.parse")
+    def _parse_file(self):
+        data = ProfessorRecords()
+        for email, professor_name, rank, course_id in read_rows(self.file_path, 4):
+            data[professor_name] = {
+                "email": email,
+                "rank": rank,
+                "course_id": course_id
+            }
         return data
 
-    def write_data(self, data):
-        with open(self.file_path, "w") as file:
-            for professor_name, info in data.items():
-                file.write(f"{info['email']},{professor_name},{info['rank']},{info['course_id']}\n")
+    @timed("professor.write_data")
+    def write_data(self, data, expected_version=None):
+        if not isinstance(data, ProfessorRecords):
+            data = ProfessorRecords(data)
+        if self.storage:
+            rows = [(info['email'], professor_name, info['rank'], info['course_id'])
+                    for professor_name, info in data.items()]
+            self.storage.replace("professors", rows, "professors", data, expected_version)
+            return
+        with self.version.locked():
+            self.version.check(expected_version)
+            with replace_file(self.file_path) as file:
+                write_rows(file, ((info['email'], professor_name, info['rank'], info['course_id'])
+                                  for professor_name, info in data.items()))
+            self.version.bump()
+            table_cache.store(self.file_path, "professors", data, depends_on=(self.version.path,))
+
+    def current_version(self):
+        return self.storage.version("professors") if self.storage else self.version.current()
+
+    def update_data(self, change):
+        """Apply change(professors) to a copy of the latest table and write it back.
+
+        Retried from a fresh read whenever another session wrote the table in
+        between, so concurrent edits of different professors are all kept.
+        """
+        return optimistic_update(self.current_version, lambda: ProfessorRecords(self.read_data()),
+                                 change, self.write_data)
+
+    def save_professor(self, professor_name, info, based_on=None):
+        """Write one professor record as an edit of based_on (None for a new professor)"""
+        def change(professors):
+            professors[professor_name] = merge_edit(based_on, info, professors.get(professor_name))
+        self.update_data(change)
+
+    def remove_professor(self, professor_name, based_on):
+        def change(professors):
+            current = professors.get(professor_name)
+            if current is None:
+                return False
+            if dict(current) != dict(based_on):
+                raise ConflictError("The record was changed by another session")
+            del professors[professor_name]
+        self.update_data(change)
+
+    @timed("professor.lookup")
+    def get_course_professors(self, course_id):
+        """Return [(name, info), ...] for the professors assigned to course_id"""
+        return self.read_data().teaching(course_id)
 
     def validate_not_null(self, value, field_name):
         if not value or value.strip() == "":
@@ -44,10 +100,12 @@ class Professor:
                 return False
         return True
 
-    def add_new_professor(self):
+    def add_new_professor(self, professor_name=None, email=None, rank=None, course_id=None):
+        """Add a professor, prompting only for the details that were not passed in"""
         professors = self.read_data()
-        click.echo("Please provide the following details to add a new professor:")
-        professor_name = click.prompt("Professor Name")
+        if professor_name is None:
+            click.echo("Please provide the following details to add a new professor:")
+            professor_name = click.prompt("Professor Name")
 
         if not self.validate_not_null(professor_name, "Professor Name"):
             return
@@ -56,70 +114,88 @@ class Professor:
             click.echo("Professor already exists.")
             return
         
-        email = click.prompt("Email")
+        if email is None:
+            email = click.prompt("Email")
         if not self.validate_not_null(email, "Email"):
             return
         if not self.validate_unique_email(email):
             return
 
-        rank = click.prompt("Rank")
-        course_id = click.prompt("Course ID")
+        if rank is None:
+            rank = click.prompt("Rank")
+        if course_id is None:
+            course_id = click.prompt("Course ID")
         if not self.validate_not_null(course_id, "Course ID"):
             return
 
-        professors[professor_name] = {
-            "email": email,
-            "rank": rank,
-            "course_id": course_id
-        }
-        self.write_data(professors)
+        try:
+            self.save_professor(professor_name, {
+                "email": email,
+                "rank": rank,
+                "course_id": course_id
+            })
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("The new professor record has been added.")
         self.get_professor_details(professor_name)
+        return True
 
     def modify_professor_details(self, professor_name, email=None, rank=None, course_id=None):
+        """Change a professor's details; without any new value the user picks one from a menu"""
         professors = self.read_data()
 
         if professor_name not in professors:
             click.echo("Professor not found.")
             return
 
-        click.echo("Please choose which details to modify.")
-        click.echo("1. Email")
-        click.echo("2. Rank")
-        click.echo("3. Course ID")
-        
-        try:
-            choice = click.prompt("Enter your choice (1-3)", type=int)
-            if choice == 1:
-                email = click.prompt("Please enter new Email")
-                if not self.validate_not_null(email, "Email"):
-                    return
-                if not self.validate_unique_email(email, exclude_name=professor_name):
-                    return
-            elif choice == 2:
-                rank = click.prompt("Please enter new Rank")
-            elif choice == 3:
-                course_id = click.prompt("Please enter new Course ID")
-                if not self.validate_not_null(course_id, "Course ID"):
+        if email is None and rank is None and course_id is None:
+            click.echo("Please choose which details to modify.")
+            click.echo("1. Email")
+            click.echo("2. Rank")
+            click.echo("3. Course ID")
+
+            try:
+                choice = click.prompt("Enter your choice (1-3)", type=int)
+                if choice == 1:
+                    email = click.prompt("Please enter new Email")
+                elif choice == 2:
+                    rank = click.prompt("Please enter new Rank")
+                elif choice == 3:
+                    course_id = click.prompt("Please enter new Course ID")
+                else:
+                    click.echo("Invalid choice.")
                     return
-            else:
-                click.echo("Invalid choice.")
+            except ValueError:
+                click.echo("Invalid input. Please enter a number.")
                 return
-        except ValueError:
-            click.echo("Invalid input. Please enter a number.")
+
+        if email is not None:
+            if not self.validate_not_null(email, "Email"):
+                return
+            if not self.validate_unique_email(email, exclude_name=professor_name):
+                return
+        if course_id is not None and not self.validate_not_null(course_id, "Course ID"):
             return
 
+        original = professors[professor_name]
+        info = dict(original)
         if email:
-            professors[professor_name]["email"] = email
+            info["email"] = email
         if rank:
-            professors[professor_name]["rank"] = rank
+            info["rank"] = rank
         if course_id:
-            professors[professor_name]["course_id"] = course_id
+            info["course_id"] = course_id
 
-        self.write_data(professors)
+        try:
+            self.save_professor(professor_name, info, based_on=original)
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Professor information modified successfully")
         click.echo("The updated information for {} is:".format(professor_name))
         self.get_professor_details(professor_name)
+        return True
 
     def delete_professor(self, professor_name):
         professors = self.read_data()
@@ -128,9 +204,13 @@ class Professor:
             click.echo("Professor not found.")
             return
 
-        del professors[professor_name]
-        self.write_data(professors)
+        try:
+            self.remove_professor(professor_name, professors[professor_name])
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Professor deleted successfully")
+        return True
 
     def get_professor_details(self, professor_name):
         professors = self.read_data()
@@ -142,7 +222,8 @@ class Professor:
         info = professors[professor_name]
         click.echo(f"Professor Name: {professor_name}, Email: {info['email']}, Rank: {info['rank']}, Course ID: {info['course_id']}")
 
-    def generate_professor_wise_report(self, professor_name):
+    @timed("report.professor")
+    def generate_professor_wise_report(self, professor_name, output_format="table"):
         professors = self.read_data()
 
         if professor_name not in professors:
@@ -152,30 +233,27 @@ class Professor:
         prof_info = professors[professor_name]
         course_id = prof_info['course_id']
 
-        click.echo("\n" + "=" * 80)
-        click.echo(f"PROFESSOR REPORT: {professor_name}")
-        click.echo("=" * 80)
-        click.echo(f"Email: {prof_info['email']}")
-        click.echo(f"Rank: {prof_info['rank']}")
-        click.echo(f"Course ID: {course_id}")
-        click.echo("\nStudents in this course:")
-        click.echo("-" * 80)
-
-        from student import Student
+        from student import Student, LISTING_FIELDS, listing_record
         student_obj = Student()
         students = student_obj.read_data()
 
-        found_students = False
-        for (first_name, last_name), info in students.items():
-            if info['course_id'] == course_id:
+        line_format = "Name: {first_name} {last_name}\nEmail: {email}\nGrade: {grade}, Mark: {mark}\n" + "-" * 80
+        with OutputWriter(output_format, LISTING_FIELDS, line_format) as writer:
+            writer.text("\n" + "=" * 80,
+                        f"PROFESSOR REPORT: {professor_name}",
+                        "=" * 80,
+                        f"Email: {prof_info['email']}",
+                        f"Rank: {prof_info['rank']}",
+                        f"Course ID: {course_id}",
+                        "\nStudents in this course:",
+                        "-" * 80)
+
+            found_students = False
+            for key, info in students.in_course(course_id):
                 found_students = True
-                click.echo(f"Name: {first_name} {last_name}")
-                click.echo(f"Email: {info['email']}")
-                click.echo(f"Grade: {info['grade']}, Mark: {info['mark']}")
-                click.echo("-" * 80)
+                writer.row(listing_record(key, info))
 
-        if not found_students:
-            click.echo("No students enrolled in this course.")
-            click.echo("-" * 80)
+            if not found_students:
+                writer.text("No students enrolled in this course.", "-" * 80)
 
-        click.echo("=" * 80)
\ No newline at end of file
+            writer.text("=" * 80)
\ No newline at end of file
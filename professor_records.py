@@ -0,0 +1,65 @@
+def _restore_table(cls, items, state):
+    """Unpickle a table without running its __setitem__, whose index is restored from state"""
+    table = cls.__new__(cls)
+    dict.update(table, items)
+    table.__dict__.update(state)
+    return table
+
+
+class ProfessorRecords(dict):
+    """Professor table keyed by professor name with a course_id -> professors index.
+
+    Behaves like the plain dict Professor.read_data() used to return.  Records
+    must be replaced rather than edited in place so the index sees the change.
+    A course may be taught by several professors; they are kept in the order
+    they were assigned.
+    """
+
+    def __init__(self, records=()):
+        super().__init__()
+        self._by_course = {}
+        for name, info in dict(records).items():
+            self[name] = info
+
+    def __reduce__(self):
+        return _restore_table, (type(self), list(self.items()), self.__dict__)
+
+    def _index_course(self, name, course_id):
+        self._by_course.setdefault(course_id, {})[name] = None
+
+    def _unindex_course(self, name, course_id):
+        names = self._by_course.get(course_id)
+        if names is not None:
+            names.pop(name, None)
+            if not names:
+                del self._by_course[course_id]
+
+    def __setitem__(self, name, info):
+        old_info = self.get(name)
+        super().__setitem__(name, info)
+        if old_info is None or old_info["course_id"] != info["course_id"]:
+            if old_info is not None:
+                self._unindex_course(name, old_info["course_id"])
+            self._index_course(name, info["course_id"])
+
+    def __delitem__(self, name):
+        info = self[name]
+        super().__delitem__(name)
+        self._unindex_course(name, info["course_id"])
+
+    def pop(self, name, *default):
+        if name in self:
+            info = self[name]
+            del self[name]
+            return info
+        return super().pop(name, *default)
+
+    def clear(self):
+        super().clear()
+        self._by_course.clear()
+
+    def teaching(self, course_id):
+        """Return [(name, info), ...] for every professor assigned to course_id"""
+        if not course_id:
+            return []
+        return [(name, self[name]) for name in self._by_course.get(course_id, ())]
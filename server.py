@@ -0,0 +1,495 @@
+import io
+import sys
+import json
+import time
+import random
+import asyncio
+import inspect
+import secrets
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import click
+from table_cache import table_cache
+from instrumentation import measure, registry
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+RESPONSE_LIMIT = 64 * 1024 * 1024  # Longest response line the load test client accepts
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+# Server-defined error codes
+UNAUTHORIZED = -32001
+TOO_MANY_LOGINS = -32002
+
+# Failed logins allowed per account within LOGIN_WINDOW seconds before account.login refuses to check more
+LOGIN_ATTEMPTS = 5
+LOGIN_WINDOW = 60
+SESSION_SECONDS = 8 * 60 * 60
+
+# Write method -> (record object, method, required params, params of which at least one is required, defaults).
+# These are the same mutators the menu and the subcommands use, so every validation rule applies unchanged.
+# Each call needs the session of a Professor login, like the menu's write actions; account.passwd needs a
+# session of the account itself.
+WRITE_METHODS = {
+    "student.add": ("student", "add_new_student", ("first_name", "last_name", "email", "course_id"),
+                    ("grade", "mark"), {}),
+    "student.modify": ("student", "modify_student_details", ("first_name", "last_name"),
+                       ("email", "course_id", "grade", "mark"), {}),
+    "student.delete": ("student", "delete_student", ("first_name", "last_name"), (), {}),
+    "grades.add": ("grades", "add_student_grade", ("first_name", "last_name", "course_id"),
+                   ("grade", "mark"), {"allow_unassigned": False}),
+    "grades.set": ("grades", "modify_student_grade", ("first_name", "last_name", "course_id"),
+                   ("grade", "mark"), {}),
+    "grades.delete": ("grades", "delete_student_grade", ("first_name", "last_name", "course_id"), (), {}),
+    "course.add": ("course", "add_new_course", ("course_id", "course_name", "credits"), (), {"description": ""}),
+    "course.modify": ("course", "modify_course_details", ("course_id",),
+                      ("course_name", "credits", "description"), {}),
+    "course.delete": ("course", "delete_course", ("course_id",), (), {}),
+    "professor.add": ("professor", "add_new_professor", ("professor_name", "email", "rank", "course_id"), (), {}),
+    "professor.modify": ("professor", "modify_professor_details", ("professor_name",),
+                         ("email", "rank", "course_id"), {}),
+    "professor.delete": ("professor", "delete_professor", ("professor_name",), (), {}),
+    "account.create": ("auth", "create_new_account", ("email", "password", "role"), (), {}),
+    "account.passwd": ("auth", "change_password", ("email", "old_password", "new_password"), (), {})
+}
+
+
+def _open_records():
+    """One instance of each record class, bound to the calling thread's storage"""
+    from student import Student
+    from grades import Grades
+    from course import Course
+    from professor import Professor
+    from authentication import Authentication
+    return {"student": Student(), "grades": Grades(), "course": Course(), "professor": Professor(),
+            "auth": Authentication()}
+
+
+class _ThreadOutput:
+    """sys.stdout stand-in that sends what one thread prints to that thread's capture buffer.
+
+    contextlib.redirect_stdout swaps sys.stdout for every thread, so output
+    of the event loop would end up in the messages of a write running on
+    the writer thread.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, "buffer", None) or self.stream
+
+    def write(self, text):
+        return self._target().write(text)
+
+    def flush(self):
+        self._target().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+    @contextmanager
+    def capture(self, buffer):
+        self.local.buffer = buffer
+        try:
+            yield
+        finally:
+            self.local.buffer = None
+
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class RecordServer:
+    """Serves the record classes over newline-delimited JSON-RPC 2.0 from one long-running process.
+
+    Every table is parsed once at startup and then stays resident in the
+    table cache; a request only pays the cache's stat() check, which also
+    picks up writes made by other sessions through the file locks.  Reads
+    run directly on the event loop, so any number of clients are served
+    concurrently.  Writes are queued to a single writer task and applied one
+    at a time in arrival order on a thread of their own, so a write waiting
+    for another process's file lock or for fsync never holds up the reads.
+    Reads hold the table cache's lock, which the writer takes only while
+    it updates cached tables in place, so they never see a table half
+    updated.  Write results carry the messages the menu would have printed.
+    """
+
+    def __init__(self):
+        records = _open_records()
+        self.student = records["student"]
+        self.grades = records["grades"]
+        self.course = records["course"]
+        self.professor = records["professor"]
+        self.auth = records["auth"]
+        self.read_methods = {
+            "student.get": self.student_get,
+            "student.list": self.student_list,
+            "student.search": self.student_search,
+            "grades.get": self.grades_get,
+            "stats.course": self.stats_course,
+            "course.get": self.course_get,
+            "course.report": self.course_report,
+            "professor.get": self.professor_get,
+            "account.login": self.account_login,
+            "account.logout": self.account_logout,
+            "stats.latency": registry.snapshot
+        }
+        self.writes = None
+        self.write_records = None
+        self.write_executor = None
+        self.output = None
+        self.sessions = {}
+        self.login_failures = {}
+
+    def preload(self):
+        """Parse every table once so the first requests do not pay for it"""
+        self.student.read_data()
+        self.grades.read_data()
+        self.course.read_data()
+        self.professor.read_data()
+        self.auth.read_data()
+
+    # Read methods: each returns JSON-ready data and never prints
+
+    def student_get(self, first_name, last_name):
+        info = self.student.lookup_student(first_name, last_name)
+        if info is None:
+            return None
+        from student import listing_record
+        return listing_record((first_name, last_name), info)
+
+    def student_list(self, sort_by="name", order="asc", limit=None, offset=0, course_id=None):
+        if sort_by not in ("name", "marks", "email") or order not in ("asc", "desc"):
+            raise RpcError(INVALID_PARAMS, "sort_by must be name, marks or email and order asc or desc")
+        from student import listing_record
+        page, total = self.student.sorted_rows(sort_by, order, limit, offset, course_id)
+        return {"total": total, "students": [listing_record(key, info) for key, info in page]}
+
+    def student_search(self, term):
+        from student import listing_record
+        return [listing_record(key, info) for key, info in self.student.read_data().search(term)]
+
+    def grades_get(self, first_name, last_name, course_id):
+        if self.grades.lookup_grade(first_name, last_name, course_id) is None:
+            return None
+        return self.grades.get_student_grade(first_name, last_name, course_id)
+
+    def stats_course(self, course_id):
+        stats = self.student.read_data().course_stats(course_id)
+        if stats is None:
+            return None
+        return {"count": stats.count, "mean": stats.mean(), "median": stats.median(),
+                "min": stats.minimum(), "max": stats.maximum()}
+
+    def course_get(self, course_id):
+        info = self.course.read_data().get(course_id)
+        return dict(info, course_id=course_id) if info is not None else None
+
+    def course_report(self, course_id):
+        return self.course.course_report(course_id)
+
+    def professor_get(self, professor_name):
+        info = self.professor.read_data().get(professor_name)
+        return dict(info, professor_name=professor_name) if info is not None else None
+
+    def account_login(self, email, password):
+        """Check a password; a correct one opens a session, whose token authorizes write methods"""
+        now = time.monotonic()
+        self._forget_expired(now)
+        failures = [failed_at for failed_at in self.login_failures.get(email, ()) if now - failed_at < LOGIN_WINDOW]
+        if len(failures) >= LOGIN_ATTEMPTS:
+            raise RpcError(TOO_MANY_LOGINS, "Too many failed logins; try again later")
+        account = self.auth.read_data().get(email)
+        if account is None or account["password"] != self.auth.encrypt_password(password):
+            self.login_failures[email] = failures + [now]
+            return {"role": None}
+        self.login_failures.pop(email, None)
+        session = secrets.token_urlsafe(32)
+        self.sessions[session] = {"email": email, "role": account["role"], "expires": now + SESSION_SECONDS}
+        return {"role": account["role"], "session": session}
+
+    def _forget_expired(self, now):
+        for session, info in list(self.sessions.items()):
+            if info["expires"] < now:
+                del self.sessions[session]
+        for email, failures in list(self.login_failures.items()):
+            if now - failures[-1] >= LOGIN_WINDOW:
+                del self.login_failures[email]
+
+    def account_logout(self, session):
+        return self.sessions.pop(session, None) is not None
+
+    def _authorize(self, method, params):
+        """Check the session passed with a write call, raising RpcError unless it may make it"""
+        session = self.sessions.get(params.pop("session", None))
+        if session is not None and session["expires"] < time.monotonic():
+            session = None
+        if session is None:
+            raise RpcError(UNAUTHORIZED, "Write methods need the session of an account.login")
+        if method == "account.passwd":
+            if params.get("email") != session["email"]:
+                raise RpcError(UNAUTHORIZED, "A session can only change its own password")
+        elif session["role"] != "Professor":
+            raise RpcError(UNAUTHORIZED, "Only professors can change records")
+
+    # Writes
+
+    def _write_call(self, method, params):
+        """Validate params for a WRITE_METHODS entry and return the call for the writer task"""
+        target, name, required, one_of, defaults = WRITE_METHODS[method]
+        missing = [param for param in required if params.get(param) is None]
+        if missing:
+            raise RpcError(INVALID_PARAMS, f"Missing params: {', '.join(missing)}")
+        if one_of and all(params.get(param) is None for param in one_of):
+            raise RpcError(INVALID_PARAMS, f"Give at least one of: {', '.join(one_of)}")
+        function = getattr(getattr(self, target), name)  # Only for checking params; the writer has its own
+        arguments = dict(defaults)
+        for param, value in params.items():
+            if value is not None and not isinstance(value, (str, bool)):
+                value = str(value)  # Marks may arrive as JSON numbers
+            arguments[param] = value
+        try:
+            inspect.signature(function).bind(**arguments)
+        except TypeError as error:
+            raise RpcError(INVALID_PARAMS, str(error)) from None
+        return lambda: self._run_write(target, name, arguments)
+
+    def _open_write_records(self):
+        self.write_records = _open_records()
+
+    def _run_write(self, target, name, arguments):
+        """Call one mutator on the writer thread, capturing what it prints"""
+        function = getattr(self.write_records[target], name)
+        output = io.StringIO()
+        old_stdin = sys.stdin
+        sys.stdin = io.StringIO()  # A prompt for anything still missing aborts instead of blocking the server
+        try:
+            with self.output.capture(output):
+                ok = bool(function(**arguments))
+        except click.exceptions.Abort:
+            ok = False
+            # Replace the unanswered prompt, the output's unterminated last line
+            text = output.getvalue()
+            output = io.StringIO(text[:text.rfind("\n") + 1] + "Error: a required value is missing.\n")
+        finally:
+            sys.stdin = old_stdin
+        return {"ok": ok, "messages": [line for line in output.getvalue().splitlines() if line.strip()]}
+
+    async def _writer(self):
+        """The single writer: apply queued writes one at a time on the writer thread"""
+        loop = asyncio.get_running_loop()
+        while True:
+            call, future = await self.writes.get()
+            try:
+                result = await loop.run_in_executor(self.write_executor, call)
+            except Exception as error:
+                if not future.cancelled():
+                    future.set_exception(error)
+            else:
+                if not future.cancelled():
+                    future.set_result(result)
+            finally:
+                self.writes.task_done()
+
+    # Protocol
+
+    async def dispatch(self, request):
+        """Return the result of one JSON-RPC request object, raising RpcError on failure"""
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            raise RpcError(INVALID_REQUEST, "Expected a JSON-RPC request object")
+        method = request["method"]
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            raise RpcError(INVALID_PARAMS, "params must be an object")
+
+        if method in WRITE_METHODS:
+            params = dict(params)
+            self._authorize(method, params)
+            with measure("rpc." + method):
+                future = asyncio.get_running_loop().create_future()
+                await self.writes.put((self._write_call(method, params), future))
+                return await future
+
+        function = self.read_methods.get(method)
+        if function is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Unknown method: {method}")
+        try:
+            inspect.signature(function).bind(**params)
+        except TypeError as error:
+            raise RpcError(INVALID_PARAMS, str(error)) from None
+        with measure("rpc." + method), table_cache.lock:
+            return function(**params)
+
+    async def _respond(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": PARSE_ERROR, "message": "Parse error"}}
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            result = await self.dispatch(request)
+        except RpcError as error:
+            response = {"jsonrpc": "2.0", "id": request_id, "error": {"code": error.code, "message": str(error)}}
+        except Exception as error:
+            response = {"jsonrpc": "2.0", "id": request_id,
+                        "error": {"code": INTERNAL_ERROR, "message": f"{type(error).__name__}: {error}"}}
+        else:
+            response = {"jsonrpc": "2.0", "id": request_id, "result": result}
+        if isinstance(request, dict) and "id" not in request:
+            return None  # A notification gets no response
+        return response
+
+    async def handle_client(self, reader, writer):
+        """Answer one connection's requests in order, one JSON object per line each way"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await self._respond(line)
+                if response is not None:
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, ready=None):
+        self.preload()
+        self.writes = asyncio.Queue()
+        self.output = sys.stdout = _ThreadOutput(sys.stdout)
+        self.write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer",
+                                                 initializer=self._open_write_records)
+        writer_task = asyncio.create_task(self._writer())
+        if socket_path:
+            server = await asyncio.start_unix_server(self.handle_client, socket_path)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            writer_task.cancel()
+            self.write_executor.shutdown(wait=True)
+            sys.stdout = self.output.stream
+
+
+async def _load_client(host, port, keys, requests, rng, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for n in range(requests):
+            first_name, last_name, course_id = rng.choice(keys)
+            method, params = rng.choice([
+                ("student.get", {"first_name": first_name, "last_name": last_name}),
+                ("grades.get", {"first_name": first_name, "last_name": last_name, "course_id": course_id}),
+                ("stats.course", {"course_id": course_id})
+            ])
+            start = time.perf_counter_ns()
+            writer.write(json.dumps({"jsonrpc": "2.0", "id": n, "method": method, "params": params}).encode() + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter_ns() - start)
+            if "error" in response:
+                raise RuntimeError(response["error"]["message"])
+    finally:
+        writer.close()
+
+
+async def run_load_test(host=DEFAULT_HOST, port=DEFAULT_PORT, clients=50, requests=200, seed=0):
+    """Send requests from concurrent clients, each waiting for every answer; return throughput and latency"""
+    reader, writer = await asyncio.open_connection(host, port, limit=RESPONSE_LIMIT)
+    writer.write(json.dumps({"jsonrpc": "2.0", "id": 0, "method": "student.list",
+                             "params": {"limit": 1000}}).encode() + b"\n")
+    students = json.loads(await reader.readline())["result"]["students"]
+    writer.close()
+    keys = [(row["first_name"], row["last_name"], row["course_id"]) for row in students]
+    if not keys:
+        raise click.ClickException("The server has no students to query.")
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_load_client(host, port, keys, requests, random.Random(seed * 1000 + client), latencies)
+                           for client in range(clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": latencies[len(latencies) // 2] / 1e6,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] / 1e6
+    }
+
+
+@click.group()
+def main():
+    """Serve CheckMyGrade records over JSON-RPC from a resident process."""
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+@main.command("serve")
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option("--port", default=DEFAULT_PORT, show_default=True)
+@click.option("--socket", "socket_path", type=click.Path(dir_okay=False), help="Listen on a Unix socket instead.")
+@click.option("--allow-remote", is_flag=True, help="Allow a --host other than a loopback address.")
+def serve_command(host, port, socket_path, allow_remote):
+    """Load every table once and answer JSON-RPC requests, one JSON object per line.
+
+    Read methods: student.get, student.list, student.search, grades.get,
+    stats.course, course.get, course.report, professor.get, account.login,
+    account.logout, and stats.latency for the server's own per-operation
+    latency histograms.  Write methods: student/grades/course/professor
+    .add, .modify (grades.set) and .delete, account.create and
+    account.passwd; each takes the "session" returned by account.login.
+    """
+    if not socket_path and not allow_remote and not _is_loopback(host):
+        raise click.ClickException(f"{host} is not a loopback address; pass --allow-remote to serve it anyway.")
+
+    def ready(server):
+        click.echo(f"Serving on {socket_path or f'{host}:{port}'}; press Ctrl+C to stop.")
+
+    try:
+        asyncio.run(RecordServer().serve(host, port, socket_path, ready))
+    except KeyboardInterrupt:
+        click.echo("Server stopped.")
+
+
+@main.command("load-test")
+@click.option("--host", default=DEFAULT_HOST, show_default=True)
+@click.option("--port", default=DEFAULT_PORT, show_default=True)
+@click.option("--clients", default=50, show_default=True, help="Concurrent connections.")
+@click.option("--requests", default=200, show_default=True, help="Requests per connection.")
+@click.option("--seed", default=0, show_default=True)
+def load_test_command(host, port, clients, requests, seed):
+    """Measure read throughput and latency of a running server."""
+    click.echo(json.dumps(asyncio.run(run_load_test(host, port, clients, requests, seed)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
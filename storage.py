@@ -0,0 +1,336 @@
+import os
+import threading
+import click
+from file_lock import StaleVersionError
+from csv_format import write_rows
+
+STORAGE_ENV = "CHECKMYGRADE_DB"
+DEFAULT_DB_PATH = "checkmygrade.db"
+
+# Table name -> (columns in CSV order, primary key columns, CSV file)
+TABLES = {
+    "students": (("email", "first_name", "last_name", "course_id", "grade", "mark"),
+                 ("first_name", "last_name", "course_id"), "student.csv"),
+    "courses": (("course_id", "course_name", "credits", "description"), ("course_id",), "course.csv"),
+    "professors": (("email", "name", "rank", "course_id"), ("name",), "professor.csv"),
+    "accounts": (("role", "email", "password"), ("email",), "authentication.csv")
+}
+
+# The students primary key (first_name, last_name, course_id) doubles as the name index
+INDEXES = {
+    "students_email": ("students", ("email",)),
+    "students_course": ("students", ("course_id",)),
+    "professors_course": ("professors", ("course_id",)),
+    "professors_email": ("professors", ("email",))
+}
+
+
+def open_storage():
+    """Return the SQLite backend named by $CHECKMYGRADE_DB, or None to use the CSV files"""
+    db_path = os.environ.get(STORAGE_ENV)
+    if not db_path:
+        return None
+    return SqliteStorage.open(db_path)
+
+
+class SqliteStorage:
+    """SQLite backend for the record classes, used instead of their CSV files.
+
+    Every table keeps the CSV's columns and row order (rowid order) and has
+    a primary key plus secondary indexes, so point lookups and single-row
+    updates are O(log n).  The database runs in WAL mode so readers never
+    block the writer.  Parsed views (the same structures the CSV parsers
+    build) are cached per table and tagged with the table's version number,
+    which every write bumps inside its transaction; a view is rebuilt only
+    when another connection changed its table, and this connection's own
+    single-row writes update cached views in place.  The same version
+    numbers serve the record classes' optimistic concurrency checks.
+    Each thread gets its own connection, and with it its own views.
+    """
+
+    _instances = {}
+
+    @classmethod
+    def open(cls, db_path):
+        key = (os.path.abspath(db_path), threading.get_ident())
+        if key not in cls._instances:
+            storage = cls._instances[key] = cls(db_path)
+            storage._key = key
+        return cls._instances[key]
+
+    def __init__(self, db_path):
+        import sqlite3  # Only loaded when a database is in use
+        self.db_path = db_path
+        # Autocommit mode; writes open explicit BEGIN IMMEDIATE transactions
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self._views = {}
+        self._transaction_depth = 0
+        self._create_schema()
+        self.student_log = SqliteStudentLog(self)
+
+    def _create_schema(self):
+        with self.transaction():
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS table_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+            for table, (columns, key, csv_file) in TABLES.items():
+                column_list = ", ".join(f"{column} TEXT NOT NULL" for column in columns)
+                self.connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ({column_list}, PRIMARY KEY ({', '.join(key)}))")
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)", (table,))
+            for name, (table, columns) in INDEXES.items():
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})")
+
+    def transaction(self):
+        """Exclusive write transaction; nested uses join the outermost one"""
+        return _Transaction(self)
+
+    def version(self, table):
+        return self.connection.execute(
+            "SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()[0]
+
+    def rows(self, table):
+        """Every row of table as a tuple in CSV column order, oldest first"""
+        columns = TABLES[table][0]
+        return self.connection.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid").fetchall()
+
+    def find(self, table, column, value):
+        """Rows of table whose column equals value, through its index"""
+        columns = TABLES[table][0]
+        return self.connection.execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {column} = ? ORDER BY rowid", (value,)).fetchall()
+
+    def load(self, table, kind, build):
+        """Return the cached view of the given kind, calling build(rows) only when the table changed"""
+        version = self.version(table)
+        entry = self._views.get(table)
+        if entry is None or entry["version"] != version:
+            entry = {"version": version, "views": {}}
+            self._views[table] = entry
+        if kind not in entry["views"]:
+            entry["views"][kind] = build(self.rows(table))
+        return entry["views"][kind]
+
+    def _write(self, table, statements, apply=None, expected_version=None):
+        """Run (sql, params) statements in one transaction and bump the table's version.
+
+        apply(kind, view) updates one cached view in place to match and
+        returns False for views it cannot update, which are then dropped.
+        Raises StaleVersionError if the table is no longer at expected_version.
+        """
+        with self.transaction():
+            version = self.version(table)
+            if expected_version is not None and version != expected_version:
+                raise StaleVersionError(f"{table} was changed by another session")
+            for sql, params in statements:
+                if isinstance(params, list):
+                    self.connection.executemany(sql, params)
+                else:
+                    self.connection.execute(sql, params)
+            self.connection.execute("UPDATE table_versions SET version = ? WHERE name = ?", (version + 1, table))
+
+        entry = self._views.get(table)
+        if entry is None or entry["version"] != version or apply is None:
+            self._views.pop(table, None)
+            return
+        for kind, view in list(entry["views"].items()):
+            if apply(kind, view) is False:
+                del entry["views"][kind]
+        entry["version"] = version + 1
+
+    def replace(self, table, rows, kind=None, view=None, expected_version=None):
+        """Replace every row of table; view, if given, becomes the cached view of that kind"""
+        columns = TABLES[table][0]
+        placeholders = ", ".join("?" for column in columns)
+        with self.transaction():
+            self._write(table, [
+                (f"DELETE FROM {table}", ()),
+                (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", list(rows))
+            ], expected_version=expected_version)
+            if kind is not None:
+                self._views[table] = {"version": self.version(table), "views": {kind: view}}
+
+    def upsert(self, table, row, apply=None, expected_version=None):
+        """Insert row, or update the row with the same primary key where it stands"""
+        columns, key, csv_file = TABLES[table]
+        placeholders = ", ".join("?" for column in columns)
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column not in key)
+        self._write(table, [(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+                             f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {updates}", tuple(row))],
+                    apply, expected_version)
+
+    def delete(self, table, key_values, apply=None, expected_version=None):
+        key = TABLES[table][1]
+        condition = " AND ".join(f"{column} = ?" for column in key)
+        self._write(table, [(f"DELETE FROM {table} WHERE {condition}", tuple(key_values))],
+                    apply, expected_version)
+
+    def export_csv(self, table, csv_path):
+        """Atomically write table back out in its CSV format"""
+        temp_path = csv_path + ".tmp"
+        with open(temp_path, "w") as file:
+            write_rows(file, self.rows(table))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, csv_path)
+
+    def close(self):
+        self.connection.close()
+        SqliteStorage._instances.pop(self._key, None)
+
+
+class _Transaction:
+    def __init__(self, storage):
+        self.storage = storage
+
+    def __enter__(self):
+        if not self.storage._transaction_depth:
+            self.storage.connection.execute("BEGIN IMMEDIATE")
+        self.storage._transaction_depth += 1
+        return self.storage.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.storage._transaction_depth -= 1
+        if self.storage._transaction_depth:
+            return
+        if exc_type is None:
+            self.storage.connection.execute("COMMIT")
+        else:
+            self.storage.connection.execute("ROLLBACK")
+            # Views may have been updated for writes that were just undone
+            self.storage._views.clear()
+
+
+class SqliteStudentLog:
+    """Single-row student.csv changes for the SQLite backend.
+
+    Has the put/delete interface of StudentJournal, and applies each change
+    to the cached Student and Grades views with the journal's own appliers;
+    a changed student's Student record is re-read from the database.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def _applier(self, entries):
+        """apply(kind, view) for SqliteStorage._write that brings a cached view up to date with journal entries"""
+        from student_journal import apply_to_grades, apply_to_students
+
+        def apply(kind, view):
+            if kind == "grades":
+                for op, fields in entries:
+                    apply_to_grades(view, op, fields)
+            elif kind == "students":
+                apply_to_students(view, entries, self._latest)
+            else:
+                return False
+        return apply
+
+    def _latest(self, first_name, last_name):
+        """The record Student.read_data() holds for a student: the student's last row, or None"""
+        from student_records import StudentRecord
+        row = self.storage.connection.execute(
+            "SELECT email, course_id, grade, mark FROM students WHERE first_name = ? AND last_name = ? "
+            "ORDER BY rowid DESC LIMIT 1", (first_name, last_name)).fetchone()
+        return StudentRecord(*row) if row else None
+
+    def current_version(self):
+        return self.storage.version("students")
+
+    def put(self, email, first_name, last_name, course_id, grade, mark, old_course_id="", expected_version=None):
+        self.put_all([(email, first_name, last_name, course_id, grade, mark, old_course_id)], expected_version)
+
+    def put_all(self, rows, expected_version=None):
+        statements = []
+        for email, first_name, last_name, course_id, grade, mark, old_course_id in rows:
+            if old_course_id and old_course_id != course_id:
+                statements.append(("DELETE FROM students WHERE first_name = ? AND last_name = ? AND course_id = ?",
+                                   (first_name, last_name, old_course_id)))
+            statements.append(("INSERT INTO students (email, first_name, last_name, course_id, grade, mark) "
+                               "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (first_name, last_name, course_id) "
+                               "DO UPDATE SET email = excluded.email, grade = excluded.grade, mark = excluded.mark",
+                               (email, first_name, last_name, course_id, grade, mark)))
+        self.storage._write("students", statements, self._applier([("P", list(row)) for row in rows]),
+                            expected_version)
+
+    def delete(self, first_name, last_name, course_id, expected_version=None):
+        self.storage.delete("students", (first_name, last_name, course_id),
+                            self._applier([("D", [first_name, last_name, course_id])]), expected_version)
+
+    def delete_student(self, first_name, last_name, expected_version=None):
+        self.storage._write("students", [("DELETE FROM students WHERE first_name = ? AND last_name = ?",
+                                          (first_name, last_name))],
+                            self._applier([("R", [first_name, last_name])]), expected_version)
+
+    def needs_compaction(self):
+        return False
+
+
+def _csv_rows(table):
+    """Parse table's CSV file with its record class, journal included, into rows"""
+    if table == "students":
+        from grades import Grades
+        return [(info["email"], first_name, last_name, course_id, info["grade"], info["mark"])
+                for (first_name, last_name, course_id), info in Grades()._parse_file().items()]
+    if table == "courses":
+        from course import Course
+        return [(course_id, info["course_name"], info["credits"], info["description"])
+                for course_id, info in Course()._parse_file().items()]
+    if table == "professors":
+        from professor import Professor
+        return [(info["email"], name, info["rank"], info["course_id"])
+                for name, info in Professor()._parse_file().items()]
+    from authentication import Authentication
+    return [(info["role"], email, info["password"]) for email, info in Authentication()._parse_file().items()]
+
+
+def import_csv_files(storage):
+    """Replace every table of storage with its CSV file's rows; return {table: row count}"""
+    counts = {}
+    for table in TABLES:
+        rows = _csv_rows(table)
+        storage.replace(table, rows)
+        counts[table] = len(rows)
+    return counts
+
+
+@click.group()
+def main():
+    """Move CheckMyGrade data between the CSV files and a SQLite database.
+
+    Run from the directory holding the CSV files.  Set CHECKMYGRADE_DB to
+    the database path to make the application use it.
+    """
+
+
+@main.command("import")
+@click.option("--db", "db_path", default=DEFAULT_DB_PATH, show_default=True, help="SQLite database to fill.")
+def import_command(db_path):
+    """Copy every CSV file (and the student journal) into the database, replacing its tables."""
+    counts = import_csv_files(SqliteStorage.open(db_path))
+    for table, (columns, key, csv_file) in TABLES.items():
+        click.echo(f"Imported {counts[table]} row(s) from {csv_file} into {table}")
+    click.echo(f"Set {STORAGE_ENV}={db_path} to use the database.")
+
+
+@main.command("export")
+@click.option("--db", "db_path", default=DEFAULT_DB_PATH, show_default=True, help="SQLite database to read.")
+def export_command(db_path):
+    """Write every table of the database back to its CSV file."""
+    if not os.path.exists(db_path):
+        click.echo(f"Database {db_path} not found.")
+        return
+    storage = SqliteStorage.open(db_path)
+    for table, (columns, key, csv_file) in TABLES.items():
+        storage.export_csv(table, csv_file)
+        click.echo(f"Exported {table} to {csv_file}")
+    # The CSV files are complete now, so stale sidecars must not be replayed or trusted
+    for stale_path in ("student.csv.journal", "authentication.csv.idx"):
+        if os.path.exists(stale_path):
+            os.remove(stale_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import click
+from benchmark import generate_dataset
+
+COURSE_EVERY = 10  # Each worker also adds a course on every COURSE_EVERY-th operation
+
+
+def _worker(job):
+    """Process pool worker: increment random counters through the optimistic write path"""
+    data_dir, worker_id, operations, counter_keys, compact_threshold, seed = job
+    os.chdir(data_dir)
+    from student_journal import StudentJournal
+    from grades import Grades
+    from course import Course
+    from file_lock import ConflictError
+    import grade_scale
+
+    StudentJournal.compact_threshold = compact_threshold
+    rng = random.Random(seed * 1000 + worker_id)
+    grades = Grades()
+    course = Course()
+    conflicts = 0
+    start = time.perf_counter()
+    for n in range(operations):
+        first_name, last_name, course_id = rng.choice(counter_keys)
+        key = (first_name, last_name, course_id)
+        while True:
+            row = grades.read_data()[key]
+            mark = str(int(row["mark"]) + 1)
+            info = {"email": row["email"], "grade": grade_scale.mark_to_grade(mark), "mark": mark}
+            try:
+                grades.save_grade(first_name, last_name, course_id, info, based_on=row)
+                break
+            except ConflictError:
+                # Another worker incremented the same counter first: re-read and retry
+                conflicts += 1
+        if n % COURSE_EVERY == 0:
+            course.save_course(f"W{worker_id}-{n}", {"course_name": "Stress", "credits": "1", "description": "x"})
+    return {"operations": operations, "conflicts": conflicts, "seconds": time.perf_counter() - start}
+
+
+def run_stress_test(processes, operations, counters, students, compact_threshold, storage, seed):
+    """Run concurrent workers against a fresh dataset and return a report; lost_updates must be 0"""
+    from grades import Grades
+    from course import Course
+    from table_cache import table_cache
+
+    data_dir = tempfile.mkdtemp(prefix="checkmygrade-stress-")
+    original_dir = os.getcwd()
+    old_db = os.environ.pop("CHECKMYGRADE_DB", None)
+    try:
+        generate_dataset(data_dir, students, seed)
+        os.chdir(data_dir)
+        table_cache.invalidate()
+        if storage == "sqlite":
+            from storage import SqliteStorage, import_csv_files
+            os.environ["CHECKMYGRADE_DB"] = os.path.join(data_dir, "checkmygrade.db")
+            import_csv_files(SqliteStorage.open(os.environ["CHECKMYGRADE_DB"]))
+
+        # Turn the first rows into counters starting at 0
+        grades_obj = Grades()
+        grades = dict(grades_obj.read_data())
+        counter_keys = list(grades)[:counters]
+        for key in counter_keys:
+            grades[key] = {"email": grades[key]["email"], "grade": "F", "mark": "0"}
+        grades_obj.write_data(grades)
+
+        jobs = [(data_dir, worker_id, operations, counter_keys, compact_threshold, seed)
+                for worker_id in range(processes)]
+        start = time.perf_counter()
+        # Spawn, so no worker inherits an open database connection or lock
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results = list(pool.map(_worker, jobs))
+        elapsed = time.perf_counter() - start
+
+        table_cache.invalidate()
+        final = Grades().read_data()
+        total = sum(int(final[key]["mark"]) for key in counter_keys)
+        courses = Course().read_data()
+        expected_courses = {f"W{worker_id}-{n}" for worker_id in range(processes)
+                            for n in range(0, operations, COURSE_EVERY)}
+        return {
+            "storage": storage,
+            "processes": processes,
+            "operations_per_process": operations,
+            "counters": counters,
+            "expected_increments": processes * operations,
+            "applied_increments": total,
+            "lost_updates": processes * operations - total,
+            "lost_course_writes": len(expected_courses - set(courses)),
+            "conflicts_retried": sum(result["conflicts"] for result in results),
+            "seconds": round(elapsed, 3),
+            "throughput_per_second": round(processes * operations / elapsed, 1)
+        }
+    finally:
+        os.chdir(original_dir)
+        table_cache.invalidate()
+        os.environ.pop("CHECKMYGRADE_DB", None)
+        if old_db is not None:
+            os.environ["CHECKMYGRADE_DB"] = old_db
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+@click.command()
+@click.option("--processes", default=4, show_default=True, help="Concurrent writer processes.")
+@click.option("--operations", default=200, show_default=True, help="Increments per process.")
+@click.option("--counters", default=5, show_default=True, help="Student rows the increments are spread over.")
+@click.option("--students", default=1000, show_default=True, help="Size of the generated dataset.")
+@click.option("--compact-threshold", default=4096, show_default=True,
+              help="Journal size in bytes that triggers compaction, kept small to exercise it.")
+@click.option("--storage", type=click.Choice(["csv", "sqlite"]), default="csv", show_default=True)
+@click.option("--seed", default=0, show_default=True)
+def main(processes, operations, counters, students, compact_threshold, storage, seed):
+    """Hammer student.csv from several processes and check that no update is lost."""
+    report = run_stress_test(processes, operations, counters, students, compact_threshold, storage, seed)
+    click.echo(json.dumps(report, indent=2))
+    if report["lost_updates"] or report["lost_course_writes"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,141 @@
-import os
+import sys
+import math
 import click
-import time
+import heapq
+import grade_scale
+from table_cache import table_cache
+from student_journal import StudentJournal, entry_name, apply_to_grades, apply_to_students, student_from_grades
+from student_index import StudentIndex
+from student_records import StudentRecords, StudentRecord, GradeRecords, GradeRecord
+from output_writer import OutputWriter
+from csv_format import read_rows
+from file_lock import ConflictError, write_record
+from instrumentation import timed, measure
+
+LISTING_FIELDS = ('first_name', 'last_name', 'email', 'course_id', 'grade', 'mark')
+
+
+def listing_record(key, info):
+    """Flatten a (first_name, last_name) key and its record into one row for OutputWriter"""
+    first_name, last_name = key
+    return {
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': info['email'],
+        'course_id': info['course_id'],
+        'grade': info['grade'],
+        'mark': info['mark']
+    }
+
 
 class Student:
     def __init__(self):
         self.file_path = "student.csv"
+        from storage import open_storage
+        self.storage = open_storage()
+        self.journal = self.storage.student_log if self.storage else StudentJournal(self.file_path)
+        self.index = None if self.storage else StudentIndex(self.file_path, self.journal)
     
     def mark_to_grade(self, mark):
         """Convert numerical mark to letter grade"""
-        try:
-            mark_value = float(mark)
-            if mark_value >= 93:
-                return 'A'
-            elif mark_value >= 85:
-                return 'B'
-            elif mark_value >= 75:
-                return 'C'
-            elif mark_value >= 60:
-                return 'D'
-            else:
-                return 'F'
-        except ValueError:
-            return mark  # Return as-is if not a number
+        return grade_scale.mark_to_grade(mark)
     
     def grade_to_mark(self, grade):
         """Convert letter grade to representative numerical mark"""
-        grade_map = {
-            'A': 96.5,  # Middle of 93-100
-            'B': 88.5,  # Middle of 85-92
-            'C': 79.5,  # Middle of 75-84
-            'D': 67.0,  # Middle of 60-74
-            'F': 30.0   # Representative failing grade
-        }
-        return grade_map.get(grade.upper(), grade)
+        return grade_scale.grade_to_mark(grade)
     
     def get_sortable_mark(self, mark):
-        """Convert mark to float for sorting, handling both numbers and letter grades"""
-        try:
-            return float(mark)
-        except ValueError:
-            # If it's a letter grade, convert it to numerical value
-            return float(self.grade_to_mark(mark))
+        """Convert mark to float for sorting, handling both numbers and letter grades.
 
+        An unusable mark (blank, NaN or not a grade) sorts after every other one.
+        """
+        value = grade_scale.mark_value(mark)
+        return math.inf if value is None else value
+
+    @timed("student.read_data")
     def read_data(self):
-        students = {}
-        if os.path.exists(self.file_path):
-            with open(self.file_path, "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if not line:  # Skip empty lines
-                        continue
-                    try:
-                        email, first_name, last_name, course_id, grade, mark = line.split(",")
-                        key = (first_name, last_name)
-                        students[key] = {
-                            "email": email,
-                            "course_id": course_id,
-                            "grade": grade,
-                            "mark": mark
-                        }
-                    except ValueError as e:
-                        click.echo(f"Warning: Skipping malformed line in {self.file_path}: {line}")
-                        continue
+        if self.storage:
+            return self.storage.load("students", "students", self._records_from_rows)
+        return table_cache.load(self.file_path, "students", self._parse_file,
+                                depends_on=self.journal.depends_on)
+
+    def _records_from_rows(self, rows):
+        return StudentRecords.loaded(((sys.intern(first_name), last_name), StudentRecord(email, course_id, grade, mark))
+                                     for email, first_name, last_name, course_id, grade, mark in rows)
+
+    @timed("student.lookup")
+    def lookup_student(self, first_name, last_name):
+        """Return one student's record, or None, without parsing student.csv"""
+        if self.storage:
+            rows = [row for row in self.storage.find("students", "first_name", first_name) if row[2] == last_name]
+            if not rows:
+                return None
+            email, first_name, last_name, course_id, grade, mark = rows[-1]
+            return StudentRecord(email, course_id, grade, mark)
+        return self.index.student(first_name, last_name)
+
+    @timed("student.lookup_email")
+    def find_student_by_email(self, email):
+        """Return ((first_name, last_name), record) of the student with email, or None"""
+        if self.storage:
+            for email, first_name, last_name, course_id, grade, mark in self.storage.find("students", "email", email):
+                info = self.lookup_student(first_name, last_name)
+                if info is not None and info["email"] == email:
+                    return (first_name, last_name), info
+            return None
+        return self.index.student_by_email(email)
+
+    @timed("student.parse")
+    def _parse_file(self):
+        entries = list(StudentJournal(self.file_path).entries())
+        changed = {entry_name(op, fields) for op, fields in entries}
+        rows = {}
+        changed_rows = GradeRecords()  # Every row of the students the journal changes
+        for email, first_name, last_name, course_id, grade, mark in read_rows(self.file_path, 6):
+            key = (sys.intern(first_name), last_name)
+            rows[key] = StudentRecord(email, course_id, grade, mark)
+            if key in changed:
+                changed_rows[(first_name, last_name, course_id)] = GradeRecord(email, grade, mark)
+        students = StudentRecords.loaded(rows.items())
+        for op, fields in entries:
+            apply_to_grades(changed_rows, op, fields)
+        apply_to_students(students, entries,
+                          lambda first_name, last_name: student_from_grades(changed_rows, first_name, last_name))
         return students
 
-    def write_data(self, data):
-        with open(self.file_path, "w") as file:
-            for (first_name, last_name), info in data.items():
-                file.write(f"{info['email']},{first_name},{last_name},{info['course_id']},{info['grade']},{info['mark']}\n")
+    @timed("student.save")
+    def save_student(self, first_name, last_name, info, based_on=None):
+        """Write a single student record through the journal (or the database) instead of rewriting student.csv.
+
+        info is an edit of based_on, the record the caller read (None for a
+        new student).  The edited fields are merged into the latest record
+        and only written if no other session wrote in between, otherwise the
+        merge is retried.  Raises ConflictError if another session changed
+        the same fields.
+        """
+        key = (first_name, last_name)
+
+        def write(merged, current, expected_version):
+            self.journal.put(merged["email"], first_name, last_name, merged["course_id"], merged["grade"],
+                             merged["mark"], current["course_id"] if current else "", expected_version)
+
+        write_record(self.journal.current_version, lambda: self.read_data().get(key), based_on, info, write)
+        self.compact_if_needed()
+
+    @timed("student.remove")
+    def remove_student(self, first_name, last_name, based_on):
+        key = (first_name, last_name)
+
+        def write(merged, current, expected_version):
+            self.journal.delete_student(first_name, last_name, expected_version)
+
+        write_record(self.journal.current_version, lambda: self.read_data().get(key), based_on, None, write)
+        self.compact_if_needed()
+
+    def compact_if_needed(self):
+        """Merge the journal back into student.csv once it passes its size threshold"""
+        from grades import Grades
+        Grades().compact_if_needed()
 
     def validate_not_null(self, value, field_name):
         if not value or value.strip() == "":
@@ -76,18 +144,39 @@ class Student:
         return True
 
     def validate_unique_email(self, email, exclude_key=None):
-        students = self.read_data()
-        for key, info in students.items():
-            if key != exclude_key and info['email'] == email:
-                click.echo(f"Error: Email {email} already exists.")
-                return False
+        owner = self.read_data().key_for_email(email)
+        if owner is not None and owner != exclude_key:
+            click.echo(f"Error: Email {email} already exists.")
+            return False
         return True
 
-    def add_new_student(self):
+    def prompt_grade_or_mark(self):
+        """Ask whether to enter a mark or a letter grade; return (grade, mark) with the other one None"""
+        click.echo("\nHow would you like to enter the grade?")
+        click.echo("1. Enter numerical mark (0-100) - grade will be calculated automatically")
+        click.echo("2. Enter letter grade (A, B, C, D, F) - representative mark will be assigned")
+
+        try:
+            choice = click.prompt("Enter your choice (1-2)", type=int)
+        except ValueError:
+            click.echo("Invalid input.")
+            return None
+        if choice == 1:
+            return None, click.prompt("Mark (0-100)")
+        elif choice == 2:
+            return click.prompt("Grade (A/B/C/D/F)"), None
+        click.echo("Invalid choice.")
+        return None
+
+    def add_new_student(self, first_name=None, last_name=None, email=None, course_id=None, grade=None, mark=None):
+        """Add a student, prompting only for the details that were not passed in"""
         students = self.read_data()
-        click.echo("Please provide the following details to add a new student:")
-        first_name = click.prompt("First Name")
-        last_name = click.prompt("Last Name")
+        if first_name is None or last_name is None:
+            click.echo("Please provide the following details to add a new student:")
+        if first_name is None:
+            first_name = click.prompt("First Name")
+        if last_name is None:
+            last_name = click.prompt("Last Name")
 
         if not self.validate_not_null(first_name, "First Name"):
             return
@@ -100,122 +189,113 @@ class Student:
             click.echo("Student already exists.")
             return
         
-        email = click.prompt("Email")
+        if email is None:
+            email = click.prompt("Email")
         if not self.validate_not_null(email, "Email"):
             return
         if not self.validate_unique_email(email):
             return
 
-        course_id = click.prompt("Course ID")
+        if course_id is None:
+            course_id = click.prompt("Course ID")
         if not self.validate_not_null(course_id, "Course ID"):
             return
 
-        # Ask user if they want to enter grade or mark
-        click.echo("\nHow would you like to enter the grade?")
-        click.echo("1. Enter numerical mark (0-100) - grade will be calculated automatically")
-        click.echo("2. Enter letter grade (A, B, C, D, F) - representative mark will be assigned")
-        
+        if grade is None and mark is None:
+            entered = self.prompt_grade_or_mark()
+            if entered is None:
+                return
+            grade, mark = entered
+        entered_mark = mark is not None
         try:
-            choice = click.prompt("Enter your choice (1-2)", type=int)
-        except ValueError:
-            click.echo("Invalid input.")
+            grade, mark = grade_scale.grade_and_mark(grade, mark)
+        except ValueError as error:
+            click.echo(f"Error: {error}")
             return
-        
-        if choice == 1:
-            mark = click.prompt("Mark (0-100)")
-            try:
-                mark_value = float(mark)
-                if mark_value < 0 or mark_value > 100:
-                    click.echo("Error: Mark must be between 0 and 100.")
-                    return
-                grade = self.mark_to_grade(mark)
-                click.echo(f"Automatically assigned grade: {grade}")
-            except ValueError:
-                click.echo("Error: Mark must be a number.")
-                return
-        elif choice == 2:
-            grade = click.prompt("Grade (A/B/C/D/F)").upper()
-            if grade not in ['A', 'B', 'C', 'D', 'F']:
-                click.echo("Error: Grade must be A, B, C, D, or F.")
-                return
-            mark = str(self.grade_to_mark(grade))
-            click.echo(f"Automatically assigned mark: {mark}")
+        if entered_mark:
+            click.echo(f"Automatically assigned grade: {grade}")
         else:
-            click.echo("Invalid choice.")
-            return
+            click.echo(f"Automatically assigned mark: {mark}")
 
-        students[key] = {
-            "email": email,
-            "course_id": course_id,
-            "grade": grade,
-            "mark": mark
-        }
-        self.write_data(students)
+        try:
+            self.save_student(first_name, last_name, {
+                "email": email,
+                "course_id": course_id,
+                "grade": grade,
+                "mark": mark
+            })
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("The new student record has been added.")
         self.get_student_details(first_name, last_name)
+        return True
 
     def modify_student_details(self, first_name, last_name, email=None, course_id=None, grade=None, mark=None):
+        """Change a student's details; without any new value the user picks one from a menu"""
         students = self.read_data()
         key = (first_name, last_name)
 
         if key not in students:
             click.echo("Student not found.")
             return
-        
-        click.echo("Please choose which details to modify.")
-        click.echo("1. Email")
-        click.echo("2. Course ID")
-        click.echo("3. Grade (mark will be updated automatically)")
-        click.echo("4. Mark (grade will be updated automatically)")
-        
-        try:
-            choice = click.prompt("Enter your choice (1-4)", type=int)
+
+        original = students[key]
+        info = dict(original)
+        if email is None and course_id is None and grade is None and mark is None:
+            click.echo("Please choose which details to modify.")
+            click.echo("1. Email")
+            click.echo("2. Course ID")
+            click.echo("3. Grade (mark will be updated automatically)")
+            click.echo("4. Mark (grade will be updated automatically)")
+
+            try:
+                choice = click.prompt("Enter your choice (1-4)", type=int)
+            except ValueError:
+                click.echo("Invalid input.")
+                return
             if choice == 1:
                 email = click.prompt("Please enter new Email")
-                if not self.validate_not_null(email, "Email"):
-                    return
-                if not self.validate_unique_email(email, exclude_key=key):
-                    return
-                students[key]["email"] = email
             elif choice == 2:
                 course_id = click.prompt("Please enter new Course ID")
-                if not self.validate_not_null(course_id, "Course ID"):
-                    return
-                students[key]["course_id"] = course_id
             elif choice == 3:
-                grade = click.prompt("Please enter new Grade (A/B/C/D/F)").upper()
-                if grade not in ['A', 'B', 'C', 'D', 'F']:
-                    click.echo("Error: Grade must be A, B, C, D, or F.")
-                    return
-                mark = str(self.grade_to_mark(grade))
-                students[key]["grade"] = grade
-                students[key]["mark"] = mark
-                click.echo(f"Grade updated to {grade}, mark automatically updated to {mark}")
+                grade = click.prompt("Please enter new Grade (A/B/C/D/F)")
             elif choice == 4:
                 mark = click.prompt("Please enter new Mark (0-100)")
-                try:
-                    mark_value = float(mark)
-                    if mark_value < 0 or mark_value > 100:
-                        click.echo("Error: Mark must be between 0 and 100.")
-                        return
-                    grade = self.mark_to_grade(mark)
-                    students[key]["mark"] = mark
-                    students[key]["grade"] = grade
-                    click.echo(f"Mark updated to {mark}, grade automatically updated to {grade}")
-                except ValueError:
-                    click.echo("Error: Mark must be a number.")
-                    return
             else:
                 click.echo("Invalid choice.")
                 return
-        except ValueError:
-            click.echo("Invalid input.")
-            return
 
-        self.write_data(students)
+        if email is not None:
+            if not self.validate_not_null(email, "Email"):
+                return
+            if not self.validate_unique_email(email, exclude_key=key):
+                return
+            info["email"] = email
+        if course_id is not None:
+            if not self.validate_not_null(course_id, "Course ID"):
+                return
+            info["course_id"] = course_id
+        if grade is not None or mark is not None:
+            try:
+                info["grade"], info["mark"] = grade_scale.grade_and_mark(grade, mark)
+            except ValueError as error:
+                click.echo(f"Error: {error}")
+                return
+            if mark is not None:
+                click.echo(f"Mark updated to {info['mark']}, grade automatically updated to {info['grade']}")
+            else:
+                click.echo(f"Grade updated to {info['grade']}, mark automatically updated to {info['mark']}")
+
+        try:
+            self.save_student(first_name, last_name, info, based_on=original)
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Student information modified successfully")
         click.echo("The new information for {} {} is:".format(first_name, last_name))
         self.get_student_details(first_name, last_name)
+        return True
 
     def delete_student(self, first_name, last_name):
         students = self.read_data()
@@ -225,193 +305,167 @@ class Student:
             click.echo("Student not found.")
             return
 
-        del students[key]
-        self.write_data(students)
+        try:
+            self.remove_student(first_name, last_name, students[key])
+        except ConflictError as error:
+            click.echo(f"Error: {error}. Please try again.")
+            return
         click.echo("Student deleted successfully")
+        return True
     
+    @timed("student.mean_grade")
     def get_mean_grade(self, course_id):
-        students = self.read_data()
-        total_points = 0
-        count = 0
-
-        for info in students.values():
-            if info["course_id"] == course_id:
-                try:
-                    # Use mark instead of grade for calculation
-                    mark_value = self.get_sortable_mark(info["mark"])
-                    total_points += mark_value
-                    count += 1
-                except ValueError:
-                    continue
-
-        if count == 0:
+        stats = self.read_data().course_stats(course_id)
+
+        if stats is None:
             click.echo("No students found for this course.")
             return 0
 
-        mean_grade = total_points / count
-        return mean_grade
+        return stats.mean()
 
+    @timed("student.median_grade")
     def get_median_grade(self, course_id):
-        students = self.read_data()
-        marks = []
-
-        for info in students.values():
-            if info["course_id"] == course_id:
-                try:
-                    # Use mark instead of grade for calculation
-                    mark_value = self.get_sortable_mark(info["mark"])
-                    marks.append(mark_value)
-                except ValueError:
-                    continue
-
-        if not marks:
+        stats = self.read_data().course_stats(course_id)
+
+        if stats is None:
             click.echo("No students found for this course.")
             return 0
 
-        marks.sort()
-        n = len(marks)
-        mid = n // 2
-
-        if n % 2 == 0:
-            median_grade = (marks[mid - 1] + marks[mid]) / 2
-        else:
-            median_grade = marks[mid]
-
-        return median_grade
+        return stats.median()
 
     def get_student_details(self, first_name, last_name):
-        students = self.read_data()
-        key = (first_name, last_name)
+        info = self.lookup_student(first_name, last_name)
 
-        if key not in students:
+        if info is None:
             click.echo("Student not found.")
             return
 
-        info = students[key]
         click.echo(f"First Name: {first_name}, Last Name: {last_name}, Email: {info['email']}, "
               f"Course ID: {info['course_id']}, Grade: {info['grade']}, Mark: {info['mark']}")
         
-    def sort_students_by_name(self, order='asc'):
-        start_time = time.time()
+    def _listing_rows(self, course_id=None):
         students = self.read_data()
-        
-        sorted_students = sorted(
-            students.items(),
-            key=lambda x: (x[0][1].lower(), x[0][0].lower()),
-            reverse=(order == 'desc')
-        )
-        
-        end_time = time.time()
-        sort_time = end_time - start_time
-        
-        click.echo(f"\nStudents sorted by name ({order}ending order):")
-        click.echo("-" * 80)
-        for (first_name, last_name), info in sorted_students:
-            click.echo(f"{last_name}, {first_name} | Email: {info['email']} | "
-                    f"Course: {info['course_id']} | Grade: {info['grade']} | Mark: {info['mark']}")
-        click.echo("-" * 80)
-        click.echo(f"Sort completed in {sort_time:.6f} seconds")
-        click.echo(f"Total records: {len(sorted_students)}")
-        
+        if course_id:
+            return list(students.in_course(course_id))
+        return list(students.items())
+
+    def _sorted_page(self, rows, sort_keys, order, limit=None, offset=0):
+        """Return rows[offset:offset + limit] in sort_keys order.
+
+        sort_keys holds one precomputed key per row.  With a limit only the
+        first offset + limit rows are selected with a heap, O(n log k),
+        instead of sorting every row.  Ties keep their original order either way.
+        """
+        indexes = range(len(rows))
+        if limit is None:
+            ordered = sorted(indexes, key=sort_keys.__getitem__, reverse=(order == 'desc'))
+        else:
+            select = heapq.nlargest if order == 'desc' else heapq.nsmallest
+            ordered = select(offset + limit, indexes, key=sort_keys.__getitem__)
+        return [rows[i] for i in ordered[offset:]]
+
+    def _write_sorted(self, sorted_students, line_format, field, order, course_id,
+                      sort_time, total, offset, output_format):
+        with OutputWriter(output_format, LISTING_FIELDS, line_format) as writer:
+            scope = f" in {course_id}" if course_id else ""
+            writer.text(f"\nStudents{scope} sorted by {field} ({order}ending order):", "-" * 80)
+            for key, info in sorted_students:
+                writer.row(listing_record(key, info))
+            writer.text("-" * 80, f"Sort completed in {sort_time:.6f} seconds")
+            shown = len(sorted_students)
+            if shown == total:
+                writer.text(f"Total records: {total}")
+            elif shown:
+                writer.text(f"Showing records {offset + 1}-{offset + shown} of {total}")
+            else:
+                writer.text(f"No records at offset {offset} (total records: {total})")
+
+    def sorted_rows(self, sort_by, order='asc', limit=None, offset=0, course_id=None):
+        """Return (page, total): the (key, info) rows sorted by "name", "marks" or "email", without printing"""
+        rows = self._listing_rows(course_id)
+        if sort_by == "name":
+            sort_keys = [(last_name.lower(), first_name.lower()) for (first_name, last_name), info in rows]
+        elif sort_by == "marks":
+            # Convert the whole mark column once instead of once per comparison key;
+            # rows with an unusable mark (blank, NaN or not a grade) come last in either order
+            unusable = (-1, 0.0) if order == 'desc' else (1, 0.0)
+            sort_keys = [unusable if value is None else (0, value)
+                         for value in grade_scale.mark_values([info['mark'] for key, info in rows])]
+        elif sort_by == "email":
+            sort_keys = [info['email'].lower() for key, info in rows]
+        else:
+            raise ValueError(f"Unknown sort field: {sort_by}")
+        return self._sorted_page(rows, sort_keys, order, limit, offset), len(rows)
+
+    def sort_students_by_name(self, order='asc', limit=None, offset=0, course_id=None, output_format="table"):
+        self.read_data()  # Parse (if needed) outside the sort timing; read_data is measured on its own
+        with measure("student.sort_by_name") as timer:
+            sorted_students, total = self.sorted_rows("name", order, limit, offset, course_id)
+        sort_time = timer.seconds
+
+        self._write_sorted(sorted_students,
+                           "{last_name}, {first_name} | Email: {email} | "
+                           "Course: {course_id} | Grade: {grade} | Mark: {mark}",
+                           "name", order, course_id, sort_time, total, offset, output_format)
+
         return sorted_students, sort_time
 
-    def sort_students_by_marks(self, order='asc'):
-        start_time = time.time()
-        students = self.read_data()
+    def sort_students_by_marks(self, order='asc', limit=None, offset=0, course_id=None, output_format="table"):
+        self.read_data()  # Parse (if needed) outside the sort timing; read_data is measured on its own
+        with measure("student.sort_by_marks") as timer:
+            sorted_students, total = self.sorted_rows("marks", order, limit, offset, course_id)
+        sort_time = timer.seconds
+
+        self._write_sorted(sorted_students,
+                           "Mark: {mark} | Grade: {grade} | {first_name} {last_name} | "
+                           "Email: {email} | Course: {course_id}",
+                           "marks", order, course_id, sort_time, total, offset, output_format)
 
-        sorted_students = sorted(
-            students.items(),
-            key=lambda x: self.get_sortable_mark(x[1]['mark']),
-            reverse=(order == 'desc')
-        )
-        
-        end_time = time.time()
-        sort_time = end_time - start_time
-        
-        click.echo(f"\nStudents sorted by marks ({order}ending order):")
-        click.echo("-" * 80)
-        for (first_name, last_name), info in sorted_students:
-            click.echo(f"Mark: {info['mark']} | Grade: {info['grade']} | {first_name} {last_name} | "
-                    f"Email: {info['email']} | Course: {info['course_id']}")
-        click.echo("-" * 80)
-        click.echo(f"Sort completed in {sort_time:.6f} seconds")
-        click.echo(f"Total records: {len(sorted_students)}")
-        
         return sorted_students, sort_time
 
-    def sort_students_by_email(self, order='asc'):
-        start_time = time.time()
-        students = self.read_data()
+    def sort_students_by_email(self, order='asc', limit=None, offset=0, course_id=None, output_format="table"):
+        self.read_data()  # Parse (if needed) outside the sort timing; read_data is measured on its own
+        with measure("student.sort_by_email") as timer:
+            sorted_students, total = self.sorted_rows("email", order, limit, offset, course_id)
+        sort_time = timer.seconds
+
+        self._write_sorted(sorted_students,
+                           "Email: {email} | {first_name} {last_name} | "
+                           "Course: {course_id} | Grade: {grade} | Mark: {mark}",
+                           "email", order, course_id, sort_time, total, offset, output_format)
 
-        sorted_students = sorted(
-            students.items(),
-            key=lambda x: x[1]['email'].lower(),
-            reverse=(order == 'desc')
-        )
-        
-        end_time = time.time()
-        sort_time = end_time - start_time
-        
-        click.echo(f"\nStudents sorted by email ({order}ending order):")
-        click.echo("-" * 80)
-        for (first_name, last_name), info in sorted_students:
-            click.echo(f"Email: {info['email']} | {first_name} {last_name} | "
-                    f"Course: {info['course_id']} | Grade: {info['grade']} | Mark: {info['mark']}")
-        click.echo("-" * 80)
-        click.echo(f"Sort completed in {sort_time:.6f} seconds")
-        click.echo(f"Total records: {len(sorted_students)}")
-        
         return sorted_students, sort_time
 
-    def search_student(self, search_term):
-        start_time = time.time()
+    def search_student(self, search_term, output_format="table"):
         students = self.read_data()
-        results = []
-        
         search_term = search_term.lower()
-        
-        for (first_name, last_name), info in students.items():
-            if (search_term in first_name.lower() or 
-                search_term in last_name.lower() or 
-                search_term in info['email'].lower() or 
-                search_term in info['course_id'].lower()):
-                
-                results.append({
-                    'first_name': first_name,
-                    'last_name': last_name,
-                    'email': info['email'],
-                    'course_id': info['course_id'],
-                    'grade': info['grade'],
-                    'mark': info['mark']
-                })
-        
-        end_time = time.time()
-        search_time = end_time - start_time
-        
-        if results:
-            click.echo(f"\nFound {len(results)} student(s) matching '{search_term}':")
-            click.echo("-" * 80)
-            for student in results:
-                click.echo(f"Name: {student['first_name']} {student['last_name']}")
-                click.echo(f"Email: {student['email']}")
-                click.echo(f"Course: {student['course_id']}")
-                click.echo(f"Grade: {student['grade']}, Mark: {student['mark']}")
-                click.echo("-" * 80)
-        else:
-            click.echo(f"No students found matching '{search_term}'")
-        
-        click.echo(f"\nSearch completed in {search_time:.6f} seconds")
+
+        with measure("student.search") as timer:
+            # Candidates come from the trigram index and are verified there
+            results = [listing_record(key, info) for key, info in students.search(search_term)]
+        search_time = timer.seconds
+
+        line_format = ("Name: {first_name} {last_name}\nEmail: {email}\nCourse: {course_id}\n"
+                       "Grade: {grade}, Mark: {mark}\n" + "-" * 80)
+        with OutputWriter(output_format, LISTING_FIELDS, line_format) as writer:
+            if results:
+                writer.text(f"\nFound {len(results)} student(s) matching '{search_term}':", "-" * 80)
+                for student in results:
+                    writer.row(student)
+            else:
+                writer.text(f"No students found matching '{search_term}'")
+
+            writer.text(f"\nSearch completed in {search_time:.6f} seconds")
         return results, search_time
 
+    @timed("report.student")
     def generate_student_wise_report(self, first_name, last_name):
-        students = self.read_data()
-        key = (first_name, last_name)
+        info = self.lookup_student(first_name, last_name)
 
-        if key not in students:
+        if info is None:
             click.echo("Student not found.")
             return
 
-        info = students[key]
         click.echo("\n" + "=" * 80)
         click.echo(f"STUDENT REPORT: {first_name} {last_name}")
         click.echo("=" * 80)
@@ -0,0 +1,138 @@
+import os
+from table_cache import table_cache
+from hash_index import HashIndex
+from csv_format import parse_line
+from student_records import GradeRecord, GradeRecords
+from student_journal import apply_to_grades, entry_name, student_from_grades
+
+
+def _fields(line):
+    if b'"' in line:
+        return [field.encode() for field in parse_line(line.decode())]
+    return line.strip().split(b",")
+
+
+def _key(*values):
+    # NUL cannot appear in a field typed at a prompt, so it keeps the parts apart
+    return b"\0".join(value.encode() if isinstance(value, str) else value for value in values)
+
+
+def _name_key(line):
+    fields = _fields(line)
+    return _key(fields[1], fields[2]) if len(fields) == 6 else None
+
+
+def _course_key(line):
+    fields = _fields(line)
+    return _key(fields[1], fields[2], fields[3]) if len(fields) == 6 else None
+
+
+def _email_key(line):
+    fields = _fields(line)
+    return fields[0] if len(fields) == 6 else None
+
+
+class StudentIndex:
+    """Single-student lookups in student.csv without parsing the whole file.
+
+    Sidecar hash indexes map a name, a name and course ID, and an email to
+    the byte offset of the last row holding it, which is the row a full
+    parse would keep.  A lookup decodes just that row and replays the
+    journal entries that mention the student on top of it; a student lookup
+    whose entries depend on the student's earlier rows (an edit of an older
+    course, or deleting every course seen) parses the table.  Each index is
+    built on its first use and rebuilt whenever student.csv's size or mtime
+    changes, e.g. after the journal is compacted.  When the parsed table is
+    already cached, it is used instead.
+    """
+
+    def __init__(self, file_path, journal):
+        self.file_path = file_path
+        self.journal = journal
+        self.by_name = HashIndex(file_path, file_path + ".name.idx", _name_key)
+        self.by_course = HashIndex(file_path, file_path + ".course.idx", _course_key)
+        self.by_email = HashIndex(file_path, file_path + ".email.idx", _email_key)
+
+    def _cached(self, kind):
+        tables = table_cache.tables(self.file_path, depends_on=self.journal.depends_on)
+        return tables.get(kind) if tables else None
+
+    def _row(self, index, key):
+        """Fields of the indexed row for key, or None"""
+        if not os.path.exists(self.file_path):
+            return None
+        found = index.lookup(key)
+        return parse_line(found[1].decode()) if found else None
+
+    def student(self, first_name, last_name):
+        """The record Student.read_data() holds for the student, or None"""
+        students = self._cached("students")
+        if students is not None:
+            return students.get((first_name, last_name))
+        # The student's last rows in order, as in the Grades view: the indexed
+        # row is the last one in student.csv and journal entries change the tail
+        rows = GradeRecords()
+        row = self._row(self.by_name, _key(first_name, last_name))
+        earlier_rows = row is not None  # Rows before the indexed one may still exist
+        deleted = set()
+        if row is not None:
+            email, first, last, course_id, grade, mark = row
+            rows[(first, last, course_id)] = GradeRecord(email, grade, mark)
+        for op, fields in self.journal.entries_mentioning(last_name):
+            if entry_name(op, fields) != (first_name, last_name):
+                continue
+            if op == "R":
+                earlier_rows = False
+            elif earlier_rows:
+                if op == "D":
+                    deleted.add(fields[2])
+                else:
+                    course_id, old_course_id = fields[3], fields[6]
+                    if old_course_id and old_course_id != course_id:
+                        deleted.add(old_course_id)
+                    # An edit of an earlier row stays where that row is, which is not known here
+                    if (first_name, last_name, course_id) not in rows and course_id not in deleted and \
+                            self._row(self.by_course, _key(first_name, last_name, course_id)) is not None:
+                        return self._parsed_student(first_name, last_name)
+            apply_to_grades(rows, op, fields)
+        if earlier_rows and not rows:
+            return self._parsed_student(first_name, last_name)  # Every known row was deleted
+        return student_from_grades(rows, first_name, last_name)
+
+    def _parsed_student(self, first_name, last_name):
+        from student import Student
+        return Student().read_data().get((first_name, last_name))
+
+    def grade(self, first_name, last_name, course_id):
+        """The record Grades.read_data() holds for the student in course_id, or None"""
+        grades = self._cached("grades")
+        if grades is not None:
+            return grades.get((first_name, last_name, course_id))
+        table = {}
+        row = self._row(self.by_course, _key(first_name, last_name, course_id))
+        if row is not None:
+            email, first, last, course, grade, mark = row
+            table[(first, last, course)] = GradeRecord(email, grade, mark)
+        for op, fields in self.journal.entries_mentioning(last_name):
+            apply_to_grades(table, op, fields)
+        return table.get((first_name, last_name, course_id))
+
+    def student_by_email(self, email):
+        """((first_name, last_name), record) of the student with email, or None"""
+        students = self._cached("students")
+        if students is not None:
+            key = students.key_for_email(email)
+            return (key, students[key]) if key is not None else None
+        candidates = []
+        row = self._row(self.by_email, _key(email))
+        if row is not None:
+            candidates.append((row[1], row[2]))
+        for op, fields in self.journal.entries_mentioning(email):
+            if op == "P" and fields[0] == email:
+                candidates.append((fields[1], fields[2]))
+        # The most recent write wins; older candidates may have changed email since
+        for key in reversed(candidates):
+            info = self.student(*key)
+            if info is not None and info["email"] == email:
+                return key, info
+        return None
@@ -0,0 +1,211 @@
+import os
+from contextlib import contextmanager
+import transaction
+from table_cache import table_cache
+from file_lock import FileVersion, replace_file
+from csv_format import parse_text, format_row
+from student_records import StudentRecord, GradeRecord
+
+
+def apply_to_grades(grades, op, fields):
+    """Apply one journal entry to a Grades.read_data() table"""
+    if op == "P":
+        email, first_name, last_name, course_id, grade, mark, old_course_id = fields
+        if old_course_id and old_course_id != course_id:
+            grades.pop((first_name, last_name, old_course_id), None)
+        grades[(first_name, last_name, course_id)] = GradeRecord(email, grade, mark)
+    elif op == "D":
+        grades.pop(tuple(fields), None)
+    elif op == "R":
+        first_name, last_name = fields
+        for key in [key for key in grades if key[0] == first_name and key[1] == last_name]:
+            del grades[key]
+
+
+def entry_name(op, fields):
+    """(first_name, last_name) of the student a journal entry changes"""
+    if op == "P":
+        return fields[1], fields[2]
+    return fields[0], fields[1]
+
+
+def student_from_grades(grades, first_name, last_name):
+    """The record Student.read_data() holds for a student, taken from a GradeRecords table.
+
+    It is the student's row that comes last in the table, which is the last
+    of the student's rows in student.csv once the journal is compacted:
+    edits keep a row where it is and new rows go to the end.
+    """
+    found = grades.last_course(first_name, last_name)
+    if found is None:
+        return None
+    course_id, info = found
+    return StudentRecord(info["email"], course_id, info["grade"], info["mark"])
+
+
+def apply_to_students(students, entries, latest):
+    """Bring a Student.read_data() table up to date with journal entries.
+
+    latest(first_name, last_name) returns the student's record once the
+    entries are applied, or None if the student has no rows left.
+    """
+    for first_name, last_name in dict.fromkeys(entry_name(op, fields) for op, fields in entries):
+        info = latest(first_name, last_name)
+        if info is None:
+            students.pop((first_name, last_name), None)
+        else:
+            students[(first_name, last_name)] = info
+
+
+# Number of fields following the op code on each kind of journal line
+OP_FIELDS = {"P": 7, "D": 3, "R": 2}
+
+
+class StudentJournal:
+    """Append-only log of student.csv mutations, replayed on top of the base file.
+
+    Each line is one self-contained, idempotent operation:
+
+        P,email,first_name,last_name,course_id,grade,mark,old_course_id
+        D,first_name,last_name,course_id
+        R,first_name,last_name
+
+    P upserts the row for (first_name, last_name, course_id), dropping the
+    row for old_course_id when the student moved courses.  D deletes a row;
+    R deletes the student, i.e. every row with that name.
+    Because replaying an entry twice has no further effect, a crash between
+    compacting the base file and truncating the journal loses nothing.
+
+    Every append and rewrite happens under the file's FileVersion lock and
+    advances its version; passing expected_version makes the write fail
+    with StaleVersionError if another session wrote since that version.
+    """
+
+    compact_threshold = 1024 * 1024  # bytes
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.journal_path = file_path + ".journal"
+        self.version = FileVersion(file_path)
+        self.depends_on = (self.journal_path, self.version.path)
+
+    def current_version(self):
+        return self.version.current()
+
+    def _text(self):
+        try:
+            with open(self.journal_path, "r", newline="") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return ""
+        return text[:text.rfind("\n") + 1]  # Drop a torn write from a crash
+
+    def _parse(self, text):
+        for op, *fields in parse_text(text):
+            if OP_FIELDS.get(op) == len(fields):
+                yield op, fields
+
+    def entries(self):
+        return self._parse(self._text())
+
+    def entries_mentioning(self, value):
+        """The entries with a field equal to value, in order; the journal is only parsed if value occurs in it"""
+        text = self._text()
+        if "," + format_row([value])[:-1] not in text:
+            return
+        for op, fields in self._parse(text):
+            if value in fields:
+                yield op, fields
+
+    def replay(self, grades):
+        """Apply every journal entry to a freshly parsed Grades.read_data() table"""
+        for op, fields in self.entries():
+            apply_to_grades(grades, op, fields)
+        return grades
+
+    def size(self):
+        try:
+            return os.path.getsize(self.journal_path)
+        except FileNotFoundError:
+            return 0
+
+    def needs_compaction(self):
+        return self.size() > self.compact_threshold
+
+    def record(self, op, fields, expected_version=None):
+        """Durably append one entry and apply it to every cached view of the file"""
+        self.record_all([(op, fields)], expected_version)
+
+    def record_all(self, entries, expected_version=None):
+        """Durably append (op, fields) entries with one write and apply them to every cached view.
+
+        Inside a Transaction both happen when it commits.
+        """
+        text = "".join(format_row([op] + list(fields)) for op, fields in entries)
+        with self.version.locked():
+            self.version.check(expected_version)
+            tables = table_cache.tables(self.file_path, depends_on=self.depends_on)
+            if tables is not None and "students" in tables and "grades" not in tables:
+                # The Student view is updated from the Grades view, which holds every row of a student
+                from grades import Grades
+                Grades().read_data()
+            active = transaction.current()
+            if active is not None:
+                active.stage_append(self.journal_path, text)
+            else:
+                with open(self.journal_path, "a") as file:
+                    file.write(text)
+                    file.flush()
+                    os.fsync(file.fileno())
+            self.version.bump()
+            if active is not None:
+                active.after_commit(lambda: self._apply_to_cached(tables, entries))
+            else:
+                self._apply_to_cached(tables, entries)
+
+    def _apply_to_cached(self, tables, entries):
+        """Bring the views cached before an append up to date with it"""
+        if tables is None:
+            table_cache.invalidate(self.file_path)
+            return
+        with table_cache.lock:
+            for kind in list(tables):
+                if kind not in ("students", "grades"):
+                    del tables[kind]
+            grades = tables.get("grades")
+            if grades is not None:
+                for op, fields in entries:
+                    apply_to_grades(grades, op, fields)
+            if grades is None:
+                tables.pop("students", None)
+            elif "students" in tables:
+                apply_to_students(tables["students"], entries,
+                                  lambda first_name, last_name: student_from_grades(grades, first_name, last_name))
+            table_cache.refresh(self.file_path, depends_on=self.depends_on)
+
+    def put(self, email, first_name, last_name, course_id, grade, mark, old_course_id="", expected_version=None):
+        self.record("P", [email, first_name, last_name, course_id, grade, mark, old_course_id], expected_version)
+
+    def put_all(self, rows, expected_version=None):
+        """put() every (email, first_name, last_name, course_id, grade, mark, old_course_id) row in one append"""
+        self.record_all([("P", list(row)) for row in rows], expected_version)
+
+    def delete(self, first_name, last_name, course_id, expected_version=None):
+        self.record("D", [first_name, last_name, course_id], expected_version)
+
+    def delete_student(self, first_name, last_name, expected_version=None):
+        self.record("R", [first_name, last_name], expected_version)
+
+    @contextmanager
+    def rewrite_base(self, expected_version=None):
+        """Atomically replace the base file and drop the journal entries it now contains"""
+        with self.version.locked():
+            self.version.check(expected_version)
+            with replace_file(self.file_path) as file:
+                yield file
+            active = transaction.current()
+            if active is not None:
+                active.stage_remove(self.journal_path)
+            elif os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.version.bump()
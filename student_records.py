@@ -0,0 +1,406 @@
+import sys
+from array import array
+from bisect import bisect_left, insort
+from operator import attrgetter
+import grade_scale
+from trigram_index import TrigramIndex
+
+
+class Record:
+    """Slotted record that reads like the small dicts the tables used to hold.
+
+    Course IDs, grades and marks repeat across thousands of rows, so they
+    are interned and every row shares one copy of each string.  Records in a
+    table are not edited in place, and have no item assignment that would
+    let a dict-style edit do so: callers copy them with dict(record), change
+    the copy and store it back.  __init__ takes the fields in __slots__ order.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return type(self), tuple(self.values())
+
+    @classmethod
+    def from_mapping(cls, info):
+        return cls(*(info[field] for field in cls.__slots__))
+
+    @classmethod
+    def to_columns(cls, records):
+        """One list per field of records, in __slots__ order"""
+        return [list(map(attrgetter(field), records)) for field in cls.__slots__]
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Records rebuilt from to_columns() output; the strings are taken as they are, not re-interned"""
+        new = object.__new__
+        setters = [getattr(cls, field).__set__ for field in cls.__slots__]
+        records = []
+        for values in zip(*columns):
+            record = new(cls)
+            for setter, value in zip(setters, values):
+                setter(record, value)
+            records.append(record)
+        return records
+
+    def __getitem__(self, field):
+        if field not in self.__slots__:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field, default=None):
+        return getattr(self, field) if field in self.__slots__ else default
+
+    def __contains__(self, field):
+        return field in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def keys(self):
+        return self.__slots__
+
+    def values(self):
+        return [getattr(self, field) for field in self.__slots__]
+
+    def items(self):
+        return [(field, getattr(self, field)) for field in self.__slots__]
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class StudentRecord(Record):
+    __slots__ = ("email", "course_id", "grade", "mark")
+
+    def __init__(self, email, course_id, grade, mark):
+        self.email = email
+        self.course_id = sys.intern(course_id)
+        self.grade = sys.intern(grade)
+        self.mark = sys.intern(mark)
+
+
+class GradeRecord(Record):
+    __slots__ = ("email", "grade", "mark")
+
+    def __init__(self, email, grade, mark):
+        self.email = email
+        self.grade = sys.intern(grade)
+        self.mark = sys.intern(mark)
+
+
+class CourseStats:
+    """Count, sum, min, max and median of the marks in one course.
+
+    The marks are kept sorted in an array of doubles, 8 bytes a mark rather
+    than a pointer plus a float object, and are sorted once when the table
+    builds its indexes.  Lookups are constant time; an update is a binary
+    search plus a memmove, O(n) rather than the O(log n) of an
+    order-statistics tree, but moving even 100k marks takes a few
+    microseconds, less than a pure-Python balanced tree spends per update.
+    """
+
+    def __init__(self, mark_values=()):
+        self._marks = array("d", sorted(mark_values))
+        self.total = sum(self._marks)
+
+    @property
+    def count(self):
+        return len(self._marks)
+
+    def add(self, mark_value):
+        self.total += mark_value
+        insort(self._marks, mark_value)
+
+    def remove(self, mark_value):
+        index = bisect_left(self._marks, mark_value)
+        if index < len(self._marks) and self._marks[index] == mark_value:
+            del self._marks[index]
+            self.total -= mark_value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def minimum(self):
+        return self._marks[0] if self._marks else 0
+
+    def maximum(self):
+        return self._marks[-1] if self._marks else 0
+
+    def median(self):
+        n = len(self._marks)
+        if n == 0:
+            return 0
+        mid = n // 2
+        if n % 2 == 0:
+            return (self._marks[mid - 1] + self._marks[mid]) / 2
+        return self._marks[mid]
+
+
+def _restore_table(cls, keys, columns, state):
+    """Unpickle a RecordTable without running its __setitem__; its indexes are restored from state"""
+    table = cls.__new__(cls)
+    dict.update(table, zip(keys, cls.record_class.from_columns(columns)))
+    table.__dict__.update(state)
+    return table
+
+
+class RecordTable(dict):
+    """dict of records of one Record class that pickles field by field.
+
+    Pickling records one at a time calls back into Python for every row;
+    one list per field is written by the C pickler alone and unpickled into
+    records in a single loop, which keeps table snapshots quick to write
+    and to load.
+    """
+
+    record_class = Record
+
+    @classmethod
+    def loaded(cls, items):
+        """A table of the (key, record) pairs a parser produced, filled without running __setitem__"""
+        table = cls()
+        dict.update(table, items)
+        return table
+
+    def __reduce__(self):
+        return _restore_table, (type(self), list(self), self.record_class.to_columns(self.values()), self.__dict__)
+
+
+class GradeRecords(RecordTable):
+    """Grades table keyed by (first_name, last_name, course_id).
+
+    last_course() is answered from an index of each student's course IDs in
+    table order, built on its first use and kept up to date from then on.
+    """
+
+    record_class = GradeRecord
+    _courses = None  # Not built yet
+
+    def _course_index(self):
+        if self._courses is None:
+            courses = {}
+            for first_name, last_name, course_id in self:
+                courses.setdefault((first_name, last_name), {})[course_id] = None
+            self._courses = courses
+        return self._courses
+
+    def __setitem__(self, key, info):
+        if not isinstance(info, GradeRecord):
+            info = GradeRecord.from_mapping(info)
+        super().__setitem__(key, info)
+        if self._courses is not None:
+            self._courses.setdefault(key[:2], {})[key[2]] = None
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        if self._courses is not None:
+            courses = self._courses[key[:2]]
+            del courses[key[2]]
+            if not courses:
+                del self._courses[key[:2]]
+
+    def pop(self, key, *default):
+        if key in self:
+            info = self[key]
+            del self[key]
+            return info
+        return super().pop(key, *default)
+
+    def clear(self):
+        super().clear()
+        self._courses = None
+
+    def last_course(self, first_name, last_name):
+        """(course_id, record) of the student's row that comes last in the table, or None"""
+        courses = self._course_index().get((first_name, last_name))
+        if not courses:
+            return None
+        course_id = next(reversed(courses))
+        return course_id, self[(first_name, last_name, course_id)]
+
+
+class StudentRecords(RecordTable):
+    """Student table keyed by (first_name, last_name) with secondary hash indexes.
+
+    Behaves like the plain dict Student.read_data() used to return, but also
+    has email -> key and course_id -> keys indexes, so uniqueness checks
+    are O(1) and per-course operations only touch the students enrolled in
+    that course, and per-course mark statistics.  They are built together in
+    one pass the first time one of them is used, so a process that only
+    lists or looks up students never pays for them, and from then on are
+    kept up to date on every insert, replace and delete, as is the trigram
+    index behind search() once it has been built.
+    """
+
+    record_class = StudentRecord
+    # Searches of one table answered by a plain scan before the trigram index is
+    # built: building it costs on the order of a hundred scans, which one-shot
+    # CLI and menu searches would never recoup
+    index_after_searches = 3
+    _searches = 0  # A class default, so tables unpickled from older snapshots have it too
+
+    def __init__(self, records=()):
+        super().__init__()
+        self._by_email = None  # None until _build_indexes(), with _by_course and _stats
+        self._by_course = None
+        self._stats = None
+        self._trigrams = None
+        for key, info in dict(records).items():
+            self[key] = info
+
+    def _indexed(self):
+        if self._by_email is None:
+            self._build_indexes()
+        return self
+
+    def _build_indexes(self):
+        by_email, by_course, marks = {}, {}, {}
+        values = {}  # Mark string -> value; a few hundred distinct marks cover most tables
+        for key, info in self.items():
+            by_email[info.email] = key
+            by_course.setdefault(info.course_id, {})[key] = None
+            mark = info.mark
+            if mark not in values:
+                values[mark] = grade_scale.mark_value(mark)
+            if values[mark] is not None:
+                marks.setdefault(info.course_id, []).append(values[mark])
+        self._by_email, self._by_course = by_email, by_course
+        self._stats = {course_id: CourseStats(course_marks) for course_id, course_marks in marks.items()}
+
+    def _add_stat(self, info):
+        mark_value = grade_scale.mark_value(info["mark"])
+        if mark_value is not None:
+            stats = self._stats.setdefault(info["course_id"], CourseStats())
+            stats.add(mark_value)
+
+    def _remove_stat(self, info):
+        mark_value = grade_scale.mark_value(info["mark"])
+        stats = self._stats.get(info["course_id"])
+        if mark_value is not None and stats is not None:
+            stats.remove(mark_value)
+            if not stats.count:
+                del self._stats[info["course_id"]]
+
+    def _index_email(self, key, email):
+        self._by_email[email] = key
+
+    def _unindex_email(self, key, email):
+        if self._by_email.get(email) == key:
+            del self._by_email[email]
+
+    def _index_course(self, key, course_id):
+        self._by_course.setdefault(course_id, {})[key] = None
+
+    def _unindex_course(self, key, course_id):
+        course_keys = self._by_course.get(course_id)
+        if course_keys is not None:
+            course_keys.pop(key, None)
+            if not course_keys:
+                del self._by_course[course_id]
+
+    def _search_fields(self, key, info):
+        return (key[0], key[1], info["email"], info["course_id"])
+
+    def __setitem__(self, key, info):
+        if not isinstance(info, StudentRecord):
+            info = StudentRecord.from_mapping(info)
+        old_info = self.get(key)
+        super().__setitem__(key, info)
+        if self._trigrams is not None:
+            if old_info is not None:
+                self._trigrams.remove(key, self._search_fields(key, old_info), keep_order=True)
+            self._trigrams.add(key, self._search_fields(key, info))
+        if self._by_email is None:
+            return
+        # Only re-index fields that changed so enrollment order is kept
+        if old_info is None or old_info["email"] != info["email"]:
+            if old_info is not None:
+                self._unindex_email(key, old_info["email"])
+            self._index_email(key, info["email"])
+        if old_info is None or old_info["course_id"] != info["course_id"]:
+            if old_info is not None:
+                self._unindex_course(key, old_info["course_id"])
+            self._index_course(key, info["course_id"])
+        if old_info is None or (old_info["course_id"], old_info["mark"]) != (info["course_id"], info["mark"]):
+            if old_info is not None:
+                self._remove_stat(old_info)
+            self._add_stat(info)
+
+    def __delitem__(self, key):
+        info = self[key]
+        super().__delitem__(key)
+        if self._trigrams is not None:
+            self._trigrams.remove(key, self._search_fields(key, info))
+        if self._by_email is None:
+            return
+        self._unindex_email(key, info["email"])
+        self._unindex_course(key, info["course_id"])
+        self._remove_stat(info)
+
+    def pop(self, key, *default):
+        if key in self:
+            info = self[key]
+            del self[key]
+            return info
+        return super().pop(key, *default)
+
+    def clear(self):
+        super().clear()
+        self._by_email = self._by_course = self._stats = None
+        self._trigrams = None
+
+    def key_for_email(self, email):
+        """Return the (first_name, last_name) key that owns email, or None"""
+        return self._indexed()._by_email.get(email)
+
+    def keys_in_course(self, course_id):
+        return list(self._indexed()._by_course.get(course_id, ()))
+
+    def in_course(self, course_id):
+        """Yield (key, info) for every student enrolled in course_id"""
+        for key in self.keys_in_course(course_id):
+            yield key, self[key]
+
+    def course_stats(self, course_id):
+        """Return the CourseStats for course_id, or None if it has no usable marks"""
+        return self._indexed()._stats.get(course_id)
+
+    def search(self, term):
+        """Return [(key, info), ...] whose name, email or course ID contains term (case-insensitive)"""
+        term = term.lower()
+        if self._trigrams is None:
+            self._searches += 1
+            if self._searches <= self.index_after_searches:
+                return self._scan(term)
+            self._trigrams = TrigramIndex()
+            for key, info in self.items():
+                self._trigrams.add(key, self._search_fields(key, info))
+
+        candidates = self._trigrams.candidates(term)
+        if candidates is None:  # Shorter than a trigram
+            return self._scan(term)
+
+        results = []
+        for key in candidates:
+            info = self[key]
+            if any(term in field.lower() for field in self._search_fields(key, info)):
+                results.append((key, info))
+        return results
+
+    def _scan(self, term):
+        results = []
+        for key, info in self.items():
+            first_name, last_name = key
+            if term in first_name.lower() or term in last_name.lower() or \
+                    term in info.email.lower() or term in info.course_id.lower():
+                results.append((key, info))
+        return results
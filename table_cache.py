@@ -0,0 +1,146 @@
+import os
+import gc
+import pickle
+import hashlib
+import threading
+import transaction
+
+SNAPSHOT_ENV = "CHECKMYGRADE_SNAPSHOTS"
+SNAPSHOT_MAGIC = b"CMGSNAP3"
+
+
+class TableCache:
+    """Process-wide cache of parsed CSV tables, keyed by file path.
+
+    A cached table is reused for as long as the file's size and mtime are
+    unchanged, so a menu action that reads the same file several times only
+    pays for one stat() per read instead of a full parse.  Files listed in
+    depends_on (such as a journal replayed on top of the CSV) are part of
+    the signature as well.
+
+    Tables parsed from disk are also pickled, indexes and all, to a
+    snapshot file next to the CSV (FILE.KIND.snap).  A new process whose
+    files still match a snapshot's signature and content hash unpickles it
+    instead of parsing the CSV again.  Set CHECKMYGRADE_SNAPSHOTS=0 to
+    neither read nor write snapshots.
+
+    Writers that update cached tables in place hold lock while doing so;
+    a thread reading the tables while another one writes holds it too.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self.lock = threading.RLock()
+        self.snapshots = os.environ.get(SNAPSHOT_ENV, "1") != "0"
+
+    def _key(self, file_path):
+        return os.path.abspath(file_path)
+
+    def _signature(self, file_path, depends_on=()):
+        signature = []
+        for path in (file_path,) + tuple(depends_on):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+            signature.append((stat.st_size, stat.st_mtime_ns))
+        return tuple(signature)
+
+    def load(self, file_path, kind, loader, depends_on=()):
+        """Return the cached table of the given kind, re-parsing only when the file changed"""
+        key = self._key(file_path)
+        signature = self._signature(file_path, depends_on)
+        entry = self._entries.get(key)
+        if entry is None or entry["signature"] != signature:
+            entry = {"signature": signature, "tables": {}}
+            self._entries[key] = entry
+        if kind not in entry["tables"]:
+            entry["tables"][kind] = self._load_snapshot(file_path, kind, loader, depends_on, signature)
+        return entry["tables"][kind]
+
+    def snapshot_path(self, file_path, kind):
+        return f"{file_path}.{kind}.snap"
+
+    def _digest(self, file_path, depends_on):
+        digest = hashlib.blake2b(digest_size=16)
+        for path in (file_path,) + tuple(depends_on):
+            try:
+                with open(path, "rb") as file:
+                    while True:
+                        chunk = file.read(1024 * 1024)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+            except FileNotFoundError:
+                pass
+            digest.update(b"\0")
+        return digest.digest()
+
+    def _load_snapshot(self, file_path, kind, loader, depends_on, signature):
+        """Unpickle the table's snapshot if it matches the files, otherwise call loader() and write one"""
+        if not self.snapshots:
+            return loader()
+        snapshot_path = self.snapshot_path(file_path, kind)
+        gc_enabled = gc.isenabled()
+        gc.disable()  # Unpickling allocates millions of objects that all stay alive
+        try:
+            with open(snapshot_path, "rb") as file:
+                if file.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC and \
+                        pickle.load(file) == (signature, self._digest(file_path, depends_on)):
+                    return pickle.load(file)
+        except Exception:
+            pass  # A missing, truncated or outdated snapshot is rebuilt below
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        data = loader()
+        digest = self._digest(file_path, depends_on)
+        if self._signature(file_path, depends_on) != signature:
+            return data  # Changed while being parsed; the digest may not describe data
+        temp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as file:
+                file.write(SNAPSHOT_MAGIC)
+                pickle.dump((signature, digest), file, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, snapshot_path)
+        except Exception:
+            # A read-only data directory or an unpicklable table only loses the speed-up
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return data
+
+    def store(self, file_path, kind, data, depends_on=()):
+        """Record data that was just written to file_path as its current parsed table"""
+        active = transaction.current()
+        if active is not None:
+            active.after_commit(lambda: self.store(file_path, kind, data, depends_on))
+            return
+        self._entries[self._key(file_path)] = {
+            "signature": self._signature(file_path, depends_on),
+            "tables": {kind: data}
+        }
+
+    def tables(self, file_path, depends_on=()):
+        """Return the cached tables of file_path if they are still current, otherwise None"""
+        entry = self._entries.get(self._key(file_path))
+        if entry is None or entry["signature"] != self._signature(file_path, depends_on):
+            return None
+        return entry["tables"]
+
+    def refresh(self, file_path, depends_on=()):
+        """Accept the files' new signature after the cached tables were updated in step with them"""
+        entry = self._entries.get(self._key(file_path))
+        if entry is not None:
+            entry["signature"] = self._signature(file_path, depends_on)
+
+    def invalidate(self, file_path=None):
+        if file_path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(self._key(file_path), None)
+
+
+table_cache = TableCache()
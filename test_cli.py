@@ -0,0 +1,67 @@
+import os
+import unittest
+from click.testing import CliRunner
+from test_student_journal import DataDirTestCase
+from authentication import Authentication
+from student import Student
+from grades import Grades
+from cli import cli, USER_ENV, PASSWORD_ENV
+
+
+class CliTestCase(DataDirTestCase):
+    def setUp(self):
+        super().setUp()
+        os.environ.pop(USER_ENV, None)
+        os.environ.pop(PASSWORD_ENV, None)
+        with open("course.csv", "w") as file:
+            file.write("CS100,Introduction to Computer Science,4,Basics\nCS110,Systems,3,Machines\n")
+        with open("professor.csv", "w") as file:
+            file.write("smith@university.edu,Dr. John Smith,Full Professor,CS100\n")
+        Authentication().create_new_account("smith@university.edu", "secret", "Professor")
+        Authentication().create_new_account("connor@university.edu", "hunter2", "Student")
+
+    def run_cli(self, *args, env=None):
+        return CliRunner().invoke(cli, args, env=env)
+
+
+class LoginTest(CliTestCase):
+    add = ("student", "add", "Ann", "Cole", "--email", "ann@university.edu", "--course-id", "CS100", "--mark", "85")
+
+    def assert_not_added(self):
+        self.assertNotIn(("Ann", "Cole"), self.fresh_read(Student))
+
+    def test_writes_need_a_login(self):
+        result = self.run_cli(*self.add)
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn(USER_ENV, result.output)
+        self.assert_not_added()
+
+    def test_wrong_password_and_student_logins_are_refused(self):
+        result = self.run_cli("--user", "smith@university.edu", "--password", "wrong", *self.add)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Incorrect password", result.output)
+        result = self.run_cli("--user", "connor@university.edu", "--password", "hunter2", *self.add)
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Only professors", result.output)
+        self.assert_not_added()
+
+    def test_professor_login_from_the_environment(self):
+        env = {USER_ENV: "smith@university.edu", PASSWORD_ENV: "secret"}
+        result = self.run_cli(*self.add, env=env)
+        self.assertEqual(result.exit_code, 0, result.output)
+        result = self.run_cli("grades", "set", "Ann", "Cole", "CS100", "--grade", "A", env=env)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(self.fresh_read(Grades)[("Ann", "Cole", "CS100")]["grade"], "A")
+
+    def test_password_is_prompted_for(self):
+        result = CliRunner().invoke(cli, ("--user", "smith@university.edu") + self.add, input="secret\n")
+        self.assertEqual(result.exit_code, 0, result.output)
+
+    def test_reads_need_no_login(self):
+        result = self.run_cli("student", "show", "--email", "connor@university.edu")
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Connor", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import os
+import json
+import unittest
+from course import Course, render_course_report_lines
+from test_student_journal import DataDirTestCase
+
+COURSES = ("CS100,Introduction to Computer Science,4,Basics\nCS110,Systems,3,Machines\n"
+           "CS120,Networks,3,Packets\nCS999,Unused,1,Nobody takes it\n")
+PROFESSORS = "smith@university.edu,Dr. John Smith,Full Professor,CS100\nlee@university.edu,Dr. Ada Lee,Lecturer,CS110\n"
+MORE_ROWS = "ann@university.edu,Ann,Cole,CS100,B,85\nben@university.edu,Ben,Diaz,CS120,F,nan\n"
+
+
+class AllCourseReportTest(DataDirTestCase):
+    def setUp(self):
+        super().setUp()
+        with open("student.csv", "a") as file:
+            file.write(MORE_ROWS)
+        with open("course.csv", "w") as file:
+            file.write(COURSES)
+        with open("professor.csv", "w") as file:
+            file.write(PROFESSORS)
+
+    def written(self, output_dir):
+        files = {}
+        for name in sorted(os.listdir(output_dir)):
+            with open(os.path.join(output_dir, name)) as file:
+                files[name] = file.read()
+        return files
+
+    def test_pool_writes_what_the_single_course_report_shows(self):
+        self.assertEqual(Course().generate_all_course_reports("pool", workers=2), 4)
+        self.assertEqual(Course().generate_all_course_reports("serial", workers=1), 4)
+        files = self.written("pool")
+        self.assertEqual(files, self.written("serial"))
+        for course_id in ("CS100", "CS110", "CS120", "CS999"):
+            report = Course().course_report(course_id)
+            self.assertEqual(json.loads(files[course_id + ".json"]), report)
+            self.assertEqual(files[course_id + ".txt"], "\n".join(render_course_report_lines(report)) + "\n")
+
+    def test_courses_without_students_or_professor(self):
+        Course().generate_all_course_reports("reports", workers=1)
+        files = self.written("reports")
+        self.assertIn("Professor: Not assigned", files["CS999.txt"])
+        self.assertIn("No students enrolled in this course.", files["CS999.txt"])
+        self.assertEqual(json.loads(files["CS120.json"])["total_students"], 0)
+        self.assertEqual(json.loads(files["CS100.json"])["average_mark"], 90.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
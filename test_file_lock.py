@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+import file_lock
+from file_lock import FileVersion, ConflictError, StaleVersionError, merge_edit
+from test_student_journal import DataDirTestCase
+
+
+class FileVersionTest(DataDirTestCase):
+    def test_writes_advance_the_version(self):
+        version = FileVersion("student.csv")
+        before = version.current()
+        with version.locked():
+            version.check(before)
+            version.bump()
+        with self.assertRaises(StaleVersionError):
+            version.check(before)
+        version.check(before + 1)
+
+    @unittest.skipIf(file_lock.fcntl is None, "No fcntl locks on this platform")
+    def test_failed_recovery_releases_the_lock(self):
+        version = FileVersion("student.csv")
+        with mock.patch("transaction.recover", side_effect=OSError("disk gone")):
+            with self.assertRaises(OSError):
+                with version.locked():
+                    self.fail("the lock was entered")
+        self.assertEqual(file_lock._held, {})
+        with open(version.path, "ab") as file:  # Another open file conflicts with a leaked flock
+            file_lock.fcntl.flock(file.fileno(), file_lock.fcntl.LOCK_EX | file_lock.fcntl.LOCK_NB)
+            file_lock.fcntl.flock(file.fileno(), file_lock.fcntl.LOCK_UN)
+        with version.locked():
+            version.bump()
+        self.assertEqual(file_lock._held, {})
+
+
+class MergeEditTest(unittest.TestCase):
+    based_on = {"email": "a@x.edu", "grade": "C", "mark": "75"}
+
+    def test_edits_of_different_fields_merge(self):
+        current = dict(self.based_on, email="b@x.edu")
+        merged = merge_edit(self.based_on, dict(self.based_on, mark="80"), current)
+        self.assertEqual(merged, {"email": "b@x.edu", "grade": "C", "mark": "80"})
+
+    def test_edits_of_the_same_field_conflict(self):
+        with self.assertRaises(ConflictError):
+            merge_edit(self.based_on, dict(self.based_on, mark="80"), dict(self.based_on, mark="80"))
+        with self.assertRaises(ConflictError):
+            merge_edit(self.based_on, dict(self.based_on, mark="80"), None)
+
+
+if __name__ == "__main__":
+    unittest.main()
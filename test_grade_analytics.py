@@ -0,0 +1,33 @@
+import sys
+import unittest
+from unittest import mock
+from click.testing import CliRunner
+from test_student_journal import DataDirTestCase
+from cli import cli
+try:
+    import numpy
+except ImportError:  # Optional; the statistics tests that need it are skipped
+    numpy = None
+
+
+class GradeAnalyticsTest(DataDirTestCase):
+    def test_stats_commands_without_numpy(self):
+        with mock.patch.dict(sys.modules, {"numpy": None}):  # None makes "import numpy" raise ImportError
+            result = CliRunner().invoke(cli, ["stats", "all"])
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn("pip install numpy", result.output)
+            result = CliRunner().invoke(cli, ["stats", "mean", "CS100"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("95.10", result.output)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_all_courses_in_one_pass(self):
+        from grade_analytics import GradeAnalytics
+        results = GradeAnalytics().compute()
+        self.assertEqual([(row["course_id"], row["count"], row["mean"]) for row in results],
+                         [("CS100", 1, 95.1), ("CS110", 1, 77.0)])
+        self.assertEqual(results[0]["histogram"]["A"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
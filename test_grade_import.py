@@ -0,0 +1,55 @@
+import csv
+import unittest
+from test_student_journal import DataDirTestCase
+from grades import Grades
+
+
+class GradeImportTest(DataDirTestCase):
+    def setUp(self):
+        super().setUp()
+        with open("course.csv", "w") as file:
+            file.write("CS100,Introduction to Computer Science,4,Basics\nCS110,Systems,3,Machines\n")
+        with open("professor.csv", "w") as file:
+            file.write("smith@university.edu,Dr. John Smith,Full Professor,CS100\n"
+                       "lee@university.edu,Dr. Ada Lee,Lecturer,CS110\n")
+
+    def read_rejects(self, path):
+        with open(path, newline="") as file:
+            return list(csv.reader(file))
+
+    def test_csv_import(self):
+        with open("import.csv", "w") as file:
+            file.write("connor@university.edu,Connor,Johnson,CS100,88\n"
+                       'junior@university.edu,Isabella,"Ward, Jr",CS100,B\n'
+                       "isabella@university.edu,Isabella,Ward,CS999,90\n"
+                       "just,three,fields\n")
+        self.assertEqual(Grades().import_grades("import.csv"), (2, 2))
+        grades = self.fresh_read(Grades)
+        self.assertEqual(grades[("Connor", "Johnson", "CS100")]["grade"], "B")
+        self.assertEqual(grades[("Isabella", "Ward, Jr", "CS100")]["mark"], "88.5")
+        self.assertEqual(self.read_rejects("import.csv.rejects.csv"), [
+            ["3", "isabella@university.edu,Isabella,Ward,CS999,90", "Course CS999 not found"],
+            ["4", "just,three,fields", "Malformed line"]
+        ])
+
+    def test_rejects_with_commas_read_back(self):
+        with open("import.csv", "w") as file:
+            file.write('a@university.edu,"Ann, B",Cole,CS999,90\n')
+        Grades().import_grades("import.csv", "rejects.csv")
+        [[line_number, raw, reason]] = self.read_rejects("rejects.csv")
+        self.assertEqual(next(csv.reader([raw])), ["a@university.edu", "Ann, B", "Cole", "CS999", "90"])
+        self.assertEqual(reason, "Course CS999 not found")
+
+    def test_jsonl_lines_that_are_not_objects_are_rejected(self):
+        with open("import.jsonl", "w") as file:
+            file.write('{"email": "connor@university.edu", "first_name": "Connor", "last_name": "Johnson", '
+                       '"course_id": "CS100", "mark": 91}\n'
+                       '[1, 2]\n7\n"text"\n{broken\n')
+        self.assertEqual(Grades().import_grades("import.jsonl"), (1, 4))
+        self.assertEqual([reason for line_number, raw, reason in self.read_rejects("import.jsonl.rejects.csv")],
+                         ["Not a JSON object"] * 3 + ["Malformed line"])
+        self.assertEqual(self.fresh_read(Grades)[("Connor", "Johnson", "CS100")]["mark"], "91")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import math
+import unittest
+import grade_scale
+from grade_scale import LETTERS
+from student_records import StudentRecords
+try:
+    import numpy as np
+except ImportError:  # Optional, like for grade_analytics
+    np = None
+
+EDGE_MARKS = ["0", "59.5", "60", "74.99", "75", "92.999", "93", "100", "nan", "inf", "-inf", "-0.5"]
+
+
+class GradeScaleTest(unittest.TestCase):
+    def test_scalar_and_column_paths_agree(self):
+        scalar = [grade_scale.mark_to_grade(mark) for mark in EDGE_MARKS]
+        self.assertEqual(grade_scale.marks_to_grades(EDGE_MARKS), scalar)
+        self.assertEqual(scalar[:8], ["F", "F", "D", "D", "C", "B", "A", "A"])
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_scalar_and_numpy_paths_agree(self):
+        codes = grade_scale.letter_codes(np.array([float(mark) for mark in EDGE_MARKS]))
+        self.assertEqual([LETTERS[code] for code in codes], [grade_scale.mark_to_grade(mark) for mark in EDGE_MARKS])
+
+    def test_non_finite_marks_are_rejected(self):
+        for mark in ("nan", "NaN", "inf", "-inf"):
+            with self.assertRaises(ValueError):
+                grade_scale.grade_and_mark(mark=mark)
+        self.assertEqual(grade_scale.grade_and_mark(mark="100"), ("A", "100"))
+        self.assertEqual(grade_scale.grade_and_mark(grade="b"), ("B", "88.5"))
+
+    def test_non_finite_marks_are_unusable(self):
+        self.assertIsNone(grade_scale.mark_value("nan"))
+        self.assertEqual(grade_scale.mark_values(["nan", "inf", "80", "C"]), [None, None, 80.0, 79.5])
+
+    def test_course_stats_ignore_non_finite_marks(self):
+        students = StudentRecords({
+            ("A", "One"): {"email": "a@x.edu", "course_id": "CS1", "grade": "B", "mark": "90"},
+            ("B", "Two"): {"email": "b@x.edu", "course_id": "CS1", "grade": "F", "mark": "nan"},
+            ("C", "Three"): {"email": "c@x.edu", "course_id": "CS1", "grade": "C", "mark": "80"},
+        })
+        del students[("B", "Two")]
+        students[("C", "Three")] = {"email": "c@x.edu", "course_id": "CS1", "grade": "A", "mark": "100"}
+        stats = students.course_stats("CS1")
+        self.assertEqual((stats.count, stats.mean(), stats.median()), (2, 95.0, 95.0))
+        self.assertFalse(math.isnan(stats.total))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+from hash_index import HashIndex
+
+
+def first_field(line):
+    return line.split(b",")[0] or None
+
+
+class HashIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.data_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.data_dir, "data.csv")
+        with open(self.csv_path, "w") as file:
+            file.write("a,1\nb,2\n\"c\nd\",3\n")
+        self.index = HashIndex(self.csv_path, self.csv_path + ".idx", first_field)
+
+    def tearDown(self):
+        shutil.rmtree(self.data_dir)
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup(b"b"), (4, b"b,2\n"))
+        self.assertEqual(self.index.lookup(b'"c\nd"'), (8, b'"c\nd",3\n'))
+        self.assertIsNone(self.index.lookup(b"z"))
+        self.assertTrue(self.index.is_current())
+
+    def test_record_write(self):
+        self.index.ensure_current()
+        offset = os.path.getsize(self.csv_path)
+        with open(self.csv_path, "a") as file:
+            file.write("e,5\n")
+        self.index.record_write(b"e", offset)
+        self.assertTrue(self.index.is_current())
+        self.assertEqual(self.index.lookup(b"e"), (offset, b"e,5\n"))
+
+    def scan_while_writing(self, write):
+        """Rebuild the index, calling write() once the scan has started"""
+        def key_func(line):
+            if write not in done:
+                done.append(write)
+                write()
+            return first_field(line)
+        done = []
+        HashIndex(self.csv_path, self.csv_path + ".idx", key_func).rebuild()
+
+    def test_append_during_rebuild_leaves_index_outdated(self):
+        def append():
+            with open(self.csv_path, "a") as file:
+                file.write("e,5\n")
+        self.scan_while_writing(append)
+        self.assertFalse(self.index.is_current())
+        self.assertEqual(self.index.lookup(b"e")[1], b"e,5\n")
+
+    def test_replace_during_rebuild_leaves_index_outdated(self):
+        def replace():
+            with open(self.csv_path + ".tmp", "w") as file:
+                file.write("x,1\na,2\n")
+            os.replace(self.csv_path + ".tmp", self.csv_path)
+        self.scan_while_writing(replace)
+        self.assertFalse(self.index.is_current())
+        self.assertEqual(self.index.lookup(b"a"), (4, b"a,2\n"))
+        self.assertIsNone(self.index.lookup(b"b"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import asyncio
+import unittest
+import server
+from server import RecordServer
+from authentication import Authentication
+from grades import Grades
+from test_student_journal import DataDirTestCase
+
+
+class ServerTestCase(DataDirTestCase):
+    """Runs a RecordServer on a Unix socket in the test directory"""
+
+    def setUp(self):
+        super().setUp()
+        with open("course.csv", "w") as file:
+            file.write("CS100,Introduction to Computer Science,4,Basics\nCS110,Systems,3,Machines\n")
+        with open("professor.csv", "w") as file:
+            file.write("smith@university.edu,Dr. John Smith,Full Professor,CS100\n"
+                       "lee@university.edu,Dr. Ada Lee,Lecturer,CS110\n")
+        Authentication().create_new_account("smith@university.edu", "secret", "Professor")
+        Authentication().create_new_account("connor@university.edu", "hunter2", "Student")
+
+    def talk(self, conversation):
+        """Serve while conversation(send) runs; send(line) writes one request line and returns the response"""
+        async def run():
+            ready = asyncio.get_running_loop().create_future()
+            serving = asyncio.create_task(RecordServer().serve(socket_path="rpc.sock", ready=ready.set_result))
+            await ready
+            reader, writer = await asyncio.open_unix_connection("rpc.sock")
+
+            async def send(line):
+                writer.write(line.encode() + b"\n")
+                await writer.drain()
+                return json.loads(await reader.readline())
+
+            try:
+                return await conversation(send)
+            finally:
+                writer.close()
+                serving.cancel()
+                await asyncio.gather(serving, return_exceptions=True)
+        return asyncio.run(run())
+
+    def call(self, send, method, **params):
+        return send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": method, "params": params}))
+
+
+class ReadTest(ServerTestCase):
+    def test_reads(self):
+        async def conversation(send):
+            student = await self.call(send, "student.get", first_name="Isabella", last_name="Ward")
+            self.assertEqual(student["result"]["email"], "isabella@university.edu")
+            listing = await self.call(send, "student.list", sort_by="marks", order="desc", limit=1)
+            self.assertEqual(listing["result"]["total"], 2)
+            self.assertEqual(listing["result"]["students"][0]["first_name"], "Isabella")
+            stats = await self.call(send, "stats.course", course_id="CS110")
+            self.assertEqual(stats["result"]["mean"], 77.0)
+            missing = await self.call(send, "course.get", course_id="CS999")
+            self.assertIsNone(missing["result"])
+        self.talk(conversation)
+
+    def test_errors(self):
+        async def conversation(send):
+            self.assertEqual((await send("{not json"))["error"]["code"], server.PARSE_ERROR)
+            self.assertEqual((await send("[1]"))["error"]["code"], server.INVALID_REQUEST)
+            self.assertEqual((await self.call(send, "student.drop"))["error"]["code"], server.METHOD_NOT_FOUND)
+            wrong = await self.call(send, "student.get", first_name="Isabella")
+            self.assertEqual(wrong["error"]["code"], server.INVALID_PARAMS)
+        self.talk(conversation)
+
+
+class WriteTest(ServerTestCase):
+    def test_writes_need_a_professor_session(self):
+        change = {"first_name": "Connor", "last_name": "Johnson", "course_id": "CS110", "mark": 95}
+
+        async def conversation(send):
+            refused = await self.call(send, "grades.set", **change)
+            self.assertEqual(refused["error"]["code"], server.UNAUTHORIZED)
+            failed = await self.call(send, "account.login", email="smith@university.edu", password="wrong")
+            self.assertEqual(failed["result"], {"role": None})
+            student = await self.call(send, "account.login", email="connor@university.edu", password="hunter2")
+            refused = await self.call(send, "grades.set", session=student["result"]["session"], **change)
+            self.assertEqual(refused["error"]["code"], server.UNAUTHORIZED)
+
+            professor = await self.call(send, "account.login", email="smith@university.edu", password="secret")
+            self.assertEqual(professor["result"]["role"], "Professor")
+            written = await self.call(send, "grades.set", session=professor["result"]["session"], **change)
+            self.assertTrue(written["result"]["ok"], written)
+            grade = await self.call(send, "grades.get", first_name="Connor", last_name="Johnson", course_id="CS110")
+            self.assertEqual(grade["result"]["grade"], {"grade": "A", "mark": "95"})
+        self.talk(conversation)
+        self.assertEqual(self.fresh_read(Grades)[("Connor", "Johnson", "CS110")]["mark"], "95")
+
+    def test_repeated_failed_logins_are_throttled(self):
+        async def conversation(send):
+            for attempt in range(server.LOGIN_ATTEMPTS):
+                await self.call(send, "account.login", email="smith@university.edu", password="guess")
+            throttled = await self.call(send, "account.login", email="smith@university.edu", password="secret")
+            self.assertEqual(throttled["error"]["code"], server.TOO_MANY_LOGINS)
+        self.talk(conversation)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import threading
+import unittest
+from click.testing import CliRunner
+import storage
+from storage import SqliteStorage, import_csv_files, open_storage
+from file_lock import StaleVersionError
+from student import Student
+from grades import Grades
+from course import Course
+from test_student_journal import DataDirTestCase
+
+COURSES = "CS100,Introduction to Computer Science,4,Basics\nCS101,Programming,3,Python\nCS110,Systems,3,Machines\n"
+PROFESSORS = "smith@university.edu,Dr. John Smith,Full Professor,CS100\n"
+
+
+class SqliteTestCase(DataDirTestCase):
+    """Runs each test against a database imported from the small CSV files, with CHECKMYGRADE_DB set"""
+
+    def setUp(self):
+        super().setUp()
+        with open("course.csv", "w") as file:
+            file.write(COURSES)
+        with open("professor.csv", "w") as file:
+            file.write(PROFESSORS)
+        with open("authentication.csv", "w"):
+            pass
+        self.storage = SqliteStorage.open("test.db")
+        import_csv_files(self.storage)
+        os.environ[storage.STORAGE_ENV] = "test.db"
+
+    def tearDown(self):
+        self.storage.close()
+        super().tearDown()
+
+    def rebuilt(self, view):
+        """The view as a new connection would build it from the tables"""
+        self.storage._views.clear()
+        return dict(view().read_data())
+
+
+class ImportExportTest(SqliteTestCase):
+    def test_export_writes_back_what_was_imported(self):
+        before = {}
+        for csv_file in ("student.csv", "course.csv", "professor.csv"):
+            with open(csv_file) as file:
+                before[csv_file] = file.read()
+            os.remove(csv_file)
+        result = CliRunner().invoke(storage.main, ["export", "--db", "test.db"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        for csv_file, contents in before.items():
+            with open(csv_file) as file:
+                self.assertEqual(file.read(), contents)
+
+
+class SqliteWriteTest(SqliteTestCase):
+    key = ("Connor", "Johnson", "CS110")
+
+    def test_writes_go_to_the_database(self):
+        grades = Grades()
+        current = grades.read_data()[self.key]
+        grades.save_grade(*self.key, dict(current, mark="85", grade="B"), current)
+        with open("student.csv") as file:
+            self.assertNotIn("85", file.read())
+        self.assertEqual([row[5] for row in self.storage.find("students", "email", "connor@university.edu")], ["85"])
+        self.assertEqual(self.rebuilt(Grades)[self.key]["mark"], "85")
+
+    def test_cached_views_follow_single_row_writes(self):
+        students, grades_view = Student().read_data(), Grades().read_data()
+        grades = Grades()
+        grades.save_grade("Isabella", "Ward", "CS101", {"email": "isabella@university.edu", "grade": "C", "mark": "80"})
+        grades.remove_grade("Isabella", "Ward", "CS100", grades_view[("Isabella", "Ward", "CS100")])
+        self.assertIs(Student().read_data(), students)
+        self.assertIs(Grades().read_data(), grades_view)
+        cached = (dict(students), dict(grades_view))
+        self.assertEqual(cached, (self.rebuilt(Student), self.rebuilt(Grades)))
+        self.assertEqual(cached[0][("Isabella", "Ward")]["course_id"], "CS101")
+
+    def test_stale_writes_are_refused(self):
+        version = self.storage.version("courses")
+        Course().update_data(lambda courses: courses.__setitem__("CS110", dict(courses["CS110"], credits="4")))
+        with self.assertRaises(StaleVersionError):
+            self.storage.upsert("courses", ("CS110", "Systems", "5", "Machines"), expected_version=version)
+        self.assertEqual(self.rebuilt(Course)["CS110"]["credits"], "4")
+
+    def test_writes_from_another_connection_refresh_the_views(self):
+        cached = Grades().read_data()
+
+        def write():
+            grades = Grades()  # A connection of this thread's own
+            current = grades.read_data()[self.key]
+            grades.save_grade(*self.key, dict(current, mark="91", grade="A"), current)
+            open_storage().close()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        thread.join()
+        self.assertEqual(cached[self.key]["mark"], "77")
+        self.assertEqual(Grades().read_data()[self.key]["mark"], "91")
+
+
+if __name__ == "__main__":
+    unittest.main()
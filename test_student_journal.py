@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import unittest
+from table_cache import table_cache
+from student_journal import StudentJournal
+from student import Student
+from grades import Grades
+
+ROWS = (
+    "isabella@university.edu,Isabella,Ward,CS100,A,95.1\n"
+    "connor@university.edu,Connor,Johnson,CS110,C,77\n"
+)
+
+
+class DataDirTestCase(unittest.TestCase):
+    """Runs each test in a fresh directory holding a small student.csv"""
+
+    def setUp(self):
+        self.previous_dir = os.getcwd()
+        self.data_dir = tempfile.mkdtemp()
+        os.chdir(self.data_dir)
+        self.environ = dict(os.environ)
+        os.environ.pop("CHECKMYGRADE_DB", None)
+        with open("student.csv", "w") as file:
+            file.write(ROWS)
+        table_cache.invalidate()
+
+    def tearDown(self):
+        table_cache.invalidate()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        os.chdir(self.previous_dir)
+        shutil.rmtree(self.data_dir)
+
+    def fresh_read(self, view):
+        """Read a table the way a new process would"""
+        table_cache.invalidate()
+        return view().read_data()
+
+
+class StudentJournalTest(DataDirTestCase):
+    def test_put_is_replayed_over_the_base_file(self):
+        Grades().save_grade("Connor", "Johnson", "CS110", {"email": "connor@university.edu", "grade": "B", "mark": "85"},
+                            Grades().read_data()[("Connor", "Johnson", "CS110")])
+        self.assertEqual(self.fresh_read(Grades)[("Connor", "Johnson", "CS110")]["mark"], "85")
+        with open("student.csv") as file:
+            self.assertEqual(file.read(), ROWS)
+
+    def test_compaction_keeps_the_journalled_data(self):
+        grades = Grades()
+        grades.save_grade("Isabella", "Ward", "CS101", {"email": "isabella@university.edu", "grade": "C", "mark": "80"})
+        expected = dict(self.fresh_read(Grades))
+        grades.compact()
+        self.assertFalse(os.path.exists("student.csv.journal"))
+        self.assertEqual(dict(self.fresh_read(Grades)), expected)
+
+    def test_deleting_a_student_removes_every_course_after_compaction(self):
+        grades = Grades()
+        grades.save_grade("Isabella", "Ward", "CS101", {"email": "isabella@university.edu", "grade": "C", "mark": "80"})
+        student = Student()
+        student.remove_student("Isabella", "Ward", student.read_data()[("Isabella", "Ward")])
+        self.assertNotIn(("Isabella", "Ward"), self.fresh_read(Student))
+        grades.compact()
+        self.assertNotIn(("Isabella", "Ward"), self.fresh_read(Student))
+        self.assertFalse([key for key in self.fresh_read(Grades) if key[:2] == ("Isabella", "Ward")])
+        self.assertIsNone(Student().lookup_student("Isabella", "Ward"))
+
+    def test_cached_views_follow_a_student_delete(self):
+        grades = Grades()
+        grades.save_grade("Isabella", "Ward", "CS101", {"email": "isabella@university.edu", "grade": "C", "mark": "80"})
+        cached_students = Student().read_data()
+        cached_grades = grades.read_data()
+        StudentJournal("student.csv").delete_student("Isabella", "Ward")
+        self.assertIs(Student().read_data(), cached_students)
+        self.assertNotIn(("Isabella", "Ward"), cached_students)
+        self.assertNotIn(("Isabella", "Ward", "CS100"), cached_grades)
+        self.assertNotIn(("Isabella", "Ward", "CS101"), cached_grades)
+
+    def test_roster_checkpoint_appends_one_batch(self):
+        grades = Grades()
+        table = grades.read_data()
+        roster = [("Connor", "Johnson", "CS110"), ("Isabella", "Ward", "CS100")]
+        based_on = {key: table[key] for key in roster}
+        pending = {key: dict(based_on[key], grade="F", mark="10") for key in roster}
+        self.assertEqual(grades._save_roster_edits(roster, based_on, pending), 2)
+        self.assertEqual(pending, {})
+        with open("student.csv") as file:
+            self.assertEqual(file.read(), ROWS)
+        self.assertEqual([op for op, fields in StudentJournal("student.csv").entries()], ["P", "P"])
+        fresh = self.fresh_read(Grades)
+        self.assertEqual([fresh[key]["mark"] for key in roster], ["10", "10"])
+
+    def test_torn_last_line_is_ignored(self):
+        with open("student.csv.journal", "w") as file:
+            file.write("D,Connor,Johnson,CS110\nP,x@university.edu,Torn")
+        self.assertEqual(list(StudentJournal("student.csv").entries()), [("D", ["Connor", "Johnson", "CS110"])])
+        self.assertNotIn(("Connor", "Johnson"), self.fresh_read(Student))
+
+
+class StudentViewTest(DataDirTestCase):
+    """The Student view replayed from the journal matches a re-parse of the compacted file"""
+
+    def setUp(self):
+        super().setUp()
+        grades = Grades()
+        grades.save_grade("Isabella", "Ward", "CS101", {"email": "isabella@university.edu", "grade": "C", "mark": "80"})
+        grades.compact()  # Isabella Ward's rows are now CS100 then CS101
+        table_cache.invalidate()
+
+    def assert_views_agree(self, change):
+        cached = Student().read_data()
+        grades = Grades()
+        change(grades, grades.read_data())
+        self.assertIs(Student().read_data(), cached)
+        replayed = dict(cached)
+        self.assertEqual(dict(self.fresh_read(Student)), replayed)
+        table_cache.invalidate()
+        looked_up = Student().lookup_student("Isabella", "Ward")
+        Grades().compact()
+        compacted = dict(self.fresh_read(Student))
+        self.assertEqual(replayed, compacted)
+        self.assertEqual(looked_up, compacted.get(("Isabella", "Ward")))
+
+    def test_delete_older_course(self):
+        self.assert_views_agree(lambda grades, table: grades.remove_grade(
+            "Isabella", "Ward", "CS100", table[("Isabella", "Ward", "CS100")]))
+
+    def test_delete_newer_course(self):
+        self.assert_views_agree(lambda grades, table: grades.remove_grade(
+            "Isabella", "Ward", "CS101", table[("Isabella", "Ward", "CS101")]))
+
+    def test_edit_older_course(self):
+        self.assert_views_agree(lambda grades, table: grades.save_grade(
+            "Isabella", "Ward", "CS100", dict(table[("Isabella", "Ward", "CS100")], mark="50"),
+            table[("Isabella", "Ward", "CS100")]))
+
+    def test_edit_newer_course(self):
+        self.assert_views_agree(lambda grades, table: grades.save_grade(
+            "Isabella", "Ward", "CS101", dict(table[("Isabella", "Ward", "CS101")], mark="50"),
+            table[("Isabella", "Ward", "CS101")]))
+
+    def test_move_older_course(self):
+        def move(grades, table):
+            student = Student()
+            info = dict(student.read_data()[("Isabella", "Ward")])
+            student.journal.put(info["email"], "Isabella", "Ward", "CS120", "B", "85", "CS100")
+        self.assert_views_agree(move)
+
+
+if __name__ == "__main__":
+    unittest.main()
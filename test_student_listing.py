@@ -0,0 +1,76 @@
+import unittest
+from random import Random
+from click.testing import CliRunner
+from test_student_journal import DataDirTestCase
+from student import Student
+from cli import cli
+
+ROWS = (
+    "ann@university.edu,Ann,Cole,CS100,B,85\n"
+    "ben@university.edu,Ben,Diaz,CS100,F,nan\n"
+    "cal@university.edu,Cal,Evans,CS110,A,95\n"
+    "dee@university.edu,Dee,Ford,CS100,F,\n"
+    "eve@university.edu,Eve,Grant,CS110,C,C\n"
+)
+
+
+class ListingTestCase(DataDirTestCase):
+    def setUp(self):
+        super().setUp()
+        with open("student.csv", "w") as file:
+            file.write(ROWS)
+
+    def first_names(self, page):
+        return [first_name for (first_name, last_name), info in page]
+
+
+class MarkSortTest(ListingTestCase):
+    def test_unusable_marks_sort_last(self):
+        student = Student()
+        page, total = student.sorted_rows("marks", "asc")
+        self.assertEqual((self.first_names(page), total), (["Eve", "Ann", "Cal", "Ben", "Dee"], 5))
+        page, total = student.sorted_rows("marks", "desc")
+        self.assertEqual(self.first_names(page), ["Cal", "Ann", "Eve", "Ben", "Dee"])
+        page, total = student.sorted_rows("marks", "desc", limit=4)
+        self.assertEqual(self.first_names(page), ["Cal", "Ann", "Eve", "Ben"])
+
+    def test_listing_with_unusable_marks_prints(self):
+        sorted_students, sort_time = Student().sort_students_by_marks("asc", output_format="csv")
+        self.assertEqual(len(sorted_students), 5)
+        self.assertEqual(Student().get_sortable_mark(""), float("inf"))
+
+
+class PaginationTest(ListingTestCase):
+    def test_pages_and_course_filter(self):
+        student = Student()
+        page, total = student.sorted_rows("name", "asc", limit=2, offset=1)
+        self.assertEqual((self.first_names(page), total), (["Ben", "Cal"], 5))
+        page, total = student.sorted_rows("email", "desc", limit=2)
+        self.assertEqual(self.first_names(page), ["Eve", "Dee"])
+        page, total = student.sorted_rows("name", "asc", limit=3, offset=9)
+        self.assertEqual((page, total), ([], 5))
+        page, total = student.sorted_rows("name", "desc", course_id="CS110")
+        self.assertEqual((self.first_names(page), total), (["Eve", "Cal"], 2))
+
+    def test_top_k_pages_match_the_full_sort(self):
+        random = Random(7)
+        with open("student.csv", "w") as file:
+            for i in range(60):  # Few distinct marks, so there are plenty of ties
+                file.write(f"s{i}@university.edu,S{i},Last{i},CS100,C,{random.choice(['70', '80', '90', 'nan'])}\n")
+        student = Student()
+        for order in ("asc", "desc"):
+            everything, total = student.sorted_rows("marks", order)
+            for offset in range(0, total + 5, 7):
+                page, total = student.sorted_rows("marks", order, limit=7, offset=offset)
+                self.assertEqual(page, everything[offset:offset + 7])
+
+    def test_listing_reports_the_page_shown(self):
+        result = CliRunner().invoke(cli, ["student", "list", "--limit", "2", "--offset", "1", "--format", "table"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Showing records 2-3 of 5", result.output)
+        result = CliRunner().invoke(cli, ["student", "list", "--offset", "9", "--format", "table"])
+        self.assertIn("No records at offset 9 (total records: 5)", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
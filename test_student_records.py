@@ -0,0 +1,94 @@
+import unittest
+from random import Random
+from statistics import median
+from student_records import StudentRecords, StudentRecord
+
+ROWS = {
+    ("Isabella", "Ward"): {"email": "isabella@university.edu", "course_id": "CS100", "grade": "A", "mark": "95.1"},
+    ("Connor", "Johnson"): {"email": "connor@university.edu", "course_id": "CS110", "grade": "C", "mark": "77"},
+    ("Avery", "Perry"): {"email": "avery@college.edu", "course_id": "CS100", "grade": "B", "mark": "85"},
+}
+
+
+class SearchTest(unittest.TestCase):
+    terms = ("war", "UNIVERSITY", "cs1", "cs100", "y", "zzz", "avery@college.edu")
+
+    def expected(self, students, term):
+        term = term.lower()
+        return [key for key, info in students.items()
+                if any(term in field.lower() for field in (key[0], key[1], info["email"], info["course_id"]))]
+
+    def test_scan_and_index_agree(self):
+        students = StudentRecords(ROWS)
+        for search in range(students.index_after_searches + 2):
+            for term in self.terms:
+                self.assertEqual([key for key, info in students.search(term)], self.expected(students, term))
+        self.assertIsNotNone(students._trigrams)
+
+    def test_index_is_built_only_after_repeated_searches(self):
+        students = StudentRecords(ROWS)
+        for search in range(students.index_after_searches):
+            students.search("war")
+        self.assertIsNone(students._trigrams)
+        students.search("war")
+        self.assertIsNotNone(students._trigrams)
+
+    def test_index_follows_mutations(self):
+        students = StudentRecords(ROWS)
+        students.index_after_searches = 0
+        students.search("war")
+        students[("Isabella", "Ward")] = dict(ROWS[("Isabella", "Ward")], email="bella@school.edu")
+        del students[("Avery", "Perry")]
+        students[("Mia", "Warden")] = {"email": "mia@college.edu", "course_id": "CS120", "grade": "A", "mark": "91"}
+        for term in self.terms + ("school", "college", "cs120"):
+            self.assertEqual([key for key, info in students.search(term)], self.expected(students, term))
+
+
+class IndexTest(unittest.TestCase):
+    def mutate(self, students):
+        students[("Isabella", "Ward")] = dict(ROWS[("Isabella", "Ward")], email="bella@school.edu", mark="70")
+        del students[("Connor", "Johnson")]
+        students[("Mia", "Warden")] = {"email": "mia@college.edu", "course_id": "CS100", "grade": "A", "mark": "91"}
+
+    def indexes(self, students):
+        return ([students.key_for_email(email) for email in ("isabella@university.edu", "bella@school.edu",
+                                                              "connor@university.edu", "mia@college.edu")],
+                {course_id: students.keys_in_course(course_id) for course_id in ("CS100", "CS110")},
+                (students.course_stats("CS100").mean(), students.course_stats("CS100").median()),
+                students.course_stats("CS110"))
+
+    def test_indexes_built_late_match_indexes_kept_up_to_date(self):
+        early = StudentRecords(ROWS)
+        early.key_for_email("avery@college.edu")
+        self.mutate(early)
+        late = StudentRecords.loaded((key, StudentRecord.from_mapping(info)) for key, info in ROWS.items())
+        self.assertIsNone(late._by_email)
+        self.mutate(late)
+        self.assertIsNone(late._by_email)
+        self.assertEqual(self.indexes(late), self.indexes(early))
+        self.assertEqual(self.indexes(late)[2], (82.0, 85.0))
+
+
+class CourseStatsTest(unittest.TestCase):
+    def test_stats_follow_updates(self):
+        random = Random(0)
+        students = StudentRecords.loaded(
+            ((f"S{i}", "X"), StudentRecord(f"s{i}@x.edu", "CS1", "", str(random.randint(0, 100)))) for i in range(200))
+        students.course_stats("CS1")
+        for i in range(300):
+            key = (f"S{random.randrange(250)}", "X")
+            if key in students and random.random() < 0.3:
+                del students[key]
+            else:
+                students[key] = {"email": f"{key[0]}@x.edu", "course_id": "CS1", "grade": "",
+                                 "mark": str(random.uniform(0, 100))}
+        marks = sorted(float(info["mark"]) for info in students.values())
+        stats = students.course_stats("CS1")
+        self.assertEqual(stats.count, len(marks))
+        self.assertAlmostEqual(stats.mean(), sum(marks) / len(marks))
+        self.assertEqual((stats.minimum(), stats.maximum()), (marks[0], marks[-1]))
+        self.assertEqual(stats.median(), median(marks))
+
+
+if __name__ == "__main__":
+    unittest.main()
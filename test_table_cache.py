@@ -0,0 +1,76 @@
+import os
+import pickle
+import unittest
+from unittest import mock
+from table_cache import TableCache, table_cache
+from student import Student
+from grades import Grades
+from test_student_journal import DataDirTestCase
+
+
+def refuse_to_parse(self):
+    raise AssertionError("parsed the CSV instead of loading the snapshot")
+
+
+@mock.patch.object(table_cache, "snapshots", True)
+class SnapshotTest(DataDirTestCase):
+    def test_new_process_loads_the_snapshot(self):
+        parsed = dict(Student().read_data())
+        self.assertTrue(os.path.exists(table_cache.snapshot_path("student.csv", "students")))
+        table_cache.invalidate()
+        with mock.patch.object(Student, "_parse_file", refuse_to_parse):
+            loaded = Student().read_data()
+        self.assertEqual(dict(loaded), parsed)
+        self.assertEqual(loaded.key_for_email("connor@university.edu"), ("Connor", "Johnson"))
+        self.assertEqual(loaded.course_stats("CS100").median(), 95.1)
+
+    def test_journal_writes_are_in_the_snapshot_signature(self):
+        current = Grades().read_data()[("Connor", "Johnson", "CS110")]
+        Grades().save_grade("Connor", "Johnson", "CS110", dict(current, grade="B", mark="85"), current)
+        self.assertEqual(self.fresh_read(Grades)[("Connor", "Johnson", "CS110")]["mark"], "85")
+        with mock.patch.object(Grades, "_parse_file", refuse_to_parse):
+            self.assertEqual(self.fresh_read(Grades)[("Connor", "Johnson", "CS110")]["mark"], "85")
+
+    def test_same_size_and_mtime_edit_is_caught_by_the_digest(self):
+        Student().read_data()
+        stat = os.stat("student.csv")
+        with open("student.csv") as file:
+            edited = file.read().replace("CS110,C,77", "CS110,C,78")
+        with open("student.csv", "w") as file:
+            file.write(edited)
+        os.utime("student.csv", ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.fresh_read(Student)[("Connor", "Johnson")]["mark"], "78")
+
+    def test_damaged_snapshot_is_rebuilt(self):
+        parsed = dict(Student().read_data())
+        snapshot_path = table_cache.snapshot_path("student.csv", "students")
+        with open(snapshot_path, "r+b") as file:
+            file.truncate(os.path.getsize(snapshot_path) // 2)
+        self.assertEqual(dict(self.fresh_read(Student)), parsed)
+        with mock.patch.object(Student, "_parse_file", refuse_to_parse):
+            self.assertEqual(dict(self.fresh_read(Student)), parsed)
+
+    def test_snapshots_can_be_turned_off(self):
+        with mock.patch.dict(os.environ, {"CHECKMYGRADE_SNAPSHOTS": "0"}):
+            cache = TableCache()
+        self.assertEqual(cache.load("student.csv", "rows", lambda: [1, 2]), [1, 2])
+        self.assertFalse(os.path.exists(cache.snapshot_path("student.csv", "rows")))
+
+
+class RecordTablePickleTest(DataDirTestCase):
+    def test_tables_with_built_indexes_round_trip(self):
+        students = Student().read_data()
+        students.key_for_email("isabella@university.edu")  # Builds the indexes before pickling
+        grades = Grades().read_data()
+        grades.last_course("Isabella", "Ward")
+        students_copy, grades_copy = pickle.loads(pickle.dumps((students, grades), pickle.HIGHEST_PROTOCOL))
+        self.assertEqual((dict(students_copy), dict(grades_copy)), (dict(students), dict(grades)))
+        del students_copy[("Connor", "Johnson")]
+        self.assertIsNone(students_copy.key_for_email("connor@university.edu"))
+        self.assertIsNone(students_copy.course_stats("CS110"))
+        grades_copy[("Isabella", "Ward", "CS101")] = {"email": "isabella@university.edu", "grade": "C", "mark": "80"}
+        self.assertEqual(grades_copy.last_course("Isabella", "Ward")[0], "CS101")
+
+
+if __name__ == "__main__":
+    unittest.main()
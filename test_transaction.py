@@ -0,0 +1,168 @@
+import os
+import threading
+import unittest
+from unittest import mock
+import transaction
+import file_lock
+from transaction import Transaction
+from file_lock import ConflictError
+from student_journal import StudentJournal
+from grades import Grades
+from professor import Professor
+from test_student_journal import DataDirTestCase
+
+PROFESSORS = "ann@gmail.com,Ann,Junior,CS110\n"
+
+
+def edit(key, mark):
+    grades = Grades()
+    current = grades.read_data()[key]
+    grades.save_grade(*key, dict(current, mark=mark, grade="F"), current)
+
+
+class CompactionTest(DataDirTestCase):
+    def test_compaction_waits_for_the_commit(self):
+        key = ("Connor", "Johnson", "CS110")
+        with mock.patch.object(StudentJournal, "compact_threshold", 10):
+            with Transaction():
+                edit(key, "51")
+            with Transaction():
+                edit(key, "52")
+        self.assertFalse(os.path.exists("student.csv.journal"))
+        self.assertEqual(self.fresh_read(Grades)[key]["mark"], "52")
+
+    def test_failed_compaction_does_not_fail_the_write(self):
+        key = ("Connor", "Johnson", "CS110")
+        with mock.patch.object(StudentJournal, "compact_threshold", 10), \
+                mock.patch.object(Grades, "compact", side_effect=ConflictError("Too many concurrent writes")):
+            edit(key, "53")
+        self.assertEqual(self.fresh_read(Grades)[key]["mark"], "53")
+
+
+class TwoFileCommitTest(DataDirTestCase):
+    """A grade edit and a professor change committed together"""
+
+    key = ("Connor", "Johnson", "CS110")
+
+    def setUp(self):
+        super().setUp()
+        with open("professor.csv", "w") as file:
+            file.write(PROFESSORS)
+        self.before = self.contents()
+
+    def contents(self):
+        contents = {}
+        for file_path in ("student.csv", "student.csv.journal", "professor.csv"):
+            if os.path.exists(file_path):
+                with open(file_path) as file:
+                    contents[file_path] = file.read()
+        return contents
+
+    def leftovers(self):
+        return [name for name in os.listdir() if name.endswith(".tmp") or name == transaction.MANIFEST_PATH]
+
+    def commit(self):
+        with Transaction():
+            edit(self.key, "60")
+            Professor().update_data(lambda professors: professors.__setitem__(
+                "Ann", dict(professors["Ann"], rank="Senior")))
+
+    def assert_committed(self):
+        self.assertEqual(self.fresh_read(Grades)[self.key]["mark"], "60")
+        self.assertEqual(self.fresh_read(Professor)["Ann"]["rank"], "Senior")
+        self.assertEqual(self.leftovers(), [])
+
+    def test_commit_writes_both_files(self):
+        self.commit()
+        self.assert_committed()
+
+    def test_exception_in_block_discards_everything(self):
+        with self.assertRaises(RuntimeError):
+            with Transaction():
+                edit(self.key, "60")
+                Professor().update_data(lambda professors: professors.__setitem__(
+                    "Ann", dict(professors["Ann"], rank="Senior")))
+                raise RuntimeError("boom")
+        self.assertEqual(self.contents(), self.before)
+        self.assertEqual(self.leftovers(), [])
+
+    def test_failure_before_the_manifest_leaves_files_untouched(self):
+        with mock.patch("transaction._write_manifest", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.commit()
+        self.assertEqual(self.contents(), self.before)
+        self.assertEqual(self.leftovers(), [])
+        self.assertFalse(transaction.recover())
+
+    def fail_after_first_step(self):
+        """Commit, failing once the first step of the manifest has been applied"""
+        apply = transaction._apply
+
+        def apply_first_step(operations):
+            apply(operations[:1])
+            raise OSError("crashed")
+
+        with mock.patch("transaction._apply", side_effect=apply_first_step):
+            with self.assertRaises(OSError):
+                self.commit()
+
+    def test_failure_after_the_manifest_is_rolled_forward(self):
+        versions = (Grades().journal.current_version(), Professor().current_version())
+        self.fail_after_first_step()
+        # The staged files the manifest still lists must survive the failure
+        self.assertTrue(os.path.exists(transaction.MANIFEST_PATH))
+        self.assertTrue(transaction.recover())
+        self.assert_committed()
+        self.assertGreater(Grades().journal.current_version(), versions[0])
+        self.assertGreater(Professor().current_version(), versions[1])
+
+    def test_next_writer_recovers_an_interrupted_commit(self):
+        self.fail_after_first_step()
+        Professor().update_data(lambda professors: professors.__setitem__(
+            "Bob", {"email": "bob@gmail.com", "rank": "Junior", "course_id": "CS100"}))
+        self.assert_committed()
+        self.assertIn("Bob", self.fresh_read(Professor))
+
+
+class ThreadTest(DataDirTestCase):
+    """A transaction belongs to the thread that opened it"""
+
+    key = ("Connor", "Johnson", "CS110")
+
+    def test_other_threads_do_not_join_the_transaction(self):
+        seen = []
+
+        def write():
+            seen.append(transaction.current())
+            edit(self.key, "61")
+
+        with Transaction() as active:
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+            self.assertIs(transaction.current(), active)
+            self.assertEqual(active._operations, [])
+        self.assertEqual(seen, [None])
+        self.assertIsNone(transaction.current())
+        self.assertEqual(self.fresh_read(Grades)[self.key]["mark"], "61")
+
+    @unittest.skipIf(file_lock.fcntl is None, "No fcntl locks on this platform")
+    def test_other_threads_wait_for_the_transaction_locks(self):
+        acquired = []
+
+        def lock():
+            with file_lock.FileVersion("student.csv").locked():
+                acquired.append(transaction.current())
+
+        thread = threading.Thread(target=lock)
+        with Transaction():
+            edit(self.key, "60")
+            thread.start()
+            thread.join(0.3)
+            self.assertEqual(acquired, [])
+        thread.join()
+        self.assertEqual(acquired, [None])
+        self.assertEqual(file_lock._held, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+from contextlib import ExitStack
+from contextvars import ContextVar
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; locking is then a no-op
+    fcntl = None
+
+MANIFEST_PATH = "transaction.manifest"
+COMMIT_LOCK_PATH = "transaction.lock"
+
+# The Transaction open in this thread or asyncio task, if any; a context
+# variable so concurrent server requests and report threads each see only
+# their own
+_active = ContextVar("active_transaction", default=None)
+
+
+def current():
+    return _active.get()
+
+
+class Transaction:
+    """Unit of work: the CSV writes made inside it reach disk together at its end.
+
+        with Transaction():
+            grades.save_grade(...)
+            Professor().update_data(...)
+
+    Inside the block, replace_file() leaves every new file in a temporary
+    file, journal appends and removals are held back, and the version stamp
+    of every file written stays locked; version bumps and cache updates wait
+    until the files are in place.  When the block exits cleanly, a commit
+    that spans several files first lists its renames, appends and removals
+    in a manifest and makes it durable, then applies them and removes the
+    manifest.  A crash or error after that point is rolled forward by
+    recover(), which every writer runs before taking its first lock, so the
+    staged files are kept for it; a failure before it leaves every data
+    file untouched.  An exception inside the block discards everything
+    staged.
+
+    Reads inside the block see the data as it was before it, so the tables
+    written in one transaction are expected to be different ones.  Locks
+    are taken in the order the block writes; callers should keep that order
+    the same.  With the SQLite backend, the block is one database
+    transaction instead.
+    """
+
+    def __init__(self):
+        self._operations = []
+        self._versions = []
+        self._bumps = []
+        self._after_commit = []
+        self._on_end = []
+        self._manifest_written = False
+        self._stack = ExitStack()
+
+    def __enter__(self):
+        if _active.get() is not None:
+            raise RuntimeError("Transactions cannot be nested")
+        from storage import open_storage
+        storage = open_storage()
+        if storage:
+            self._stack.enter_context(storage.transaction())
+        self._token = _active.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _active.reset(self._token)
+        try:
+            if exc_type is None:
+                self._commit()
+        except BaseException:
+            exc_type, exc_value, traceback = sys.exc_info()
+            raise
+        finally:
+            self._discard()
+            for callback in reversed(self._on_end):
+                callback()
+            # Commits the database transaction, or rolls it back if anything failed
+            self._stack.__exit__(exc_type, exc_value, traceback)
+
+    # Staging, used by replace_file(), FileVersion and StudentJournal
+
+    def temp_path(self, file_path):
+        return f"{file_path}.{os.getpid()}.{len(self._operations)}.tmp"
+
+    def stage_replace(self, temp_path, file_path):
+        self._operations.append(["replace", temp_path, file_path])
+
+    def stage_remove(self, file_path):
+        self._operations.append(["remove", file_path])
+
+    def stage_append(self, file_path, text):
+        self._operations.append(["append", file_path, text])
+
+    def stage_bump(self, version_path, bump):
+        """Call bump() to advance the version stamp at version_path once the files are in place"""
+        if version_path not in self._versions:
+            self._versions.append(version_path)
+        self._bumps.append(bump)
+
+    def after_commit(self, callback):
+        """Call callback() once the commit is complete; it runs outside the transaction"""
+        self._after_commit.append(callback)
+
+    def on_end(self, callback):
+        """Call callback() when the transaction ends, committed or not"""
+        self._on_end.append(callback)
+
+    def _commit(self):
+        operations = _with_offsets(self._operations)
+        if len(self._versions) > 1:
+            with _commit_lock():
+                _write_manifest({"operations": operations, "versions": self._versions})
+                # From here on the commit is decided: if applying it fails,
+                # recover() finishes it from the staged files
+                self._manifest_written = True
+                self._apply(operations)
+                os.remove(MANIFEST_PATH)
+        else:
+            self._apply(operations)
+        for callback in self._after_commit:
+            callback()
+
+    def _apply(self, operations):
+        _apply(operations)
+        self._operations = []
+        for bump in self._bumps:
+            bump()
+
+    def _discard(self):
+        """Remove the temporary files of a transaction that did not commit"""
+        if self._manifest_written:
+            return
+        for operation in self._operations:
+            if operation[0] == "replace" and os.path.exists(operation[1]):
+                os.remove(operation[1])
+        self._operations = []
+
+
+def _with_offsets(operations):
+    """Record the size each appended-to file has just before the append, so applying it is repeatable"""
+    sizes = {}
+    result = []
+    for operation in operations:
+        kind = operation[0]
+        if kind == "append":
+            file_path, text = operation[1], operation[2]
+            if file_path not in sizes:
+                sizes[file_path] = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            result.append(["append", file_path, sizes[file_path], text])
+            sizes[file_path] += len(text.encode())
+            continue
+        if kind == "remove":
+            sizes[operation[1]] = 0
+        else:
+            sizes[operation[2]] = os.path.getsize(operation[1])
+        result.append(operation)
+    return result
+
+
+def _apply(operations):
+    """Carry out a commit's steps; each of them can be repeated after a crash"""
+    for operation in operations:
+        kind = operation[0]
+        if kind == "replace":
+            temp_path, file_path = operation[1], operation[2]
+            if os.path.exists(temp_path):
+                os.replace(temp_path, file_path)
+        elif kind == "remove":
+            if os.path.exists(operation[1]):
+                os.remove(operation[1])
+        else:
+            file_path, offset, text = operation[1], operation[2], operation[3]
+            with open(file_path, "ab") as file:
+                file.truncate(offset)
+                file.write(text.encode())
+                file.flush()
+                os.fsync(file.fileno())
+
+
+def _write_manifest(manifest):
+    temp_path = MANIFEST_PATH + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(manifest, file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, MANIFEST_PATH)
+
+
+class _commit_lock:
+    """Exclusive lock serialising multi-file commits and their recovery"""
+
+    def __enter__(self):
+        self.file = open(COMMIT_LOCK_PATH, "ab")
+        if fcntl is not None:
+            fcntl.flock(self.file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.file.close()  # Closing releases the flock
+
+
+def recover():
+    """Finish the multi-file commit of a process that crashed while applying it; True if there was one"""
+    if not os.path.exists(MANIFEST_PATH):
+        return False
+    with _commit_lock():
+        try:
+            with open(MANIFEST_PATH) as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return False  # Its own process finished it while we waited for the lock
+        _apply(manifest["operations"])
+        for version_path in manifest["versions"]:
+            with open(version_path, "ab") as file:
+                file.write(b".")
+        os.remove(MANIFEST_PATH)
+    return True
@@ -0,0 +1,51 @@
+class TrigramIndex:
+    """Inverted index from lowercase trigrams to the keys whose fields contain them.
+
+    Every key is indexed with a list of text fields.  A substring query of
+    three or more characters can only match keys that contain all of its
+    trigrams within one field, so candidates() intersects those posting
+    sets (smallest first) and the caller only verifies the survivors.
+    """
+
+    def __init__(self):
+        self._postings = {}
+        self._order = {}
+        self._next_order = 0
+
+    def _trigrams(self, fields):
+        grams = set()
+        for text in fields:
+            text = text.lower()
+            for i in range(len(text) - 2):
+                grams.add(text[i:i + 3])
+        return grams
+
+    def add(self, key, fields):
+        if key not in self._order:
+            self._order[key] = self._next_order
+            self._next_order += 1
+        for gram in self._trigrams(fields):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key, fields, keep_order=False):
+        for gram in self._trigrams(fields):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+        if not keep_order:
+            self._order.pop(key, None)
+
+    def candidates(self, term):
+        """Return the keys that may contain term, in insertion order, or None if term is too short"""
+        grams = self._trigrams([term])
+        if not grams:
+            return None
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        keys = set(postings[0])
+        for posting in postings[1:]:
+            keys &= posting
+            if not keys:
+                break
+        return sorted(keys, key=self._order.__getitem__)